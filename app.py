@@ -1,25 +1,37 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
 import streamlit.components.v1 as components
 from datetime import datetime
 import base64
-from io import BytesIO
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-import plotly.io as pio
 from PIL import Image as PILImage
-import re
+import uuid
+
+from ventes.chargement import charger_journal, fusionner_journaux, fusionner_partitions, ErreurChargement
+from ventes.categories import DESCRIPTION_REGLES, FICHIER_REGLES, VERSION_REGLES
+from ventes.filtres import (filter_data, index_partitions, index_articles, fusionner_index_articles,
+                            articles_des_categories, coder_selection, decoder_selection,
+                            codes_articles_des_categories, codes_articles_valides, selection_valide)
+from ventes.cube import construire_cube, fusionner_cube, vue_cube, debut_analyses, serie_journaliere, analyses_journalieres
+from ventes.stockage import empreinte_contenu, lire_cache, ecrire_cache
+from ventes.registre import RegistreJeux
+from ventes.rendu import POOL_RENDU
+from ventes.vectoriel import MODE_GRAPHIQUES_PDF
+from ventes.graphiques import (CRITERES, ANALYSES, figure_evolution, figures_analyses, figure_top, figure_repartition,
+                               create_comparison_kpis, create_comparison_chart)
+from ventes.indicateurs import indicateurs
+from ventes.rapports import create_pdf_with_charts, create_comparison_pdf
+from ventes.travaux import FileRapports, identifiant_travail, INCONNU, EN_ATTENTE, EN_COURS, TERMINE, ERREUR
+from ventes.instrumentation import Mesures, mesurer
 
 # --- Configuration de la page Streamlit ---
 st.set_page_config(layout="wide", page_title="Analyse des Ventes")
 
+# En mode image, démarrer les moteurs de rendu des graphiques PDF en arrière-plan (une fois par
+# serveur) ; en mode vectoriel, ils ne sont lancés qu'au premier graphique à rastériser
+if MODE_GRAPHIQUES_PDF == 'image':
+    POOL_RENDU.demarrer()
+
 # --- Fonction d'Authentification ---
 # def check_password():
 #     """Retourne True si l'utilisateur est authentifié."""
@@ -70,10 +82,36 @@ page = st.sidebar.radio("Aller à:", ["📊 Dashboard", "🆚 Comparaison", "
 if 'uploaded_file' not in st.session_state:
     st.session_state.uploaded_file = None
 
-if 'df_complet' not in st.session_state:
-    st.session_state.df_complet = None
+# Identifiant de la session auprès du registre partagé des jeux de données
+if 'id_session' not in st.session_state:
+    st.session_state.id_session = uuid.uuid4().hex
+
+# Clé du jeu de données courant dans le registre (empreintes du fichier principal + des journaux ajoutés)
+if 'cle_jeu' not in st.session_state:
+    st.session_state.cle_jeu = None
+
+if 'journaux_ajoutes' not in st.session_state:
+    st.session_state.journaux_ajoutes = []
+
+# Mesures de performance de cette exécution du script (étapes ajoutées par `mesurer`)
+mesures = Mesures(page=page, session=st.session_state.id_session).activer()
 
 # --- Page Documentation ---
+def afficher_regles_categories():
+    """Affiche les règles de catégorisation par section et par groupe, telles que décrites dans leur fichier"""
+    for section in DESCRIPTION_REGLES['sections']:
+        st.subheader(section['titre'])
+        groupes = section['groupes']
+        colonnes = st.columns(max(groupe.get('colonne', 1) for groupe in groupes))
+        for groupe in groupes:
+            lignes = [f"#### {groupe['titre']}"] if groupe.get('titre') else []
+            lignes += [f"- **{regle['libelle']}** : {', '.join(regle['mots_cles'])}" for regle in groupe['regles']]
+            colonnes[groupe.get('colonne', 1) - 1].markdown("\n".join(lignes))
+
+    defaut = DESCRIPTION_REGLES['categorie_par_defaut']
+    st.markdown(f"- **{defaut['categorie']}** : {defaut['description']}")
+    st.caption(f"Règles lues dans `{FICHIER_REGLES.name}` (version {VERSION_REGLES})")
+
 if page == "📚 Documentation":
     st.title("📚 Documentation - Mapping des Catégories")
     
@@ -84,62 +122,9 @@ if page == "📚 Documentation":
     et comment utiliser le dashboard d'analyse des ventes.
     """)
     
-    # Mapping détaillé des catégories
+    # Mapping détaillé des catégories, lu dans le fichier des règles utilisé par la catégorisation
     st.header("🗂️ Mapping des Catégories")
-    
-    st.subheader("🍹 Boissons Non-Alcoolisées")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("""
-        #### ☕ Boissons Chaudes
-        - **Café/Chocolat** : café, espresso, latte, déca, chocolat viennois, hot chocolat, tisane, verveine, cappucino, glass of milk
-        - **Thé** : tea, thé, earl grey, green tea, mariage, mint tea, fruits rouges
-        
-        #### 🥤 Boissons Froides
-        - **Soda/Jus** : coke, cola, sprite, schweppes, diabolo, orangina, powerade, syrop, ice tea, ginger beer, choose, pint choose
-        - **Jus de Fruit** : jus, juice, orange, pomme, apple, tomato, apricot, cranberry, pamplemousse
-        - **Eau** : cristaline, badoit, perrier, evian
-        """)
-    
-    with col2:
-        st.markdown("""
-        #### 🍷 Boissons Alcoolisées
-        - **Spiritueux** : whiskey, rhum, cognac, porto, pastis, gin, martini, whisky, ricard
-        - **Vin** : wine, saumur, bourgueil, pinot noir, merlot, rosé, mâcon, viognier, sancerre, château, champigny, gris blanc, vezelay, chardonnay, marquis de mores, sauvignon
-        - **Bière** : bière, beer, pint, lager, adnams, theakston, brooklyn, guinness, brewdog, 1664, pils, la folie douce
-        - **Effervescent** : champagne, prosecco, vin petillant
-        - **Cocktail** : cocktail
-        """)
-    
-    st.subheader("🍽️ Nourriture")
-    
-    col3, col4 = st.columns(2)
-    
-    with col3:
-        st.markdown("""
-        #### 🍬 Sucré
-        - **Pâtisserie/Sucré** : cookie, muffin, cake, brownie, pie, crumble, viennoiserie, biscuit, croissant, pain d'epice, frangipane, cupcake, lemon bars, lemon poppyseed loaf
-        - **Glace/Confiserie** : mars, twix, kinder bueno, kit kat, lolly pops, magnum, cornetto, twister, haribo, lion king, rocket, marshmallow
-        """)
-    
-    with col4:
-        st.markdown("""
-        #### 🧂 Salé
-        - **Plat/Snack Salé** : quiche, gnocchi, lasagna, chili, nuggets, lil'fries, crisps, terrîne, hot dog, gaspacho
-        - **Plat du Jour** : plat à, plat 11, plat 13
-        - **Bocaux** : terrine, vrai & bon pot
-        """)
-    
-    st.subheader("⚙️ Autres Catégories")
-    
-    st.markdown("""
-    - **Service / Frais / Activité** : entree, fee, vigik, corkage, tennis, squash, social, member, adult, bridge, snooker, remboursement, mini viennoiserie, cuff links, polo, bbq, cutlery
-    - **Matériel** : balle, balls
-    - **Hors Catégorie** : not used
-    - **Autre** : Tout article qui ne correspond à aucune des catégories ci-dessus
-    """)
+    afficher_regles_categories()
     
     # Guide d'utilisation
     st.header("🎯 Guide d'utilisation")
@@ -198,489 +183,284 @@ if page == "📚 Documentation":
     # Stop l'exécution pour ne pas afficher le dashboard
     st.stop()
 
-# --- Fonction de nettoyage des articles ---
-def nettoyer_article(libelle):
-    """
-    Nettoie le libellé de l'article en enlevant les dates et les (a):/(A):
-    """
-    if pd.isna(libelle):
-        return libelle
-    
-    libelle_str = str(libelle)
-    
-    # Enlever les dates (format JJ/MM/AAAA ou JJ-MM-AAAA)
-    libelle_sans_dates = re.sub(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', '', libelle_str)
-    
-    # Enlever les (a): et (A):
-    libelle_sans_a = re.sub(r'\([aA]\):', '', libelle_sans_dates)
-    
-    # Nettoyer les espaces multiples et les espaces en début/fin
-    libelle_propre = re.sub(r'\s+', ' ', libelle_sans_a).strip()
-    
-    return libelle_propre
-
-# --- Chargement et Préparation des Données (mis en cache pour la performance) ---
-@st.cache_data
-def load_data(uploaded_file):
+# --- Chargement et Préparation des Données (partagées entre sessions par le registre) ---
+def load_data(uploaded_file, empreinte):
     """
     Charge, nettoie et catégorise les données de ventes à partir d'un fichier chargé.
     """
     
-    # Charger le fichier depuis l'objet uploadé
-    try:
-        df = pd.read_csv(uploaded_file, sep=";", encoding='latin1')
-    except Exception as e:
-        st.error(f"Erreur lors de la lecture du fichier CSV : {e}")
-        st.error("Veuillez vérifier que le fichier est un CSV valide, avec le séparateur ';' et l'encodage 'latin1'.")
-        st.stop()
-        
-    # Supprimer les colonnes inutiles
-    df.drop(columns=['AQTE1', 'ATTC1', 'AHT1', 'AQTE2', 'ATTC2', 'AHT2'], inplace=True, errors='ignore')
+    # Réutiliser le résultat agrégé du cache disque si ce journal a déjà été traité
+    with mesurer('Lecture du cache disque') as etape:
+        df_cache = lire_cache(empreinte)
+        etape['lignes'] = 0 if df_cache is None else len(df_cache)
+    if df_cache is not None:
+        return df_cache
 
-    # Nettoyage des données
     try:
-        df['Total HT'] = df['Total HT'].str.replace(',', '.', regex=False)
-        df['TVA'] = df['TVA'].str.replace(',', '.', regex=False)
-        df['Total TTC'] = df['Total TTC'].str.replace(',', '.', regex=False)
-        
-        df['Total HT'] = pd.to_numeric(df['Total HT'])
-        df['TVA'] = pd.to_numeric(df['TVA'])
-        df['Total TTC'] = pd.to_numeric(df['Total TTC'])
-        df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
-        
-        df = df.rename(columns={
-            'Total HT': 'Total_HT',
-            'Total TTC': 'Total_TTC',
-            'Code établissement': 'Code_établissement'
-        })
-        
-        df['Quantité'] = pd.to_numeric(df['Quantité'], errors='coerce').fillna(0)
-
-    except KeyError as e:
-        st.error(f"Erreur : Colonne manquante dans le fichier chargé : {e}.")
-        st.stop()
-    except Exception as e:
-        st.error(f"Erreur lors du nettoyage des données : {e}")
+        with mesurer('Chargement du journal') as etape:
+            df_aggregated = charger_journal(uploaded_file)
+            etape['lignes'] = len(df_aggregated)
+    except ErreurChargement as e:
+        st.error(str(e))
+        if e.conseil:
+            st.error(e.conseil)
         st.stop()
     
-    # Appliquer le nettoyage des articles
-    df['Libellé_Original'] = df['Libellé'].copy()  # Garder une copie originale
-    df['Libellé_Nettoyé'] = df['Libellé'].apply(nettoyer_article)
-
-    # Fonction de Catégorisation
-    def categoriser_article(libelle):
-        libelle = str(libelle).lower()
-        
-        # Catégories existantes...
-        if any(keyword in libelle for keyword in ['café', 'coffee', 'espresso', 'latte', 'dèca', 'chocolat viennois', 'hot chocolat', 'tisane', 'verveine', 'déca', 'cappucino', 'glass of milk']):
-            return 'Boisson Chaude - Café/Chocolat'
-        if any(keyword in libelle for keyword in ['tea', 'thé', 'earl grey', 'green tea', 'mariage', 'mint tea', 'fruits rouges']):
-            return 'Boisson Chaude - Thé'
-        if any(keyword in libelle for keyword in ['coke', 'cola', 'sprite', 'schweppes', 'diabolo', 'orangina', 'powerade', 'syrop', 'ice tea', 'ginger beer', 'choose', 'pint choose']):
-            return 'Boisson Froide - Soda/Jus'
-        if any(keyword in libelle for keyword in ['jus', 'juice', 'orange', 'pomme', 'apple', 'tomato', 'apricot', 'cranberry', 'pamplemousse']):
-            return 'Boisson Froide - Jus de Fruit'
-        if any(keyword in libelle for keyword in ['cristaline', 'badoit', 'perrier', 'evian']):
-            return 'Boisson Froide - Eau'
-
-        if any(keyword in libelle for keyword in ['whiskey', 'rhum', 'cognac', 'porto', 'pastis', 'gin', 'martini', 'whisky', 'ricard']):
-            return 'Alcool - Spiritueux'
-        if any(keyword in libelle for keyword in ['wine', 'saumur', 'bourgueil', 'pinot noir', 'merlot', 'rosé', 'mâcon', 'viognier', 'sancerre', 'château', 'champigny', 'gris blanc', 'vezelay', 'chardonnay', 'marquis de mores', 'sauvignon']):
-            return 'Alcool - Vin'
-        if any(keyword in libelle for keyword in ['bière', 'beer', 'pint', 'lager', 'adnams', 'theakston', 'brooklyn', 'guinness', 'brewdog', '1664', 'pils', 'la folie douce']):
-            return 'Alcool - Bière'
-        if any(keyword in libelle for keyword in ['champagne', 'prosecco', 'vin petillant']):
-            return 'Alcool - Effervescent'
-        if any(keyword in libelle for keyword in ['cocktail']):
-            return 'Alcool - Cocktail'
-            
-        if any(keyword in libelle for keyword in ['cookie', 'muffin', 'cake', 'brownie', 'pie', 'crumble', 'viennoiserie', 'biscuit', 'croissant', 'pain d epice', 'frangipane', 'cupcake', 'lemon bars', 'lemon poppyseed loaf']):
-            return 'Pâtisserie/Sucré'
-        if any(keyword in libelle for keyword in ['mars', 'twix', 'kinder bueno', 'kit kat', 'lolly pops', 'magnum', 'cornetto', 'twister', 'haribo', 'lion king', 'rocket', 'marshmallow']):
-            return 'Glace/Confiserie'
-            
-        if any(keyword in libelle for keyword in ['quiche', 'gnocchi', 'lasagna', 'chili', 'nuggets', 'lil\'fries', 'crisps', 'terrîne', 'hot dog', 'gaspacho']):
-            return 'Plat/Snack Salé'
-        
-        if any(keyword in libelle for keyword in ['plat à', 'plat 11', 'plat 13']):
-            return 'Plat du Jour'
-        if any(keyword in libelle for keyword in ['terrine', 'vrai & bon pot']):
-            return 'Bocaux'
-
-        if any(keyword in libelle for keyword in ['entree', 'fee', 'vigik', 'corkage', 'tennis', 'squash', 'social', 'member', 'adult', 'bridge', 'snooker', 'remboursement', 'mini viennoiserie', 'cuff links', 'polo', 'bbq', 'cutlery']):
-            return 'Service / Frais / Activité'
-        if any(keyword in libelle for keyword in ['balle', 'balls']):
-            return 'Matériel'
-        if any(keyword in libelle for keyword in ['not used']):
-            return 'Hors Catégorie' 
-
-        return 'Autre'
-
-    # Appliquer la catégorisation sur les libellés nettoyés
-    try:
-        df['Catégorie'] = df['Libellé_Nettoyé'].apply(categoriser_article)
-    except KeyError:
-        st.error("Erreur : La colonne 'Libellé' est manquante dans le fichier chargé.")
-        st.stop()
-    
-    # --- REGROUPEMENT DES ARTICLES IDENTIQUES APRES NETTOYAGE ---
-    # Agrégation des données par libellé nettoyé et catégorie
-    df_aggregated = df.groupby(['Libellé_Nettoyé', 'Catégorie', 'Date', 'Code_établissement']).agg({
-        'Quantité': 'sum',
-        'Total_HT': 'sum',
-        'TVA': 'sum',
-        'Total_TTC': 'sum',
-        'Libellé_Original': 'first'  # Garder le premier libellé original pour référence
-    }).reset_index()
-    
-    # Renommer la colonne Libellé_Nettoyé en Libellé pour l'utilisation dans le dashboard
-    df_aggregated = df_aggregated.rename(columns={'Libellé_Nettoyé': 'Libellé'})
+    # Sauvegarder le résultat pour les prochains chargements du même fichier
+    with mesurer('Écriture du cache disque'):
+        ecrire_cache(empreinte, df_aggregated)
     
     return df_aggregated
 
-# --- Fonctions pour la page de comparaison ---
-def create_comparison_kpis(df1, df2, nom_periode1, nom_periode2):
-    """Crée un tableau comparatif des KPIs entre deux périodes"""
-    
-    def calculate_kpis(df):
-        if df.empty:
-            return {
-                'CA_TTC': 0, 'CA_HT': 0, 'Quantite': 0, 
-                'Prix_Moyen': 0, 'Nb_Articles': 0, 'Nb_Categories': 0
-            }
-        
-        total_ttc = df['Total_TTC'].sum()
-        total_ht = df['Total_HT'].sum()
-        total_quantite = df['Quantité'].sum()
-        prix_moyen = total_ttc / total_quantite if total_quantite > 0 else 0
-        nb_articles = df['Libellé'].nunique()
-        nb_categories = df['Catégorie'].nunique()
-        
-        return {
-            'CA_TTC': total_ttc,
-            'CA_HT': total_ht,
-            'Quantite': total_quantite,
-            'Prix_Moyen': prix_moyen,
-            'Nb_Articles': nb_articles,
-            'Nb_Categories': nb_categories
-        }
-    
-    kpis1 = calculate_kpis(df1)
-    kpis2 = calculate_kpis(df2)
-    
-    # Calcul des écarts
-    ecarts = {}
-    for key in kpis1.keys():
-        if kpis1[key] != 0:
-            ecart_pourcentage = ((kpis2[key] - kpis1[key]) / kpis1[key]) * 100
-        else:
-            ecart_pourcentage = 0
-        ecarts[key] = ecart_pourcentage
-    
-    # Création du tableau comparatif
-    comparison_data = {
-        'Indicateur': [
-            "Chiffre d'Affaires TTC (€)",
-            "Chiffre d'Affaires HT (€)", 
-            "Volume d'Articles Vendus",
-            "Prix Moyen par Article (€)",
-            "Nombre d'Articles Différents",
-            "Nombre de Catégories"
-        ],
-        nom_periode1: [
-            f"{kpis1['CA_TTC']:,.2f}",
-            f"{kpis1['CA_HT']:,.2f}",
-            f"{kpis1['Quantite']:,.0f}",
-            f"{kpis1['Prix_Moyen']:,.2f}",
-            f"{kpis1['Nb_Articles']:,.0f}",
-            f"{kpis1['Nb_Categories']:,.0f}"
-        ],
-        nom_periode2: [
-            f"{kpis2['CA_TTC']:,.2f}",
-            f"{kpis2['CA_HT']:,.2f}",
-            f"{kpis2['Quantite']:,.0f}",
-            f"{kpis2['Prix_Moyen']:,.2f}",
-            f"{kpis2['Nb_Articles']:,.0f}",
-            f"{kpis2['Nb_Categories']:,.0f}"
-        ],
-        'Évolution (%)': [
-            f"{ecarts['CA_TTC']:+.1f}%",
-            f"{ecarts['CA_HT']:+.1f}%", 
-            f"{ecarts['Quantite']:+.1f}%",
-            f"{ecarts['Prix_Moyen']:+.1f}%",
-            f"{ecarts['Nb_Articles']:+.1f}%",
-            f"{ecarts['Nb_Categories']:+.1f}%"
-        ]
-    }
-    
-    return pd.DataFrame(comparison_data)
-
-def create_comparison_chart(df1, df2, nom_periode1, nom_periode2, chart_type='top_categories'):
-    """Crée un graphique comparatif"""
-    
-    if chart_type == 'top_categories':
-        # Top 10 catégories comparées
-        cat1 = df1.groupby('Catégorie')['Total_TTC'].sum().nlargest(10)
-        cat2 = df2.groupby('Catégorie')['Total_TTC'].sum().nlargest(10)
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            name=nom_periode1,
-            x=cat1.values,
-            y=cat1.index,
-            orientation='h',
-            marker_color='blue'
-        ))
-        
-        fig.add_trace(go.Bar(
-            name=nom_periode2,
-            x=cat2.values,
-            y=cat2.index,
-            orientation='h',
-            marker_color='red'
-        ))
-        
-        fig.update_layout(
-            title="Top 10 Catégories - Comparaison",
-            barmode='group',
-            height=400
+# --- Registre partagé des jeux de données ---
+@st.cache_resource
+def obtenir_registre():
+    """Registre unique pour tout le serveur : un seul exemplaire de chaque jeu, partagé par les sessions"""
+    return RegistreJeux()
+
+def charger_fichier(uploaded_file):
+    """Place un journal dans le registre (chargé une seule fois par contenu) et retourne sa clé et ses données"""
+    empreinte = empreinte_contenu(uploaded_file.getvalue())
+    return empreinte, obtenir_registre().obtenir(empreinte, lambda: load_data(uploaded_file, empreinte))
+
+def relire_journal(empreinte):
+    """Relit un journal évincé du registre depuis le cache disque, ou depuis le fichier de la session"""
+    df = lire_cache(empreinte)
+    fichier = st.session_state.uploaded_file
+    if df is None and fichier is not None and empreinte_contenu(fichier.getvalue()) == empreinte:
+        df = load_data(fichier, empreinte)
+    return df
+
+def reconstruire_jeu(cle):
+    """Reconstruit un jeu évincé du registre à partir de ses journaux (principal puis ajouts)"""
+    empreintes = cle.split('+')
+    if len(empreintes) == 1:
+        return relire_journal(cle)
+
+    registre = obtenir_registre()
+    df = registre.obtenir(empreintes[0], lambda: relire_journal(empreintes[0]))
+    for empreinte in empreintes[1:]:
+        df_ajout = registre.obtenir(empreinte, lambda: relire_journal(empreinte))
+        if df is None or df_ajout is None:
+            return None
+        df = fusionner_journaux(df, df_ajout)
+    return df
+
+def changer_jeu(cle):
+    """Fait pointer la session sur un autre jeu du registre (None : aucun jeu)"""
+    registre = obtenir_registre()
+    registre.liberer(st.session_state.cle_jeu, st.session_state.id_session)
+    registre.acquerir(cle, st.session_state.id_session)
+    st.session_state.cle_jeu = cle
+
+def jeu_courant():
+    """Données du jeu de la session, lues dans le registre partagé (None si aucun jeu n'est chargé)"""
+    cle = st.session_state.cle_jeu
+    if cle is None:
+        return None
+    # Chaque exécution de la page renouvelle la référence de la session (elle expire sinon)
+    obtenir_registre().acquerir(cle, st.session_state.id_session)
+    with mesurer('Jeu de données') as etape:
+        df = obtenir_registre().obtenir(cle, lambda: reconstruire_jeu(cle))
+        etape['lignes'] = 0 if df is None else len(df)
+    if df is None:
+        st.warning("⚠️ Les données chargées ne sont plus disponibles. Veuillez recharger le fichier.")
+        changer_jeu(None)
+        st.session_state.uploaded_file = None
+        st.session_state.journaux_ajoutes = []
+    return df
+
+# --- Ajout incrémental d'un journal quotidien ---
+def ajouter_journal(cle_ajout, df_ajout):
+    """
+    Enregistre le jeu courant complété par un journal et retourne sa clé. Ses partitions,
+    son index des articles et son cube sont déduits de ceux du jeu courant : seules les
+    partitions des établissements de l'ajout sont refaites, l'historique n'est ni retrié
+    ni réagrégé. Les dérivés absents du registre seront construits à la demande.
+    """
+    df_existant = jeu_courant()
+    if df_existant is None:
+        return cle_ajout
+    cle = st.session_state.cle_jeu
+    nouvelle_cle = f"{cle}+{cle_ajout}"
+    registre = obtenir_registre()
+
+    def fusionner():
+        with mesurer('Ajout du journal') as etape:
+            df_fusion, partitions = fusionner_partitions(df_existant, obtenir_partitions(df_existant), df_ajout)
+            registre.enregistrer(f"{nouvelle_cle}#partitions", partitions)
+            index_art = registre.obtenir(f"{cle}#articles")
+            if index_art is not None:
+                # Des jours déjà chargés ont été remplacés : des articles ont pu disparaître
+                remplaces = len(df_fusion) < len(df_existant) + len(df_ajout)
+                registre.enregistrer(f"{nouvelle_cle}#articles",
+                                     fusionner_index_articles(index_art, df_ajout, df_fusion if remplaces else None))
+            cube = registre.obtenir(f"{cle}#cube")
+            if cube is not None:
+                registre.enregistrer(f"{nouvelle_cle}#cube", fusionner_cube(cube, df_ajout))
+            etape['lignes'] = len(df_ajout)
+        return df_fusion
+
+    registre.obtenir(nouvelle_cle, fusionner)
+    return nouvelle_cle
+
+def afficher_ajout_journal(key):
+    """Ajoute l'export d'une journée au jeu de données chargé sans retraiter l'historique"""
+    with st.expander("➕ Ajouter un journal (export quotidien)"):
+        fichier_ajout = st.file_uploader(
+            "Glissez-déposez le journal à ajouter aux données chargées",
+            type=["csv"],
+            help="Seul le nouveau fichier est traité. Les jours déjà présents pour un même établissement sont remplacés.",
+            key=key
         )
-        
-    elif chart_type == 'repartition':
-        # Répartition par catégorie
-        repart1 = df1.groupby('Catégorie')['Total_TTC'].sum()
-        repart2 = df2.groupby('Catégorie')['Total_TTC'].sum()
-        
-        fig = make_subplots(
-            rows=1, cols=2,
-            subplot_titles=[nom_periode1, nom_periode2],
-            specs=[[{'type':'pie'}, {'type':'pie'}]]
+
+    if fichier_ajout is not None and fichier_ajout.file_id not in st.session_state.journaux_ajoutes:
+        cle_ajout, df_ajout = charger_fichier(fichier_ajout)
+        nouvelle_cle = ajouter_journal(cle_ajout, df_ajout)
+        st.session_state.journaux_ajoutes.append(fichier_ajout.file_id)
+        changer_jeu(nouvelle_cle)
+        # Laisser les anomalies du journal ajouté affichées plutôt que de relancer la page
+        if not afficher_anomalies(df_ajout):
+            st.rerun()
+
+# --- Mémoire des données chargées ---
+def afficher_memoire(df_complet):
+    """Affiche la mémoire occupée par les données chargées et le gain de la représentation compacte"""
+    memoire = df_complet.attrs.get('memoire')
+    if memoire and memoire['avant'] > memoire['apres']:
+        st.caption(
+            f"💾 Données en mémoire : {memoire['apres'] / 1e6:,.1f} Mo "
+            f"au lieu de {memoire['avant'] / 1e6:,.1f} Mo "
+            f"({1 - memoire['apres'] / memoire['avant']:.0%} économisés)"
         )
-        
-        fig.add_trace(go.Pie(
-            labels=repart1.index,
-            values=repart1.values,
-            name=nom_periode1
-        ), 1, 1)
-        
-        fig.add_trace(go.Pie(
-            labels=repart2.index,
-            values=repart2.values,
-            name=nom_periode2
-        ), 1, 2)
-        
-        fig.update_layout(height=400)
-        
-    return fig
-
-def filter_data(df_complet, date_debut, date_fin, selected_categories, selected_articles):
-    """Filtre les données selon les critères"""
-    return df_complet[
-        (df_complet['Date'] >= pd.to_datetime(date_debut)) &
-        (df_complet['Date'] <= pd.to_datetime(date_fin)) &
-        (df_complet['Catégorie'].isin(selected_categories)) &
-        (df_complet['Libellé'].isin(selected_articles))
-    ]
-
-def get_valid_default_articles(default_articles, available_articles):
-    """Retourne uniquement les articles par défaut qui existent dans la liste disponible"""
-    return [article for article in default_articles if article in available_articles]
-
-# --- Fonction pour créer un PDF de comparaison ---
-def create_comparison_pdf(df_periode1, df_periode2, nom_periode1, nom_periode2, 
-                            date_debut1, date_fin1, date_debut2, date_fin2,
-                            selected_categories1, selected_articles1,
-                            selected_categories2, selected_articles2,
-                            comparison_df, fig_comp_cat, fig_comp_rep):
-    """Crée un rapport PDF complet pour l'analyse comparative"""
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), 
-                            topMargin=0.5*inch, bottomMargin=0.5*inch,
-                            leftMargin=0.5*inch, rightMargin=0.5*inch)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé pour le titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#2E86AB'),
-        spaceAfter=20,
-        alignment=1  # Centré
+
+# --- Anomalies de lecture ---
+def afficher_anomalies(df_charge):
+    """Signale les cellules invalides rencontrées au chargement, avec leur numéro de ligne. Retourne True s'il y en a."""
+    anomalies = df_charge.attrs.get('anomalies')
+    if not anomalies or not anomalies['nombre']:
+        return False
+
+    details = "\n".join(
+        f"- ligne {anomalie['ligne']} : {anomalie['colonne']} = « {anomalie['valeur']} »"
+        for anomalie in anomalies['exemples'][:10]
     )
-    
-    # Style pour les sous-titres
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#2E86AB'),
-        spaceAfter=12,
-        spaceBefore=12
+    if anomalies['nombre'] > 10:
+        details += f"\n- … et {anomalies['nombre'] - 10} autre(s)"
+    st.warning(
+        f"⚠️ {anomalies['nombre']} cellule(s) invalide(s) dans le fichier. Les lignes sans date ou montant "
+        f"valide ont été ignorées, les quantités invalides comptées à 0.\n\n{details}"
     )
-    
-    # Style pour le texte normal
-    normal_style = styles['Normal']
-    
-    # En-tête du rapport
-    title = Paragraph("🆚 RAPPORT COMPARATIF DES VENTES", title_style)
-    story.append(title)
-    
-    # Périodes comparées
-    period_text = f"Comparaison : {nom_periode1} vs {nom_periode2}"
-    period = Paragraph(period_text, normal_style)
-    story.append(period)
-    
-    date_generation = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-    generation = Paragraph(date_generation, normal_style)
-    story.append(generation)
-    
-    story.append(Spacer(1, 20))
-    
-    # --- Section 1: Périodes comparées ---
-    story.append(Paragraph("📅 PÉRIODES COMPARÉES", subtitle_style))
-    
-    period_data = [
-        ['Paramètre', nom_periode1, nom_periode2],
-        ['Date de début', date_debut1.strftime('%d/%m/%Y'), date_debut2.strftime('%d/%m/%Y')],
-        ['Date de fin', date_fin1.strftime('%d/%m/%Y'), date_fin2.strftime('%d/%m/%Y')],
-        ['Catégories sélectionnées', str(len(selected_categories1)), str(len(selected_categories2))],
-        ['Articles sélectionnés', str(len(selected_articles1)), str(len(selected_articles2))]
-    ]
-    
-    period_table = Table(period_data, colWidths=[200, 150, 150])
-    period_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    story.append(period_table)
-    story.append(Spacer(1, 20))
-    
-    # --- Section 2: Comparaison des Indicateurs Clés ---
-    story.append(Paragraph("📈 COMPARAISON DES INDICATEURS CLÉS", subtitle_style))
-    
-    # Convertir le DataFrame de comparaison en tableau PDF
-    if not comparison_df.empty:
-        kpi_data = [comparison_df.columns.tolist()] + comparison_df.values.tolist()
-        kpi_table = Table(kpi_data, colWidths=[200, 120, 120, 100])
-        kpi_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('TEXTCOLOR', (-1, 1), (-1, -1), colors.red)  # Couleur pour les évolutions
-        ]))
-        story.append(kpi_table)
-    story.append(Spacer(1, 20))
-    
-    # --- Section 3: Graphiques comparatifs ---
-    story.append(Paragraph("🆚 GRAPHIQUES COMPARATIFS", subtitle_style))
-    
-    # Graphique des top catégories
-    if fig_comp_cat:
-        try:
-            story.append(Paragraph("Top 10 Catégories Comparées", subtitle_style))
-            img_buffer = plotly_fig_to_image(fig_comp_cat, width=700, height=350)
-            img = Image(img_buffer, width=6.5*inch, height=3*inch)
-            story.append(img)
-            story.append(Spacer(1, 10))
-        except Exception as e:
-            error_msg = Paragraph(f"Erreur lors de la génération du graphique Top Catégories: {e}", normal_style)
-            story.append(error_msg)
-    
-    story.append(Spacer(1, 15))
-    
-    # Graphique de répartition
-    if fig_comp_rep:
-        try:
-            story.append(Paragraph("Répartition par Catégorie", subtitle_style))
-            img_buffer = plotly_fig_to_image(fig_comp_rep, width=700, height=350)
-            img = Image(img_buffer, width=6.5*inch, height=3*inch)
-            story.append(img)
-            story.append(Spacer(1, 10))
-        except Exception as e:
-            error_msg = Paragraph(f"Erreur lors de la génération du graphique de répartition: {e}", normal_style)
-            story.append(error_msg)
-    
-    story.append(Spacer(1, 15))
-    
-    # --- Section 4: Top Articles ---
-    story.append(Paragraph("🏆 TOP 10 ARTICLES PAR PÉRIODE", subtitle_style))
-    
-    # Top articles période 1
-    top_art1 = df_periode1.groupby('Libellé')['Total_TTC'].sum().nlargest(10)
-    top_art2 = df_periode2.groupby('Libellé')['Total_TTC'].sum().nlargest(10)
-    
-    # Préparer les données pour le tableau
-    max_rows = max(len(top_art1), len(top_art2))
-    articles_data = [['Classement', nom_periode1, 'CA (€)', nom_periode2, 'CA (€)']]
-    
-    for i in range(max_rows):
-        row = [str(i+1)]
-        
-        # Période 1
-        if i < len(top_art1):
-            article1 = list(top_art1.items())[i]
-            row.extend([article1[0], f"{article1[1]:,.2f}"])
-        else:
-            row.extend(['', ''])
-        
-        # Période 2
-        if i < len(top_art2):
-            article2 = list(top_art2.items())[i]
-            row.extend([article2[0], f"{article2[1]:,.2f}"])
+    return True
+
+# --- Partitions par établissement du jeu de données courant ---
+def obtenir_partitions(df_complet):
+    """Positions des partitions par établissement du jeu courant, calculées une seule fois par jeu"""
+    cle_partitions = f"{st.session_state.cle_jeu}#partitions"
+    with mesurer('Partitions'):
+        return obtenir_registre().obtenir(cle_partitions, lambda: index_partitions(df_complet))
+
+# --- Index des articles par catégorie du jeu de données courant ---
+def obtenir_index_articles(df_complet):
+    """Catégories et articles de chaque catégorie du jeu courant, indexés une seule fois par jeu"""
+    cle_index = f"{st.session_state.cle_jeu}#articles"
+    with mesurer('Index des articles'):
+        return obtenir_registre().obtenir(cle_index, lambda: index_articles(df_complet))
+
+# --- Indicateurs clés mémorisés par état des filtres ---
+def cle_indicateurs(*filtres):
+    """Clé des indicateurs d'une vue : jeu courant et état des filtres qui l'ont produite"""
+    return identifiant_travail('indicateurs', st.session_state.cle_jeu, *filtres)
+
+# --- Sélections de catégories et d'articles ---
+def recoder_selections(index_art):
+    """
+    Les catégories et articles sélectionnés sont conservés en codes de l'index du jeu courant.
+    Après un changement de jeu, ils sont traduits par l'index du jeu précédent, ou remplacés
+    par la sélection complète si cet index n'est plus en mémoire.
+    """
+    cle_precedente = st.session_state.get('jeu_selections')
+    st.session_state.jeu_selections = st.session_state.cle_jeu
+    if cle_precedente is None or cle_precedente == st.session_state.cle_jeu:
+        return
+    index_precedent = obtenir_registre().obtenir(f"{cle_precedente}#articles")
+
+    selections = [(st.session_state, 'selected_categories', 'categories', 'codes_categories'),
+                  (st.session_state, 'selected_articles', 'tous', 'codes_articles')]
+    for cle_filtres in ('periode1_filters', 'periode2_filters'):
+        if cle_filtres in st.session_state:
+            filtres = st.session_state[cle_filtres]
+            selections += [(filtres, 'categories', 'categories', 'codes_categories'),
+                           (filtres, 'articles', 'tous', 'codes_articles')]
+    for conteneur, cle, liste, codes in selections:
+        if cle not in conteneur:
+            continue
+        if index_precedent is None:
+            conteneur[cle] = np.arange(len(index_art[liste]), dtype=np.int32)
         else:
-            row.extend(['', ''])
-        
-        articles_data.append(row)
-    
-    articles_table = Table(articles_data, colWidths=[60, 180, 80, 180, 80])
-    articles_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
-        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    story.append(articles_table)
-    
-    # Pied de page
-    story.append(Spacer(1, 20))
-    footer = Paragraph("Rapport comparatif généré automatiquement par le Dashboard d'Analyse des Ventes - Téo Desquatrevaux © 2025", normal_style)
-    story.append(footer)
-    
-    # Génération du PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-# --- Fonction pour convertir un graphique Plotly en image ---
-def plotly_fig_to_image(fig, width=800, height=400):
-    """Convertit un graphique Plotly en image PNG"""
-    img_bytes = pio.to_image(fig, format='png', width=width, height=height)
-    return BytesIO(img_bytes)
+            conteneur[cle] = coder_selection(decoder_selection(conteneur[cle], index_precedent[liste]), index_art[codes])
+
+# --- Cube journalier du jeu de données courant ---
+def obtenir_cube(df_complet):
+    """Retourne le cube journalier du jeu courant, construit une seule fois par jeu de données et partagé"""
+    cle_cube = f"{st.session_state.cle_jeu}#cube"
+    with mesurer('Cube journalier'):
+        return obtenir_registre().obtenir(cle_cube, lambda: construire_cube(df_complet))
+
+# --- Génération des rapports en arrière-plan ---
+@st.cache_resource
+def obtenir_file_rapports():
+    """File des rapports PDF, unique pour tout le serveur (les demandes identiques sont partagées)"""
+    return FileRapports()
+
+def pdf_en_octets(creer_pdf, *args):
+    """Construit un rapport PDF et retourne son contenu (résultat d'un travail de la file, mesuré)"""
+    with Mesures(rapport=creer_pdf.__name__):
+        return creer_pdf(*args).getvalue()
+
+def afficher_travail_rapport(id_travail, label, nom_fichier, aide):
+    """Suit la génération d'un rapport (actualisation chaque seconde) puis propose son téléchargement"""
+    file_rapports = obtenir_file_rapports()
+    suivi_actif = file_rapports.statut(id_travail) in (EN_ATTENTE, EN_COURS)
+
+    @st.fragment(run_every=1 if suivi_actif else None)
+    def suivre_travail():
+        statut = file_rapports.statut(id_travail)
+        if statut in (EN_ATTENTE, EN_COURS):
+            st.info(f"⏳ Génération du rapport PDF en cours... ({file_rapports.duree(id_travail):.0f} s)")
+        elif suivi_actif:
+            # Génération terminée : relancer la page pour arrêter l'actualisation
+            st.rerun()
+        elif statut == TERMINE:
+            st.download_button(
+                label=label,
+                data=file_rapports.resultat(id_travail),
+                file_name=nom_fichier,
+                mime="application/pdf",
+                help=aide,
+                use_container_width=True
+            )
+        elif statut == ERREUR:
+            st.error(f"Erreur lors de la génération du PDF : {file_rapports.erreur(id_travail)}")
+
+    suivre_travail()
+
+# --- Mesures de performance ---
+def afficher_mesures(mesures):
+    """Termine les mesures de l'exécution et, sur demande, les affiche dans la barre latérale"""
+    resume = mesures.terminer()
+    st.sidebar.markdown("---")
+    if not st.sidebar.checkbox("🔧 Mesures de performance", key="afficher_mesures",
+                               help="Durée, lignes et variation de la mémoire de chaque étape de cette exécution"):
+        return
+    with st.sidebar.expander("Mesures de l'exécution", expanded=True):
+        st.caption(f"⏱️ {resume['duree_ms']:,.0f} ms au total"
+                   + (f" · mémoire résidente {resume['memoire_residente_mo']:,.0f} Mo"
+                      if 'memoire_residente_mo' in resume else ""))
+        etapes = pd.DataFrame(mesures.etapes, columns=['etape', 'duree_ms', 'lignes', 'memoire_mo'])
+        etapes['lignes'] = etapes['lignes'].astype('Int64')
+        etapes.columns = ['Étape', 'Durée (ms)', 'Lignes', 'Mémoire (Mo)']
+        st.dataframe(etapes, hide_index=True, use_container_width=True)
 
 # --- Page Comparaison ---
 if page == "🆚 Comparaison":
@@ -688,13 +468,26 @@ if page == "🆚 Comparaison":
     
     # Afficher le fichier actuellement chargé
     if st.session_state.uploaded_file is not None:
-        st.success(f"📁 Fichier chargé : {st.session_state.uploaded_file.name}")
+        nb_ajouts = len(st.session_state.journaux_ajoutes)
+        st.success(f"📁 Fichier chargé : {st.session_state.uploaded_file.name}"
+                   + (f" (+ {nb_ajouts} journal(aux) ajouté(s))" if nb_ajouts else ""))
+        
+        # Mémoire occupée par les données chargées et cellules invalides ignorées au chargement
+        df_complet = jeu_courant()
+        if df_complet is not None:
+            afficher_memoire(df_complet)
+            afficher_anomalies(df_complet)
         
         # Bouton pour supprimer le fichier chargé
         if st.button("🗑️ Supprimer le fichier chargé"):
             st.session_state.uploaded_file = None
-            st.session_state.df_complet = None
+            changer_jeu(None)
+            st.session_state.journaux_ajoutes = []
             st.rerun()
+        
+        # Ajout incrémental d'un export quotidien aux données déjà chargées
+        if df_complet is not None:
+            afficher_ajout_journal(key="comparison_ajout")
     
     uploaded_file = st.file_uploader(
         "Glissez-déposez votre journal des ventes (CSV) ici",
@@ -707,13 +500,15 @@ if page == "🆚 Comparaison":
     if uploaded_file is not None:
         # Si un nouveau fichier est chargé, mettre à jour le session_state
         if uploaded_file != st.session_state.uploaded_file:
+            cle, _ = charger_fichier(uploaded_file)
             st.session_state.uploaded_file = uploaded_file
-            st.session_state.df_complet = load_data(uploaded_file)
+            changer_jeu(cle)
+            st.session_state.journaux_ajoutes = []
             st.rerun()
     
-    # Utiliser les données du session_state si disponibles
-    if st.session_state.df_complet is not None:
-        df_complet = st.session_state.df_complet
+    # Utiliser les données du jeu de la session si disponibles
+    df_complet = jeu_courant()
+    if df_complet is not None:
         
         st.markdown("---")
         
@@ -721,20 +516,28 @@ if page == "🆚 Comparaison":
         col1, col2 = st.columns(2)
         
         # Initialisation des sessions states pour les filtres de comparaison
+        partitions = obtenir_partitions(df_complet)
+        all_etablissements = list(partitions)
+        index_art = obtenir_index_articles(df_complet)
+        recoder_selections(index_art)
+        
+        # Catégories et articles des filtres conservés en codes de l'index (toutes et tous par défaut)
         if 'periode1_filters' not in st.session_state:
             st.session_state.periode1_filters = {
                 'date_debut': df_complet['Date'].min().date(),
                 'date_fin': df_complet['Date'].max().date(),
-                'categories': list(df_complet['Catégorie'].unique()),
-                'articles': list(df_complet['Libellé'].unique())
+                'etablissements': all_etablissements,
+                'categories': np.arange(len(index_art['categories']), dtype=np.int32),
+                'articles': np.arange(len(index_art['tous']), dtype=np.int32)
             }
         
         if 'periode2_filters' not in st.session_state:
             st.session_state.periode2_filters = {
                 'date_debut': df_complet['Date'].min().date(),
                 'date_fin': df_complet['Date'].max().date(),
-                'categories': list(df_complet['Catégorie'].unique()),
-                'articles': list(df_complet['Libellé'].unique())
+                'etablissements': all_etablissements,
+                'categories': np.arange(len(index_art['categories']), dtype=np.int32),
+                'articles': np.arange(len(index_art['tous']), dtype=np.int32)
             }
         
         # Variables pour stocker les graphiques comparatifs
@@ -769,49 +572,56 @@ if page == "🆚 Comparaison":
             # Filtres Période 1
             st.subheader("🎯 Filtres")
             
+            # Établissements Période 1
+            selected_etablissements1 = st.multiselect(
+                "Établissements Période 1",
+                all_etablissements,
+                default=selection_valide(
+                    st.session_state.periode1_filters.get('etablissements', all_etablissements), all_etablissements),
+                key="etab_p1"
+            )
+            
             # Catégories Période 1
-            all_categories = sorted(df_complet['Catégorie'].unique())
+            all_categories = index_art['categories']
             cat_col1, cat_col2 = st.columns(2)
             with cat_col1:
                 if st.button("✅ Toutes P1", key="all_cat_p1"):
-                    st.session_state.periode1_filters['categories'] = all_categories
+                    st.session_state.periode1_filters['categories'] = np.arange(len(all_categories), dtype=np.int32)
                     st.rerun()
             with cat_col2:
                 if st.button("❌ Aucune P1", key="no_cat_p1"):
-                    st.session_state.periode1_filters['categories'] = []
+                    st.session_state.periode1_filters['categories'] = np.empty(0, dtype=np.int32)
                     st.rerun()
             
             selected_categories1 = st.multiselect(
                 "Catégories Période 1",
                 all_categories,
-                default=st.session_state.periode1_filters['categories'],
+                default=decoder_selection(st.session_state.periode1_filters['categories'], all_categories),
                 key="cat_p1"
             )
+            codes_categories1 = coder_selection(selected_categories1, index_art['codes_categories'])
             
-            # Articles Période 1
-            if selected_categories1:
-                articles_filtres1 = sorted(df_complet[df_complet['Catégorie'].isin(selected_categories1)]['Libellé'].unique())
-            else:
-                articles_filtres1 = sorted(df_complet['Libellé'].unique())
+            # Articles Période 1 (tous les articles si aucune catégorie n'est sélectionnée)
+            articles_filtres1 = articles_des_categories(index_art, selected_categories1)
             
-            # Obtenir les articles valides pour la sélection par défaut
-            default_articles1 = st.session_state.periode1_filters.get('articles', [])
-            valid_default_articles1 = get_valid_default_articles(default_articles1, articles_filtres1)
+            # Articles sélectionnés par défaut : ceux de la sélection appartenant aux catégories retenues
+            codes_defaut1 = codes_articles_valides(index_art, st.session_state.periode1_filters['articles'],
+                                                    codes_categories1)
             
             art_col1, art_col2 = st.columns(2)
             with art_col1:
                 if st.button("✅ Tous P1", key="all_art_p1"):
-                    st.session_state.periode1_filters['articles'] = articles_filtres1
+                    st.session_state.periode1_filters['articles'] = codes_articles_des_categories(index_art, codes_categories1)
                     st.rerun()
             with art_col2:
                 if st.button("❌ Aucun P1", key="no_art_p1"):
-                    st.session_state.periode1_filters['articles'] = []
+                    st.session_state.periode1_filters['articles'] = np.empty(0, dtype=np.int32)
                     st.rerun()
             
             selected_articles1 = st.multiselect(
                 "Articles Période 1",
                 articles_filtres1,
-                default=valid_default_articles1,
+                default=decoder_selection(codes_defaut1, index_art['tous']),
                 key="art_p1"
             )
             
@@ -819,27 +629,32 @@ if page == "🆚 Comparaison":
             st.session_state.periode1_filters.update({
                 'date_debut': date_debut1,
                 'date_fin': date_fin1,
-                'categories': selected_categories1,
-                'articles': selected_articles1
+                'etablissements': selected_etablissements1,
+                'categories': codes_categories1,
+                'articles': coder_selection(selected_articles1, index_art['codes_articles'])
             })
             
             # Application des filtres Période 1
-            df_periode1 = filter_data(df_complet, date_debut1, date_fin1, selected_categories1, selected_articles1)
+            with mesurer('Filtrage période 1') as etape:
+                df_periode1 = filter_data(df_complet, date_debut1, date_fin1, selected_categories1, selected_articles1,
+                                          selected_etablissements1, partitions)
+                etape['lignes'] = len(df_periode1)
             
             if not df_periode1.empty:
                 # KPIs Période 1
                 st.subheader("📈 Indicateurs Période 1")
-                total_ttc1 = df_periode1['Total_TTC'].sum()
-                total_ht1 = df_periode1['Total_HT'].sum()
-                total_quantite1 = df_periode1['Quantité'].sum()
-                prix_moyen1 = total_ttc1 / total_quantite1 if total_quantite1 > 0 else 0
-                
-                st.metric("CA TTC", f"{total_ttc1:,.2f} €")
-                st.metric("CA HT", f"{total_ht1:,.2f} €")
-                st.metric("Volume Vendu", f"{total_quantite1:,.0f}")
-                st.metric("Prix Moyen", f"{prix_moyen1:,.2f} €")
-                st.metric("Nb Articles", f"{df_periode1['Libellé'].nunique():,.0f}")
-                st.metric("Nb Catégories", f"{df_periode1['Catégorie'].nunique():,.0f}")
+                with mesurer('Indicateurs période 1'):
+                    filtres1 = st.session_state.periode1_filters
+                    kpis1 = indicateurs(df_periode1, cle_indicateurs(
+                        date_debut1, date_fin1, tuple(selected_etablissements1),
+                        filtres1['categories'].tobytes(), filtres1['articles'].tobytes()))
+                    
+                    st.metric("CA TTC", f"{kpis1['CA_TTC']:,.2f} €")
+                    st.metric("CA HT", f"{kpis1['CA_HT']:,.2f} €")
+                    st.metric("Volume Vendu", f"{kpis1['Quantite']:,.0f}")
+                    st.metric("Prix Moyen", f"{kpis1['Prix_Moyen']:,.2f} €")
+                    st.metric("Nb Articles", f"{kpis1['Nb_Articles']:,.0f}")
+                    st.metric("Nb Catégories", f"{kpis1['Nb_Categories']:,.0f}")
                 
             else:
                 st.warning("Aucune donnée pour la période 1 avec les filtres sélectionnés")
@@ -868,48 +683,55 @@ if page == "🆚 Comparaison":
             # Filtres Période 2
             st.subheader("🎯 Filtres")
             
+            # Établissements Période 2
+            selected_etablissements2 = st.multiselect(
+                "Établissements Période 2",
+                all_etablissements,
+                default=selection_valide(
+                    st.session_state.periode2_filters.get('etablissements', all_etablissements), all_etablissements),
+                key="etab_p2"
+            )
+            
             # Catégories Période 2
             cat_col1, cat_col2 = st.columns(2)
             with cat_col1:
                 if st.button("✅ Toutes P2", key="all_cat_p2"):
-                    st.session_state.periode2_filters['categories'] = all_categories
+                    st.session_state.periode2_filters['categories'] = np.arange(len(all_categories), dtype=np.int32)
                     st.rerun()
             with cat_col2:
                 if st.button("❌ Aucune P2", key="no_cat_p2"):
-                    st.session_state.periode2_filters['categories'] = []
+                    st.session_state.periode2_filters['categories'] = np.empty(0, dtype=np.int32)
                     st.rerun()
             
             selected_categories2 = st.multiselect(
                 "Catégories Période 2",
                 all_categories,
-                default=st.session_state.periode2_filters['categories'],
+                default=decoder_selection(st.session_state.periode2_filters['categories'], all_categories),
                 key="cat_p2"
             )
+            codes_categories2 = coder_selection(selected_categories2, index_art['codes_categories'])
             
-            # Articles Période 2
-            if selected_categories2:
-                articles_filtres2 = sorted(df_complet[df_complet['Catégorie'].isin(selected_categories2)]['Libellé'].unique())
-            else:
-                articles_filtres2 = sorted(df_complet['Libellé'].unique())
+            # Articles Période 2 (tous les articles si aucune catégorie n'est sélectionnée)
+            articles_filtres2 = articles_des_categories(index_art, selected_categories2)
             
-            # Obtenir les articles valides pour la sélection par défaut
-            default_articles2 = st.session_state.periode2_filters.get('articles', [])
-            valid_default_articles2 = get_valid_default_articles(default_articles2, articles_filtres2)
+            # Articles sélectionnés par défaut : ceux de la sélection appartenant aux catégories retenues
+            codes_defaut2 = codes_articles_valides(index_art, st.session_state.periode2_filters['articles'],
+                                                    codes_categories2)
             
             art_col1, art_col2 = st.columns(2)
             with art_col1:
                 if st.button("✅ Tous P2", key="all_art_p2"):
-                    st.session_state.periode2_filters['articles'] = articles_filtres2
+                    st.session_state.periode2_filters['articles'] = codes_articles_des_categories(index_art, codes_categories2)
                     st.rerun()
             with art_col2:
                 if st.button("❌ Aucun P2", key="no_art_p2"):
-                    st.session_state.periode2_filters['articles'] = []
+                    st.session_state.periode2_filters['articles'] = np.empty(0, dtype=np.int32)
                     st.rerun()
             
             selected_articles2 = st.multiselect(
                 "Articles Période 2",
                 articles_filtres2,
-                default=valid_default_articles2,
+                default=decoder_selection(codes_defaut2, index_art['tous']),
                 key="art_p2"
             )
             
@@ -917,27 +739,32 @@ if page == "🆚 Comparaison":
             st.session_state.periode2_filters.update({
                 'date_debut': date_debut2,
                 'date_fin': date_fin2,
-                'categories': selected_categories2,
-                'articles': selected_articles2
+                'etablissements': selected_etablissements2,
+                'categories': codes_categories2,
+                'articles': coder_selection(selected_articles2, index_art['codes_articles'])
             })
             
             # Application des filtres Période 2
-            df_periode2 = filter_data(df_complet, date_debut2, date_fin2, selected_categories2, selected_articles2)
+            with mesurer('Filtrage période 2') as etape:
+                df_periode2 = filter_data(df_complet, date_debut2, date_fin2, selected_categories2, selected_articles2,
+                                          selected_etablissements2, partitions)
+                etape['lignes'] = len(df_periode2)
             
             if not df_periode2.empty:
                 # KPIs Période 2
                 st.subheader("📈 Indicateurs Période 2")
-                total_ttc2 = df_periode2['Total_TTC'].sum()
-                total_ht2 = df_periode2['Total_HT'].sum()
-                total_quantite2 = df_periode2['Quantité'].sum()
-                prix_moyen2 = total_ttc2 / total_quantite2 if total_quantite2 > 0 else 0
-                
-                st.metric("CA TTC", f"{total_ttc2:,.2f} €")
-                st.metric("CA HT", f"{total_ht2:,.2f} €")
-                st.metric("Volume Vendu", f"{total_quantite2:,.0f}")
-                st.metric("Prix Moyen", f"{prix_moyen2:,.2f} €")
-                st.metric("Nb Articles", f"{df_periode2['Libellé'].nunique():,.0f}")
-                st.metric("Nb Catégories", f"{df_periode2['Catégorie'].nunique():,.0f}")
+                with mesurer('Indicateurs période 2'):
+                    filtres2 = st.session_state.periode2_filters
+                    kpis2 = indicateurs(df_periode2, cle_indicateurs(
+                        date_debut2, date_fin2, tuple(selected_etablissements2),
+                        filtres2['categories'].tobytes(), filtres2['articles'].tobytes()))
+                    
+                    st.metric("CA TTC", f"{kpis2['CA_TTC']:,.2f} €")
+                    st.metric("CA HT", f"{kpis2['CA_HT']:,.2f} €")
+                    st.metric("Volume Vendu", f"{kpis2['Quantite']:,.0f}")
+                    st.metric("Prix Moyen", f"{kpis2['Prix_Moyen']:,.2f} €")
+                    st.metric("Nb Articles", f"{kpis2['Nb_Articles']:,.0f}")
+                    st.metric("Nb Catégories", f"{kpis2['Nb_Categories']:,.0f}")
                 
             else:
                 st.warning("Aucune donnée pour la période 2 avec les filtres sélectionnés")
@@ -953,30 +780,35 @@ if page == "🆚 Comparaison":
             
             # Tableau comparatif des KPIs
             st.subheader("📋 Comparaison des Indicateurs Clés")
-            comparison_df = create_comparison_kpis(df_periode1, df_periode2, nom_periode1, nom_periode2)
-            st.dataframe(comparison_df, use_container_width=True)
+            with mesurer('Tableau comparatif'):
+                comparison_df = create_comparison_kpis(df_periode1, df_periode2, nom_periode1, nom_periode2,
+                                                       kpis1, kpis2)
+                st.dataframe(comparison_df, use_container_width=True)
             
             # Graphiques comparatifs
             col_comp1, col_comp2 = st.columns(2)
             
             with col_comp1:
                 st.subheader("🏆 Top Catégories Comparées")
-                fig_comp_cat = create_comparison_chart(
-                    df_periode1, df_periode2, nom_periode1, nom_periode2, 'top_categories'
-                )
-                st.plotly_chart(fig_comp_cat, use_container_width=True)
+                with mesurer('Graphique top catégories comparées'):
+                    fig_comp_cat = create_comparison_chart(
+                        df_periode1, df_periode2, nom_periode1, nom_periode2, 'top_categories'
+                    )
+                    st.plotly_chart(fig_comp_cat, use_container_width=True)
             
             with col_comp2:
                 st.subheader("💰 Répartition par Catégorie")
-                fig_comp_rep = create_comparison_chart(
-                    df_periode1, df_periode2, nom_periode1, nom_periode2, 'repartition'
-                )
-                st.plotly_chart(fig_comp_rep, use_container_width=True)
+                with mesurer('Graphique répartition comparée'):
+                    fig_comp_rep = create_comparison_chart(
+                        df_periode1, df_periode2, nom_periode1, nom_periode2, 'repartition'
+                    )
+                    st.plotly_chart(fig_comp_rep, use_container_width=True)
             
             # Top articles comparés
             st.subheader("📦 Top 10 Articles Comparés")
-            top_art1 = df_periode1.groupby('Libellé')['Total_TTC'].sum().nlargest(10)
-            top_art2 = df_periode2.groupby('Libellé')['Total_TTC'].sum().nlargest(10)
+            with mesurer('Top articles comparés'):
+                top_art1 = df_periode1.groupby('Libellé', observed=True)['Total_TTC'].sum().nlargest(10)
+                top_art2 = df_periode2.groupby('Libellé', observed=True)['Total_TTC'].sum().nlargest(10)
             
             col_art1, col_art2 = st.columns(2)
             with col_art1:
@@ -993,31 +825,40 @@ if page == "🆚 Comparaison":
             st.markdown("---")
             st.header("📥 Téléchargement du Rapport Comparatif")
             
-            # Bouton pour générer et télécharger le PDF comparatif
-            if st.button("📊 Générer le Rapport Comparatif PDF", use_container_width=True):
-                with st.spinner("Génération du rapport PDF en cours..."):
-                    try:
-                        pdf_buffer = create_comparison_pdf(
-                            df_periode1, df_periode2, nom_periode1, nom_periode2,
-                            date_debut1, date_fin1, date_debut2, date_fin2,
-                            selected_categories1, selected_articles1,
-                            selected_categories2, selected_articles2,
-                            comparison_df, fig_comp_cat, fig_comp_rep
-                        )
-                        
-                        st.download_button(
-                            label="📥 Télécharger le Rapport Comparatif (PDF)",
-                            data=pdf_buffer,
-                            file_name=f"rapport_comparatif_{nom_periode1}_vs_{nom_periode2}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-                            mime="application/pdf",
-                            help="Téléchargez un rapport PDF complet de l'analyse comparative",
-                            use_container_width=True
-                        )
-                        
-                        st.success("Rapport PDF généré avec succès ! Cliquez sur le bouton de téléchargement.")
-                        
-                    except Exception as e:
-                        st.error(f"Erreur lors de la génération du PDF : {e}")
+            # Le rapport est généré en arrière-plan ; une demande identique (même jeu de
+            # données, mêmes périodes et filtres) réutilise la génération existante
+            file_rapports = obtenir_file_rapports()
+            id_rapport = identifiant_travail(
+                'comparaison', st.session_state.cle_jeu, nom_periode1, nom_periode2,
+                date_debut1, date_fin1, date_debut2, date_fin2,
+                tuple(selected_etablissements1), tuple(selected_etablissements2),
+                st.session_state.periode1_filters['categories'].tobytes(),
+                st.session_state.periode1_filters['articles'].tobytes(),
+                st.session_state.periode2_filters['categories'].tobytes(),
+                st.session_state.periode2_filters['articles'].tobytes()
+            )
+            
+            # Bouton pour lancer la génération du PDF comparatif
+            if file_rapports.statut(id_rapport) in (INCONNU, ERREUR):
+                if st.button("📊 Générer le Rapport Comparatif PDF", use_container_width=True):
+                    file_rapports.soumettre(
+                        id_rapport, pdf_en_octets, create_comparison_pdf,
+                        df_periode1, df_periode2, nom_periode1, nom_periode2,
+                        date_debut1, date_fin1, date_debut2, date_fin2,
+                        selected_categories1, selected_articles1,
+                        selected_categories2, selected_articles2,
+                        comparison_df, fig_comp_cat, fig_comp_rep,
+                        selected_etablissements1, selected_etablissements2
+                    )
+            
+            # Suivi de la génération puis téléchargement
+            if file_rapports.statut(id_rapport) != INCONNU:
+                afficher_travail_rapport(
+                    id_rapport,
+                    label="📥 Télécharger le Rapport Comparatif (PDF)",
+                    nom_fichier=f"rapport_comparatif_{nom_periode1}_vs_{nom_periode2}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
+                    aide="Téléchargez un rapport PDF complet de l'analyse comparative"
+                )
         
         elif df_periode1.empty or df_periode2.empty:
             st.warning("Veuillez sélectionner des filtres valides pour les deux périodes pour voir la comparaison")
@@ -1026,191 +867,6 @@ if page == "🆚 Comparaison":
         if st.session_state.uploaded_file is None:
             st.info("Veuillez charger un fichier CSV pour démarrer l'analyse comparative.")
 
-# --- Le reste du code pour le dashboard principal reste inchangé ---
-# [Les fonctions pour le dashboard principal et la génération PDF restent identiques...]
-
-# --- Fonction pour créer un PDF avec les graphiques (pour le dashboard principal) ---
-def create_pdf_with_charts(df, date_debut, date_fin, frequence_choix, critere_articles, critere_categories, critere_pie, 
-                            fig_evol, fig_top_art, fig_top_cat, fig_pie):
-    """Crée un rapport PDF complet avec les graphiques"""
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), 
-                            topMargin=0.5*inch, bottomMargin=0.5*inch,
-                            leftMargin=0.5*inch, rightMargin=0.5*inch)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé pour le titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#2E86AB'),
-        spaceAfter=20,
-        alignment=1  # Centré
-    )
-    
-    # Style pour les sous-titres
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#2E86AB'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Style pour le texte normal
-    normal_style = styles['Normal']
-    
-    # En-tête du rapport
-    title = Paragraph("📊 RAPPORT D'ANALYSE DES VENTES", title_style)
-    story.append(title)
-    
-    # Période d'analyse
-    period_text = f"Période analysée : {date_debut.strftime('%d/%m/%Y')} au {date_fin.strftime('%d/%m/%Y')}"
-    period = Paragraph(period_text, normal_style)
-    story.append(period)
-    
-    date_generation = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-    generation = Paragraph(date_generation, normal_style)
-    story.append(generation)
-    
-    story.append(Spacer(1, 20))
-    
-    # --- Section 1: Indicateurs Clés ---
-    story.append(Paragraph("📈 INDICATEURS CLÉS DE PERFORMANCE", subtitle_style))
-    
-    # Calcul des KPIs
-    total_ttc = df['Total_TTC'].sum()
-    total_ht = df['Total_HT'].sum()
-    total_quantite = df['Quantité'].sum()
-    prix_moyen = total_ttc / total_quantite if total_quantite > 0 else 0
-    
-    # Tableau des KPIs
-    kpi_data = [
-        ['Indicateur', 'Valeur'],
-        ["Chiffre d'Affaires TTC", f"{total_ttc:,.2f} €"],
-        ["Chiffre d'Affaires HT", f"{total_ht:,.2f} €"],
-        ["Volume d'Articles Vendus", f"{total_quantite:,.0f}"],
-        ["Prix Moyen par Article", f"{prix_moyen:,.2f} €"]
-    ]
-    
-    kpi_table = Table(kpi_data, colWidths=[200, 150])
-    kpi_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    story.append(kpi_table)
-    story.append(Spacer(1, 20))
-    
-    # --- Section 2: Évolution Temporelle ---
-    story.append(Paragraph("📈 ÉVOLUTION DU CHIFFRE D'AFFAIRES", subtitle_style))
-    
-    # Ajouter le graphique d'évolution
-    if fig_evol:
-        try:
-            # Convertir le graphique Plotly en image
-            img_buffer = plotly_fig_to_image(fig_evol, width=700, height=350)
-            img = Image(img_buffer, width=6.5*inch, height=3*inch)
-            story.append(img)
-            story.append(Spacer(1, 10))
-        except Exception as e:
-            error_msg = Paragraph(f"Erreur lors de la génération du graphique d'évolution: {e}", normal_style)
-            story.append(error_msg)
-    
-    story.append(Spacer(1, 15))
-    
-    # --- Section 3: Top 10 ---
-    story.append(Paragraph("🏆 ANALYSE DES PERFORMERS", subtitle_style))
-    
-    # Top 10 Articles
-    story.append(Paragraph(f"Top 10 Articles - {critere_articles}", subtitle_style))
-    if fig_top_art:
-        try:
-            img_buffer = plotly_fig_to_image(fig_top_art, width=600, height=400)
-            img = Image(img_buffer, width=6*inch, height=3.5*inch)
-            story.append(img)
-            story.append(Spacer(1, 10))
-        except Exception as e:
-            error_msg = Paragraph(f"Erreur lors de la génération du graphique Top Articles: {e}", normal_style)
-            story.append(error_msg)
-    
-    story.append(Spacer(1, 10))
-    
-    # Top 10 Catégories
-    story.append(Paragraph(f"Top 10 Catégories - {critere_categories}", subtitle_style))
-    if fig_top_cat:
-        try:
-            img_buffer = plotly_fig_to_image(fig_top_cat, width=600, height=400)
-            img = Image(img_buffer, width=6*inch, height=3.5*inch)
-            story.append(img)
-            story.append(Spacer(1, 10))
-        except Exception as e:
-            error_msg = Paragraph(f"Erreur lors de la génération du graphique Top Catégories: {e}", normal_style)
-            story.append(error_msg)
-    
-    story.append(Spacer(1, 15))
-    
-    # --- Section 4: Répartition par Catégorie ---
-    story.append(Paragraph("💰 RÉPARTITION PAR CATÉGORIE", subtitle_style))
-    story.append(Paragraph(f"Répartition par {critere_pie}", subtitle_style))
-    
-    if fig_pie:
-        try:
-            img_buffer = plotly_fig_to_image(fig_pie, width=500, height=400)
-            img = Image(img_buffer, width=5*inch, height=3.5*inch)
-            story.append(img)
-        except Exception as e:
-            error_msg = Paragraph(f"Erreur lors de la génération du graphique de répartition: {e}", normal_style)
-            story.append(error_msg)
-    
-    # --- Section 5: Paramètres utilisés ---
-    story.append(Spacer(1, 20))
-    story.append(Paragraph("⚙️ PARAMÈTRES DE L'ANALYSE", subtitle_style))
-    
-    param_data = [
-        ['Paramètre', 'Valeur'],
-        ['Période', f"{date_debut.strftime('%d/%m/%Y')} au {date_fin.strftime('%d/%m/%Y')}"],
-        ['Fréquence d\'agrégation', frequence_choix],
-        ['Critère Top Articles', critere_articles],
-        ['Critère Top Catégories', critere_categories],
-        ['Critère Répartition', critere_pie],
-        ['Nombre de catégories sélectionnées', str(len(df['Catégorie'].unique()))],
-        ['Nombre d\'articles sélectionnés', str(len(df['Libellé'].unique()))]
-    ]
-    
-    param_table = Table(param_data, colWidths=[200, 200])
-    param_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    story.append(param_table)
-    
-    # Pied de page
-    story.append(Spacer(1, 20))
-    footer = Paragraph("Rapport généré automatiquement par le Dashboard d'Analyse des Ventes - Téo Desquatrevaux © 2025", normal_style)
-    story.append(footer)
-    
-    # Génération du PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
 
 # --- Interface Streamlit principale (Dashboard) ---
 if page == "📊 Dashboard":
@@ -1218,13 +874,26 @@ if page == "📊 Dashboard":
 
     # Afficher le fichier actuellement chargé
     if st.session_state.uploaded_file is not None:
-        st.success(f"📁 Fichier chargé : {st.session_state.uploaded_file.name}")
+        nb_ajouts = len(st.session_state.journaux_ajoutes)
+        st.success(f"📁 Fichier chargé : {st.session_state.uploaded_file.name}"
+                   + (f" (+ {nb_ajouts} journal(aux) ajouté(s))" if nb_ajouts else ""))
+        
+        # Mémoire occupée par les données chargées et cellules invalides ignorées au chargement
+        df_complet = jeu_courant()
+        if df_complet is not None:
+            afficher_memoire(df_complet)
+            afficher_anomalies(df_complet)
         
         # Bouton pour supprimer le fichier chargé
         if st.button("🗑️ Supprimer le fichier chargé"):
             st.session_state.uploaded_file = None
-            st.session_state.df_complet = None
+            changer_jeu(None)
+            st.session_state.journaux_ajoutes = []
             st.rerun()
+        
+        # Ajout incrémental d'un export quotidien aux données déjà chargées
+        if df_complet is not None:
+            afficher_ajout_journal(key="dashboard_ajout")
 
     uploaded_file = st.file_uploader(
         "Glissez-déposez votre journal des ventes (CSV) ici",
@@ -1237,13 +906,15 @@ if page == "📊 Dashboard":
     if uploaded_file is not None:
         # Si un nouveau fichier est chargé, mettre à jour le session_state
         if uploaded_file != st.session_state.uploaded_file:
+            cle, _ = charger_fichier(uploaded_file)
             st.session_state.uploaded_file = uploaded_file
-            st.session_state.df_complet = load_data(uploaded_file)
+            changer_jeu(cle)
+            st.session_state.journaux_ajoutes = []
             st.rerun()
 
-    # Utiliser les données du session_state si disponibles
-    if st.session_state.df_complet is not None:
-        df_complet = st.session_state.df_complet
+    # Utiliser les données du jeu de la session si disponibles
+    df_complet = jeu_courant()
+    if df_complet is not None:
 
         # --- Barre Latérale des Filtres ---
         st.sidebar.header("Filtres")
@@ -1253,6 +924,8 @@ if page == "📊 Dashboard":
         
         # Bouton de réinitialisation uniquement
         if st.sidebar.button("🗑️ Réinitialiser les filtres", use_container_width=True):
+            if 'selected_etablissements' in st.session_state:
+                del st.session_state.selected_etablissements
             if 'selected_categories' in st.session_state:
                 del st.session_state.selected_categories
             if 'selected_articles' in st.session_state:
@@ -1272,75 +945,97 @@ if page == "📊 Dashboard":
             max_value=max_date
         )
 
-        all_categories = sorted(df_complet['Catégorie'].unique())
+        # Établissements : seules les partitions des établissements retenus sont lues
+        partitions = obtenir_partitions(df_complet)
+        all_etablissements = list(partitions)
+        st.sidebar.markdown("**Établissements**")
+        selected_etablissements = st.sidebar.multiselect(
+            "Sélection des établissements",
+            all_etablissements,
+            default=selection_valide(
+                st.session_state.get('selected_etablissements', all_etablissements), all_etablissements),
+            label_visibility="collapsed"
+        )
+        
+        # Stocker les établissements sélectionnés
+        st.session_state.selected_etablissements = selected_etablissements
+
+        # Catégories et articles sélectionnés, conservés en codes de l'index du jeu
+        index_art = obtenir_index_articles(df_complet)
+        recoder_selections(index_art)
+        all_categories = index_art['categories']
         
         # Boutons pour les catégories
         st.sidebar.markdown("**Catégories**")
         cat_col1, cat_col2 = st.sidebar.columns(2)
         with cat_col1:
             if st.button("✅ Toutes", key="all_categories", use_container_width=True):
-                st.session_state.selected_categories = all_categories
+                st.session_state.selected_categories = np.arange(len(all_categories), dtype=np.int32)
         with cat_col2:
             if st.button("❌ Aucune", key="no_categories", use_container_width=True):
-                st.session_state.selected_categories = []
+                st.session_state.selected_categories = np.empty(0, dtype=np.int32)
 
         selected_categories = st.sidebar.multiselect(
             "Sélection des catégories",
             all_categories,
-            default=st.session_state.get('selected_categories', all_categories),
+            default=decoder_selection(st.session_state.get('selected_categories', range(len(all_categories))),
+                                      all_categories),
             label_visibility="collapsed"
         )
         
         # Stocker les catégories sélectionnées
-        st.session_state.selected_categories = selected_categories
+        codes_categories = coder_selection(selected_categories, index_art['codes_categories'])
+        st.session_state.selected_categories = codes_categories
 
-        # Filtrer les articles en fonction des catégories sélectionnées
-        if selected_categories:
-            # Obtenir les articles qui appartiennent aux catégories sélectionnées
-            articles_filtres = sorted(df_complet[df_complet['Catégorie'].isin(selected_categories)]['Libellé'].unique())
-        else:
-            # Si aucune catégorie n'est sélectionnée, montrer tous les articles
-            articles_filtres = sorted(df_complet['Libellé'].unique())
+        # Articles des catégories sélectionnées, tirés de l'index (tous si aucune catégorie n'est sélectionnée)
+        articles_filtres = articles_des_categories(index_art, selected_categories)
 
         # Boutons pour les articles
         st.sidebar.markdown("**Articles**")
         art_col1, art_col2 = st.sidebar.columns(2)
         with art_col1:
             if st.button("✅ Tous", key="all_articles", use_container_width=True):
-                st.session_state.selected_articles = articles_filtres
+                st.session_state.selected_articles = codes_articles_des_categories(index_art, codes_categories)
         with art_col2:
             if st.button("❌ Aucun", key="no_articles", use_container_width=True):
-                st.session_state.selected_articles = []
+                st.session_state.selected_articles = np.empty(0, dtype=np.int32)
 
-        # Fonction pour filtrer les articles sélectionnés qui existent dans la liste filtrée
-        def get_valid_default_articles(default_articles, available_articles):
-            """Retourne uniquement les articles par défaut qui existent dans la liste disponible"""
-            return [article for article in default_articles if article in available_articles]
-
-        # Obtenir les articles sélectionnés par défaut (valides)
-        default_articles = st.session_state.get('selected_articles', articles_filtres)
-        valid_default_articles = get_valid_default_articles(default_articles, articles_filtres)
+        # Articles sélectionnés par défaut : ceux de la sélection appartenant aux catégories retenues
+        if 'selected_articles' in st.session_state:
+            codes_defaut = codes_articles_valides(index_art, st.session_state.selected_articles, codes_categories)
+            default_articles = decoder_selection(codes_defaut, index_art['tous'])
+        else:
+            default_articles = articles_filtres
 
         selected_articles = st.sidebar.multiselect(
             "Sélection des articles",
             articles_filtres,
-            default=valid_default_articles,
+            default=default_articles,
             label_visibility="collapsed"
         )
         
         # Stocker les articles sélectionnés
-        st.session_state.selected_articles = selected_articles
-
-        # Application des filtres
-        df = df_complet[
-            (df_complet['Date'] >= pd.to_datetime(date_debut)) &
-            (df_complet['Date'] <= pd.to_datetime(date_fin)) &
-            (df_complet['Catégorie'].isin(selected_categories)) &
-            (df_complet['Libellé'].isin(selected_articles))
-        ]
+        st.session_state.selected_articles = coder_selection(selected_articles, index_art['codes_articles'])
+
+        # Application des filtres : vue par article tirée du DataFrame agrégé
+        cube = obtenir_cube(df_complet)
+        with mesurer('Filtrage') as etape:
+            df = filter_data(df_complet, date_debut, date_fin, selected_categories, selected_articles,
+                             selected_etablissements, partitions)
+
+            # Si tous les articles des catégories sont retenus, le cube journalier suffit
+            # pour les indicateurs, l'évolution et les graphiques par catégorie
+            if len(selected_articles) == len(articles_filtres):
+                articles_vue = None
+                df_categories = vue_cube(cube, date_debut, date_fin, selected_categories, selected_etablissements)
+            else:
+                articles_vue = selected_articles
+                df_categories = df
+            etape['lignes'] = len(df)
 
         if df.empty:
             st.warning("Aucune donnée disponible pour les filtres sélectionnés.")
+            afficher_mesures(mesures)
             st.stop()
 
         # --- AFFICHAGE COMPLET DU DASHBOARD ---
@@ -1349,47 +1044,67 @@ if page == "📊 Dashboard":
         # Section 1: Indicateurs Clés (KPIs)
         st.header("Indicateurs Clés (KPIs)")
 
-        total_ttc = df['Total_TTC'].sum()
-        total_ht = df['Total_HT'].sum()
-        total_quantite = df['Quantité'].sum()
-        prix_moyen = total_ttc / total_quantite if total_quantite > 0 else 0
+        with mesurer('Indicateurs'):
+            cle_totaux = cle_indicateurs(
+                date_debut, date_fin, tuple(selected_etablissements),
+                st.session_state.selected_categories.tobytes(), st.session_state.selected_articles.tobytes())
+            totaux = indicateurs(df_categories, cle_totaux)
 
-        kpi1, kpi2, kpi3, kpi4 = st.columns(4)
-        kpi1.metric("Chiffre d'Affaires Total (TTC)", f"{total_ttc:,.2f} €")
-        kpi2.metric("Chiffre d'Affaires Total (HT)", f"{total_ht:,.2f} €")
-        kpi3.metric("Volume d'Articles Vendus", f"{total_quantite:,.0f}")
-        kpi4.metric("Prix Moyen par Article (TTC)", f"{prix_moyen:,.2f} €")
+            kpi1, kpi2, kpi3, kpi4 = st.columns(4)
+            kpi1.metric("Chiffre d'Affaires Total (TTC)", f"{totaux['CA_TTC']:,.2f} €")
+            kpi2.metric("Chiffre d'Affaires Total (HT)", f"{totaux['CA_HT']:,.2f} €")
+            kpi3.metric("Volume d'Articles Vendus", f"{totaux['Quantite']:,.0f}")
+            kpi4.metric("Prix Moyen par Article (TTC)", f"{totaux['Prix_Moyen']:,.2f} €")
 
         st.markdown("---")
 
         # --- Section 2: Évolution Temporelle ---
         st.header("📈 Évolution du Chiffre d'Affaires (TTC)")
 
-        # Widget pour choisir la fréquence
-        frequence_choix = st.selectbox(
-            "Agréger par :",
-            options=['Mois', 'Semaine', 'Jour'],
-            index=0  # 'Mois' par défaut
-        )
-
-        # Préparation des données pour le graphique d'évolution
-        freq_map = {'Jour': 'D', 'Semaine': 'W', 'Mois': 'M'}
-        freq_code = freq_map[frequence_choix]
-
-        df_temp = df.set_index('Date')
-        df_evolution = df_temp['Total_TTC'].resample(freq_code).sum().reset_index()
-
-        # Renommer les colonnes pour le graphique
-        df_evolution.columns = [frequence_choix, 'Total TTC (€)']
+        # Widgets pour choisir la fréquence et les analyses complémentaires
+        col_frequence, col_analyses = st.columns([1, 2])
+        with col_frequence:
+            frequence_choix = st.selectbox(
+                "Agréger par :",
+                options=['Mois', 'Semaine', 'Jour'],
+                index=0  # 'Mois' par défaut
+            )
+        with col_analyses:
+            analyses_choix = st.multiselect(
+                "Analyses :",
+                options=ANALYSES,
+                key='analyses_evolution'
+            )
 
-        # Création du graphique
-        fig_evol = px.line(
-            df_evolution,
-            x=frequence_choix,
-            y='Total TTC (€)',
-            title=f"Évolution du Total TTC par {frequence_choix.lower()}"
-        )
-        st.plotly_chart(fig_evol, use_container_width=True)
+        # Analyses dérivées d'une seule série journalière, étendue à l'historique nécessaire
+        # (année précédente et fenêtres glissantes) par une seule vue du cube, ou du
+        # DataFrame agrégé si une partie seulement des articles est retenue
+        analyses = None
+        if analyses_choix:
+            with mesurer('Analyses') as etape:
+                debut_serie = max(debut_analyses(date_debut), pd.Timestamp(min_date))
+                if articles_vue is None:
+                    vue_historique = vue_cube(cube, debut_serie, date_fin, selected_categories,
+                                              selected_etablissements)
+                else:
+                    vue_historique = filter_data(df_complet, debut_serie, date_fin, selected_categories,
+                                                 articles_vue, selected_etablissements, partitions)
+                analyses = analyses_journalieres(serie_journaliere(vue_historique, debut_serie, date_fin),
+                                                 date_debut, date_fin)
+                etape['lignes'] = len(vue_historique)
+
+        # Regroupement dérivé de la série journalière du cube
+        with mesurer('Graphique évolution'):
+            fig_evol = figure_evolution(df_categories, frequence_choix, analyses, analyses_choix)
+            st.plotly_chart(fig_evol, use_container_width=True)
+
+        # Moyennes glissantes et cumuls
+        figures_complementaires = []
+        if analyses is not None:
+            with mesurer('Graphiques des analyses'):
+                figures_complementaires = figures_analyses(analyses, analyses_choix)
+                for fig_analyse in figures_complementaires:
+                    st.plotly_chart(fig_analyse, use_container_width=True)
 
         st.markdown("---")
 
@@ -1408,32 +1123,14 @@ if page == "📊 Dashboard":
             # Sélecteur pour le critère de classement
             critere_articles = st.selectbox(
                 "Classer les articles par :",
-                options=["Chiffre d'Affaires (TTC)", "Volume des Ventes (Quantité)"],
+                options=list(CRITERES),
                 key='critere_articles'
             )
             
-            # Logique de classement
-            if critere_articles == "Chiffre d'Affaires (TTC)":
-                col_a_sommer = 'Total_TTC'
-                axe_x_label = "Chiffre d'Affaires Total (TTC)"
-            else:
-                col_a_sommer = 'Quantité'
-                axe_x_label = "Volume Total Vendu (Quantité)"
-
-            # Calcul du Top 10
-            df_groupe_art = df.groupby('Libellé')[col_a_sommer].sum().reset_index()
-            df_top10_art = df_groupe_art.sort_values(by=col_a_sommer, ascending=False).head(10)
-
             # Graphique Top 10 Articles
-            fig_top_art = px.bar(
-                df_top10_art,
-                y='Libellé',
-                x=col_a_sommer,
-                title=f"Top 10 des articles par {critere_articles}",
-                labels={'Libellé': 'Article', col_a_sommer: axe_x_label}
-            )
-            fig_top_art.update_layout(yaxis={'categoryorder': 'total ascending'})
-            st.plotly_chart(fig_top_art, use_container_width=True)
+            with mesurer('Graphique top articles'):
+                fig_top_art = figure_top(df, 'Libellé', critere_articles)
+                st.plotly_chart(fig_top_art, use_container_width=True)
 
         # Colonne 2: Top 10 Catégories
         with col2:
@@ -1442,32 +1139,14 @@ if page == "📊 Dashboard":
             # Sélecteur pour le critère de classement
             critere_categories = st.selectbox(
                 "Classer les catégories par :",
-                options=["Chiffre d'Affaires (TTC)", "Volume des Ventes (Quantité)"],
+                options=list(CRITERES),
                 key='critere_categories'
             )
             
-            # Logique de classement
-            if critere_categories == "Chiffre d'Affaires (TTC)":
-                col_a_sommer_cat = 'Total_TTC'
-                axe_x_label_cat = "Chiffre d'Affaires Total (TTC)"
-            else:
-                col_a_sommer_cat = 'Quantité'
-                axe_x_label_cat = "Volume Total Vendu (Quantité)"
-
-            # Calcul du Top 10
-            df_groupe_cat = df.groupby('Catégorie')[col_a_sommer_cat].sum().reset_index()
-            df_top10_cat = df_groupe_cat.sort_values(by=col_a_sommer_cat, ascending=False).head(10)
-
             # Graphique Top 10 Catégories
-            fig_top_cat = px.bar(
-                df_top10_cat,
-                y='Catégorie',
-                x=col_a_sommer_cat,
-                title=f"Top 10 des catégories par {critere_categories}",
-                labels={'Catégorie': 'Catégorie', col_a_sommer_cat: axe_x_label_cat}
-            )
-            fig_top_cat.update_layout(yaxis={'categoryorder': 'total ascending'})
-            st.plotly_chart(fig_top_cat, use_container_width=True)
+            with mesurer('Graphique top catégories'):
+                fig_top_cat = figure_top(df_categories, 'Catégorie', critere_categories)
+                st.plotly_chart(fig_top_cat, use_container_width=True)
 
         st.markdown("---")
 
@@ -1477,50 +1156,52 @@ if page == "📊 Dashboard":
         # Sélecteur pour le camembert
         critere_pie = st.radio(
             "Voir la répartition par :",
-            options=["Chiffre d'Affaires (TTC)", "Volume des Ventes (Quantité)"],
+            options=list(CRITERES),
             key='critere_pie'
         )
 
-        if critere_pie == "Chiffre d'Affaires (TTC)":
-            col_pie = 'Total_TTC'
-            title_pie = "Répartition du Chiffre d'Affaires (TTC) par Catégorie"
-        else:
-            col_pie = 'Quantité'
-            title_pie = "Répartition du Volume des Ventes par Catégorie"
-
-        # Calcul de la répartition
-        df_repartition = df.groupby('Catégorie')[col_pie].sum().reset_index()
-
         # Graphique Camembert
-        fig_pie = px.pie(
-            df_repartition,
-            names='Catégorie',
-            values=col_pie,
-            title=title_pie
-        )
-        fig_pie.update_traces(textinfo='percent+label', textposition='inside')
-        st.plotly_chart(fig_pie, use_container_width=True)
+        with mesurer('Graphique répartition'):
+            fig_pie = figure_repartition(df_categories, critere_pie)
+            st.plotly_chart(fig_pie, use_container_width=True)
 
         # --- Section 5: Téléchargement PDF ---
         st.sidebar.markdown("---")
         st.sidebar.header("Téléchargement")
 
-        # Créer le rapport PDF avec les graphiques actuels
-        pdf_buffer = create_pdf_with_charts(
-            df, pd.to_datetime(date_debut), pd.to_datetime(date_fin), frequence_choix, 
-            critere_articles, critere_categories, critere_pie,
-            fig_evol, fig_top_art, fig_top_cat, fig_pie
-        )
-        
-        # Bouton de téléchargement PDF
-        st.sidebar.download_button(
-            label="📥 Télécharger le Rapport (PDF)",
-            data=pdf_buffer,
-            file_name=f"rapport_ventes_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-            mime="application/pdf",
-            help="Téléchargez un rapport PDF avec les graphiques actuels"
+        # Le rapport n'est généré qu'à la demande, en arrière-plan, et reste disponible
+        # tant que les filtres et les critères des graphiques ne changent pas
+        file_rapports = obtenir_file_rapports()
+        id_rapport = identifiant_travail(
+            'dashboard', st.session_state.cle_jeu,
+            date_debut, date_fin, tuple(selected_etablissements),
+            st.session_state.selected_categories.tobytes(), st.session_state.selected_articles.tobytes(),
+            frequence_choix, tuple(analyses_choix), critere_articles, critere_categories, critere_pie
         )
 
+        if file_rapports.statut(id_rapport) in (INCONNU, ERREUR):
+            if st.sidebar.button("📊 Générer le Rapport PDF", use_container_width=True):
+                # Le cube ne compte pas les articles : le rapport reprend les
+                # indicateurs complétés sur la vue par article, sous la même clé
+                totaux = indicateurs(df, cle_totaux)
+                file_rapports.soumettre(
+                    id_rapport, pdf_en_octets, create_pdf_with_charts,
+                    df, pd.to_datetime(date_debut), pd.to_datetime(date_fin), frequence_choix, 
+                    critere_articles, critere_categories, critere_pie,
+                    fig_evol, fig_top_art, fig_top_cat, fig_pie, selected_etablissements,
+                    analyses_choix, figures_complementaires, totaux
+                )
+
+        if file_rapports.statut(id_rapport) != INCONNU:
+            # Suivi de la génération puis bouton de téléchargement PDF
+            with st.sidebar:
+                afficher_travail_rapport(
+                    id_rapport,
+                    label="📥 Télécharger le Rapport (PDF)",
+                    nom_fichier=f"rapport_ventes_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
+                    aide="Téléchargez un rapport PDF avec les graphiques actuels"
+                )
+
         st.sidebar.markdown("""
         **Le PDF inclut :**
         • Les indicateurs clés
@@ -1535,3 +1216,6 @@ if page == "📊 Dashboard":
     else:
         if st.session_state.uploaded_file is None:
             st.info("Veuillez charger un fichier CSV pour démarrer l'analyse.")
+
+# --- Mesures de performance de l'exécution ---
+afficher_mesures(mesures)
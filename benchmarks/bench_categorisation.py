@@ -0,0 +1,83 @@
+"""
+Benchmark : catégorisation ligne à ligne (ancienne version) vs moteur compilé.
+
+Usage : python -m benchmarks.bench_categorisation [nb_lignes] [nb_libelles]
+"""
+import sys
+import time
+
+from benchmarks.journal_synthetique import generer_journal
+from ventes.categories import categoriser_libelles
+
+
+def categoriser_article_historique(libelle):
+    """Copie de la fonction historique de load_data, conservée comme référence."""
+    libelle = str(libelle).lower()
+
+    if any(keyword in libelle for keyword in ['café', 'coffee', 'espresso', 'latte', 'dèca', 'chocolat viennois', 'hot chocolat', 'tisane', 'verveine', 'déca', 'cappucino', 'glass of milk']):
+        return 'Boisson Chaude - Café/Chocolat'
+    if any(keyword in libelle for keyword in ['tea', 'thé', 'earl grey', 'green tea', 'mariage', 'mint tea', 'fruits rouges']):
+        return 'Boisson Chaude - Thé'
+    if any(keyword in libelle for keyword in ['coke', 'cola', 'sprite', 'schweppes', 'diabolo', 'orangina', 'powerade', 'syrop', 'ice tea', 'ginger beer', 'choose', 'pint choose']):
+        return 'Boisson Froide - Soda/Jus'
+    if any(keyword in libelle for keyword in ['jus', 'juice', 'orange', 'pomme', 'apple', 'tomato', 'apricot', 'cranberry', 'pamplemousse']):
+        return 'Boisson Froide - Jus de Fruit'
+    if any(keyword in libelle for keyword in ['cristaline', 'badoit', 'perrier', 'evian']):
+        return 'Boisson Froide - Eau'
+
+    if any(keyword in libelle for keyword in ['whiskey', 'rhum', 'cognac', 'porto', 'pastis', 'gin', 'martini', 'whisky', 'ricard']):
+        return 'Alcool - Spiritueux'
+    if any(keyword in libelle for keyword in ['wine', 'saumur', 'bourgueil', 'pinot noir', 'merlot', 'rosé', 'mâcon', 'viognier', 'sancerre', 'château', 'champigny', 'gris blanc', 'vezelay', 'chardonnay', 'marquis de mores', 'sauvignon']):
+        return 'Alcool - Vin'
+    if any(keyword in libelle for keyword in ['bière', 'beer', 'pint', 'lager', 'adnams', 'theakston', 'brooklyn', 'guinness', 'brewdog', '1664', 'pils', 'la folie douce']):
+        return 'Alcool - Bière'
+    if any(keyword in libelle for keyword in ['champagne', 'prosecco', 'vin petillant']):
+        return 'Alcool - Effervescent'
+    if any(keyword in libelle for keyword in ['cocktail']):
+        return 'Alcool - Cocktail'
+
+    if any(keyword in libelle for keyword in ['cookie', 'muffin', 'cake', 'brownie', 'pie', 'crumble', 'viennoiserie', 'biscuit', 'croissant', 'pain d epice', 'frangipane', 'cupcake', 'lemon bars', 'lemon poppyseed loaf']):
+        return 'Pâtisserie/Sucré'
+    if any(keyword in libelle for keyword in ['mars', 'twix', 'kinder bueno', 'kit kat', 'lolly pops', 'magnum', 'cornetto', 'twister', 'haribo', 'lion king', 'rocket', 'marshmallow']):
+        return 'Glace/Confiserie'
+
+    if any(keyword in libelle for keyword in ['quiche', 'gnocchi', 'lasagna', 'chili', 'nuggets', 'lil\'fries', 'crisps', 'terrîne', 'hot dog', 'gaspacho']):
+        return 'Plat/Snack Salé'
+
+    if any(keyword in libelle for keyword in ['plat à', 'plat 11', 'plat 13']):
+        return 'Plat du Jour'
+    if any(keyword in libelle for keyword in ['terrine', 'vrai & bon pot']):
+        return 'Bocaux'
+
+    if any(keyword in libelle for keyword in ['entree', 'fee', 'vigik', 'corkage', 'tennis', 'squash', 'social', 'member', 'adult', 'bridge', 'snooker', 'remboursement', 'mini viennoiserie', 'cuff links', 'polo', 'bbq', 'cutlery']):
+        return 'Service / Frais / Activité'
+    if any(keyword in libelle for keyword in ['balle', 'balls']):
+        return 'Matériel'
+    if any(keyword in libelle for keyword in ['not used']):
+        return 'Hors Catégorie'
+
+    return 'Autre'
+
+
+def main(nb_lignes=1_000_000, nb_libelles=400):
+    libelles = generer_journal(nb_lignes, nb_libelles)['Libellé']
+
+    debut = time.perf_counter()
+    reference = libelles.apply(categoriser_article_historique)
+    duree_historique = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    resultat = categoriser_libelles(libelles)
+    duree_moteur = time.perf_counter() - debut
+
+    identique = (reference.astype(object) == resultat.astype(object)).all()
+    print(f"Lignes : {nb_lignes:,} | Libellés distincts : {libelles.nunique():,}")
+    print(f"Version historique (apply)   : {duree_historique:8.3f} s")
+    print(f"Moteur compilé (par unique)  : {duree_moteur:8.3f} s")
+    print(f"Accélération : x{duree_historique / duree_moteur:,.1f} | Résultats identiques : {identique}")
+    return identique
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:3]]
+    sys.exit(0 if main(*arguments) else 1)
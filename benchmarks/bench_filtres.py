@@ -0,0 +1,110 @@
+"""
+Benchmark : filtrage par masques booléens (ancienne version) vs filtrage indexé par partitions
+d'établissement, options des filtres (articles des catégories sélectionnées) tirées d'un
+parcours complet du jeu vs de l'index des articles, et validation des articles sélectionnés
+par défaut sur des listes de libellés vs sur des codes.
+
+Usage : python -m benchmarks.bench_filtres [nb_lignes] [nb_libelles]
+"""
+import io
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.journal_synthetique import generer_csv
+from ventes.filtres import (index_partitions, filtrer_partitions, index_articles, articles_des_categories,
+                            coder_selection, decoder_selection, codes_articles_valides)
+from ventes.chargement import charger_journal
+
+
+def filtrer_historique(df_complet, date_debut, date_fin, selected_categories, selected_articles, etablissements):
+    """Copie du filtre historique de filter_data et du Dashboard, conservée comme référence (plus les établissements)."""
+    return df_complet[
+        (df_complet['Date'] >= pd.to_datetime(date_debut)) &
+        (df_complet['Date'] <= pd.to_datetime(date_fin)) &
+        (df_complet['Catégorie'].isin(selected_categories)) &
+        (df_complet['Libellé'].isin(selected_articles)) &
+        (df_complet['Code_établissement'].isin(etablissements))
+    ]
+
+
+def articles_historique(df_complet, selected_categories):
+    """Copie du calcul historique des articles proposés dans la barre latérale, conservée comme référence."""
+    if selected_categories:
+        return sorted(df_complet[df_complet['Catégorie'].isin(selected_categories)]['Libellé'].unique())
+    return sorted(df_complet['Libellé'].unique())
+
+
+def articles_valides_historique(default_articles, available_articles):
+    """Copie de la validation historique des articles sélectionnés par défaut (recherche dans une liste)."""
+    return [article for article in default_articles if article in available_articles]
+
+
+def articles_valides_codes(index, codes_articles, codes_categories):
+    """Validation sur les codes conservés en session, puis décodage pour la liste déroulante"""
+    return decoder_selection(codes_articles_valides(index, codes_articles, codes_categories), index['tous'])
+
+
+def chronometrer(fonction, *arguments, repetitions=20):
+    """Durée moyenne d'un appel, en millisecondes"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        resultat = fonction(*arguments)
+    return resultat, (time.perf_counter() - debut) / repetitions * 1000
+
+
+def main(nb_lignes=2_000_000, nb_libelles=2000):
+    df_complet = charger_journal(io.BytesIO(generer_csv(nb_lignes, nb_libelles)))
+    categories = sorted(df_complet['Catégorie'].unique())
+    articles = sorted(df_complet['Libellé'].unique())
+    partitions = index_partitions(df_complet)
+    etablissements = list(partitions)
+    print(f"Lignes agrégées : {len(df_complet):,} | Articles : {len(articles):,} | Établissements : {len(etablissements)}")
+
+    identique = True
+    scenarios = {
+        'Un mois, tout sélectionné': ('2024-03-01', '2024-03-31', categories, articles, etablissements),
+        'Un mois, 3 catégories / 1 article sur 2': ('2024-03-01', '2024-03-31', categories[:3], articles[::2],
+                                                    etablissements),
+        'Trois ans, tout sélectionné': ('2022-01-01', '2024-12-31', categories, articles, etablissements),
+        'Trois ans, un établissement': ('2022-01-01', '2024-12-31', categories, articles, etablissements[:1]),
+    }
+    for nom, arguments in scenarios.items():
+        date_debut, date_fin, selection_categories, selection_articles, selection_etablissements = arguments
+        reference, duree_historique = chronometrer(filtrer_historique, df_complet, *arguments)
+        resultat, duree_indexee = chronometrer(
+            filtrer_partitions, df_complet, partitions, date_debut, date_fin,
+            selection_categories, selection_articles, selection_etablissements
+        )
+        identique &= reference.equals(resultat)
+        print(f"{nom:42} | historique {duree_historique:8.2f} ms | indexé {duree_indexee:8.2f} ms "
+              f"| {len(resultat):,} lignes")
+
+    index, duree_index = chronometrer(index_articles, df_complet, repetitions=1)
+    print(f"Index des articles construit en {duree_index:.2f} ms")
+    for nom, selection in {'Aucune catégorie': [], 'Une catégorie': categories[:1],
+                           'Toutes les catégories': categories}.items():
+        reference, duree_historique = chronometrer(articles_historique, df_complet, selection)
+        resultat, duree_indexee = chronometrer(articles_des_categories, index, selection)
+        identique &= reference == resultat
+        print(f"{'Articles, ' + nom.lower():42} | historique {duree_historique:8.2f} ms | indexé {duree_indexee:8.2f} ms "
+              f"| {len(resultat):,} articles")
+
+    codes_categories = coder_selection(categories[::2], index['codes_categories'])
+    disponibles = articles_des_categories(index, categories[::2])
+    selection = articles[::2]
+    codes_selection = coder_selection(selection, index['codes_articles'])
+    reference, duree_historique = chronometrer(articles_valides_historique, selection, disponibles, repetitions=1)
+    resultat, duree_codes = chronometrer(articles_valides_codes, index, codes_selection, codes_categories)
+    identique &= reference == resultat
+    print(f"{'Sélection par défaut, 1 article sur 2':42} | historique {duree_historique:8.2f} ms "
+          f"| codes {duree_codes:8.2f} ms | {len(resultat):,} articles")
+
+    print(f"Résultats identiques : {identique}")
+    return identique
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:3]]
+    sys.exit(0 if main(*arguments) else 1)
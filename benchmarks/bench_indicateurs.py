@@ -0,0 +1,60 @@
+"""
+Benchmark : indicateurs clés calculés par les appels pandas historiques (sum, nunique) vs
+moteur d'indicateurs (sommes NumPy, comptes sur les codes catégoriels), puis repris de la
+mémoire par état des filtres.
+
+Usage : python -m benchmarks.bench_indicateurs [nb_lignes] [nb_libelles]
+"""
+import io
+import math
+import sys
+import time
+
+from benchmarks.journal_synthetique import generer_csv
+from ventes.chargement import charger_journal, decompacter_montants
+from ventes.indicateurs import calculer_indicateurs, indicateurs
+
+
+def indicateurs_historique(df):
+    """Copie du calcul historique de create_comparison_kpis, conservée comme référence."""
+    total_ttc = df['Total_TTC'].sum()
+    total_quantite = df['Quantité'].sum()
+    return {
+        'CA_TTC': total_ttc,
+        'CA_HT': df['Total_HT'].sum(),
+        'Quantite': total_quantite,
+        'Prix_Moyen': total_ttc / total_quantite if total_quantite > 0 else 0,
+        'Nb_Articles': df['Libellé'].nunique(),
+        'Nb_Categories': df['Catégorie'].nunique(),
+    }
+
+
+def chronometrer(fonction, *arguments, repetitions=20):
+    """Durée moyenne d'un appel, en millisecondes"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        resultat = fonction(*arguments)
+    return resultat, (time.perf_counter() - debut) / repetitions * 1000
+
+
+def main(nb_lignes=2_000_000, nb_libelles=2000):
+    vue = decompacter_montants(charger_journal(io.BytesIO(generer_csv(nb_lignes, nb_libelles))))
+    print(f"Lignes agrégées : {len(vue):,}")
+
+    reference, duree_historique = chronometrer(indicateurs_historique, vue)
+    resultat, duree_passage = chronometrer(calculer_indicateurs, vue)
+    indicateurs(vue, 'bench')
+    _, duree_memoire = chronometrer(indicateurs, vue, 'bench')
+
+    identique = reference.keys() == resultat.keys() and all(
+        math.isclose(reference[nom], resultat[nom], rel_tol=1e-12) for nom in reference)
+    print(f"Appels pandas (historique)       : {duree_historique:8.2f} ms")
+    print(f"Moteur d'indicateurs             : {duree_passage:8.2f} ms")
+    print(f"Repris de la mémoire             : {duree_memoire:8.4f} ms")
+    print(f"Accélération : x{duree_historique / duree_passage:,.2f} | Résultats identiques : {identique}")
+    return identique
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:3]]
+    sys.exit(0 if main(*arguments) else 1)
@@ -0,0 +1,52 @@
+"""
+Benchmark : nettoyage des libellés ligne à ligne (ancienne version) vs dédoublonnage puis diffusion.
+
+Usage : python -m benchmarks.bench_nettoyage [nb_lignes] [nb_libelles]
+"""
+import re
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.journal_synthetique import generer_journal
+from ventes.nettoyage import nettoyer_libelles
+
+
+def nettoyer_article_historique(libelle):
+    """Copie de la fonction historique d'app.py, conservée comme référence."""
+    if pd.isna(libelle):
+        return libelle
+
+    libelle_str = str(libelle)
+    libelle_sans_dates = re.sub(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', '', libelle_str)
+    libelle_sans_a = re.sub(r'\([aA]\):', '', libelle_sans_dates)
+    libelle_propre = re.sub(r'\s+', ' ', libelle_sans_a).strip()
+
+    return libelle_propre
+
+
+def main(nb_lignes=1_000_000, nb_libelles=400):
+    libelles = generer_journal(nb_lignes, nb_libelles)['Libellé']
+
+    debut = time.perf_counter()
+    reference = libelles.apply(nettoyer_article_historique)
+    duree_historique = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    resultat = nettoyer_libelles(libelles)
+    duree_dedoublonnee = time.perf_counter() - debut
+
+    identique = reference.astype(object).equals(resultat.astype(object))
+    nb_uniques = libelles.nunique(dropna=False)
+    print(f"Lignes : {nb_lignes:,} | Libellés distincts : {nb_uniques:,} "
+          f"({nb_uniques / nb_lignes:.4%} des lignes)")
+    print(f"Version historique (apply)        : {duree_historique:8.3f} s")
+    print(f"Dédoublonnage puis diffusion      : {duree_dedoublonnee:8.3f} s")
+    print(f"Accélération : x{duree_historique / duree_dedoublonnee:,.1f} | Résultats identiques : {identique}")
+    return identique
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:3]]
+    sys.exit(0 if main(*arguments) else 1)
@@ -0,0 +1,43 @@
+"""
+Benchmark : chargement séquentiel vs chargement parallèle par plages d'octets.
+
+Usage : python -m benchmarks.bench_parallele [nb_lignes] [nb_processus_max]
+"""
+import io
+import os
+import sys
+import time
+
+from benchmarks.journal_synthetique import generer_csv
+from ventes.chargement import charger_journal
+
+
+def chronometrer(fonction, *arguments, **options):
+    """Durée d'un appel, en secondes"""
+    debut = time.perf_counter()
+    resultat = fonction(*arguments, **options)
+    return resultat, time.perf_counter() - debut
+
+
+def main(nb_lignes=2_000_000, nb_processus_max=os.cpu_count() or 1):
+    contenu = generer_csv(nb_lignes)
+    print(f"Journal : {nb_lignes:,} lignes, {len(contenu) / 1024 ** 2:.1f} Mo | Cœurs : {os.cpu_count()}")
+
+    reference, duree_reference = chronometrer(charger_journal, io.BytesIO(contenu), nb_processus=1)
+    print(f"{'1 processus':14} | {duree_reference:7.2f} s | x1.00")
+
+    identique = True
+    nb_processus = 2
+    while nb_processus <= max(nb_processus_max, 2):
+        resultat, duree = chronometrer(charger_journal, io.BytesIO(contenu), nb_processus=nb_processus)
+        identique &= reference.equals(resultat)
+        print(f"{f'{nb_processus} processus':14} | {duree:7.2f} s | x{duree_reference / duree:.2f}")
+        nb_processus *= 2
+
+    print(f"Résultats identiques : {identique}")
+    return identique
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:3]]
+    sys.exit(0 if main(*arguments) else 1)
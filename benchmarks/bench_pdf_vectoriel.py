@@ -0,0 +1,68 @@
+"""
+Benchmark : graphiques des rapports PDF rastérisés en PNG vs dessinés en vectoriel.
+
+Compare la durée de construction et la taille d'un PDF contenant les six graphiques
+des rapports (Dashboard et comparaison). Le mode PNG nécessite Kaleido et Chrome.
+
+Usage : python -m benchmarks.bench_pdf_vectoriel [nb_rapports]
+"""
+import io
+import sys
+import time
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, SimpleDocTemplate
+
+from benchmarks.bench_rendu import figures_rapports
+from benchmarks.journal_synthetique import generer_csv
+from ventes.chargement import charger_journal, decompacter_montants
+from ventes.rendu import CacheImages, rendre_figure
+from ventes.vectoriel import figure_en_dessin
+
+
+def construire_pdf(figures, vectoriel):
+    """PDF des graphiques, insérés en dessins vectoriels ou en images PNG (sans cache d'images)"""
+    cache = CacheImages(capacite=0)
+    story = []
+    for fig, width, height in figures:
+        largeur, hauteur = width / 100 * inch, height / 100 * inch
+        if vectoriel:
+            story.append(figure_en_dessin(fig, largeur, hauteur))
+        else:
+            image = rendre_figure(fig, width, height, cache=cache)
+            story.append(Image(io.BytesIO(image), width=largeur, height=hauteur))
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=landscape(A4)).build(story)
+    return buffer.getvalue()
+
+
+def mesurer(figures, vectoriel, nb_rapports):
+    """Durée moyenne de construction (s) et taille (octets) du PDF"""
+    debut = time.perf_counter()
+    for _ in range(nb_rapports):
+        pdf = construire_pdf(figures, vectoriel)
+    return (time.perf_counter() - debut) / nb_rapports, len(pdf)
+
+
+def main(nb_rapports=5):
+    df = decompacter_montants(charger_journal(io.BytesIO(generer_csv(200_000))))
+    figures = figures_rapports(df)
+
+    duree_vectoriel, taille_vectoriel = mesurer(figures, True, nb_rapports)
+    print(f"Vectoriel | {duree_vectoriel:6.3f} s | {taille_vectoriel / 1024:8.1f} Ko")
+
+    try:
+        duree_png, taille_png = mesurer(figures, False, nb_rapports)
+    except Exception as e:
+        print(f"PNG       | rendu indisponible (Kaleido / Chrome) : {str(e).strip().splitlines()[0]}")
+        return True
+    print(f"PNG       | {duree_png:6.3f} s | {taille_png / 1024:8.1f} Ko")
+    print(f"Gain      | x{duree_png / duree_vectoriel:.1f} en durée | x{taille_png / taille_vectoriel:.1f} en taille")
+    return True
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:2]]
+    sys.exit(0 if main(*arguments) else 1)
@@ -0,0 +1,148 @@
+"""
+Benchmark : génération de bout en bout des rapports PDF (Dashboard et comparaison) avec
+les graphiques insérés en images PNG.
+
+Trois rendus sont comparés sur les mêmes rapports :
+- historique : `pio.to_image` appelé graphique après graphique, un navigateur par appel ;
+- pool chaud, cache froid : graphiques rastérisés en parallèle par les moteurs Kaleido
+  gardés chauds, avec un cache d'images vide à chaque rapport ;
+- pool chaud et cache d'images : le même rapport régénéré, graphiques repris du cache.
+
+Le démarrage du pool est mesuré à part : il a lieu hors du chemin des requêtes.
+
+Usage : python -m benchmarks.bench_rendu [nb_rapports]
+"""
+import io
+import sys
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from benchmarks.journal_synthetique import generer_csv
+from ventes import rapports
+from ventes.chargement import charger_journal, decompacter_montants
+from ventes.graphiques import (CRITERES, figure_evolution, figure_top, figure_repartition,
+                               create_comparison_kpis, create_comparison_chart)
+from ventes.rapports import create_pdf_with_charts, create_comparison_pdf
+from ventes.rendu import CacheImages, PoolRendu, prerendre_figures, rendre_figure
+
+
+def figures_rapports(df):
+    """Les quatre graphiques du rapport du Dashboard et les deux du rapport de comparaison"""
+    evolution = df.groupby('Date')['Total_TTC'].sum().resample('W').sum().reset_index()
+    top_articles = df.groupby('Libellé', observed=True)['Total_TTC'].sum().nlargest(10).reset_index()
+    categories = df.groupby('Catégorie', observed=True)['Total_TTC'].sum().reset_index()
+    annees = df.groupby([df['Date'].dt.year, 'Catégorie'], observed=True)['Total_TTC'].sum().unstack(0)
+
+    comparaison = go.Figure([go.Bar(name=str(annee), x=annees[annee], y=annees.index, orientation='h')
+                             for annee in annees.columns[:2]])
+    return [
+        (px.line(evolution, x='Date', y='Total_TTC', markers=True), 700, 350),
+        (px.bar(top_articles, x='Total_TTC', y='Libellé', orientation='h'), 600, 400),
+        (px.bar(categories.nlargest(10, 'Total_TTC'), x='Total_TTC', y='Catégorie', orientation='h'), 600, 400),
+        (px.pie(categories, values='Total_TTC', names='Catégorie'), 500, 400),
+        (comparaison.update_layout(barmode='group'), 700, 350),
+        (px.pie(categories, values='Total_TTC', names='Catégorie', hole=0.4), 700, 350),
+    ]
+
+
+def arguments_rapports(df):
+    """Arguments des deux rapports : seconde moitié du journal, comparée à la première"""
+    dates = df['Date']
+    milieu = dates.min() + (dates.max() - dates.min()) / 2
+    reference, vue = df[dates <= milieu], df[dates > milieu]
+    debut, fin = vue['Date'].min(), vue['Date'].max()
+    critere = next(iter(CRITERES))
+    dashboard = (
+        vue, debut, fin, 'Semaine', critere, critere, critere,
+        figure_evolution(vue, 'Semaine'),
+        figure_top(vue, 'Libellé', critere),
+        figure_top(vue, 'Catégorie', critere),
+        figure_repartition(vue, critere),
+    )
+    comparaison = (
+        reference, vue, 'Référence', 'Période', dates.min(), milieu, debut, fin,
+        reference['Catégorie'].unique(), reference['Libellé'].unique(),
+        vue['Catégorie'].unique(), vue['Libellé'].unique(),
+        create_comparison_kpis(reference, vue, 'Référence', 'Période'),
+        create_comparison_chart(reference, vue, 'Référence', 'Période', 'top_categories'),
+        create_comparison_chart(reference, vue, 'Référence', 'Période', 'repartition'),
+    )
+    return dashboard, comparaison
+
+
+def rendu_historique(fig, width=800, height=400):
+    """Rendu d'avant le pool : un appel à `pio.to_image` par graphique, sans cache"""
+    return pio.to_image(fig, format='png', width=width, height=height)
+
+
+@contextmanager
+def graphiques_en_images(rendre, prerendre):
+    """Les rapports insèrent leurs graphiques en PNG, rastérisés par `prerendre` puis `rendre`"""
+    precedent = rapports.MODE_GRAPHIQUES_PDF, rapports.rendre_figure, rapports.prerendre_figures
+    rapports.MODE_GRAPHIQUES_PDF, rapports.rendre_figure, rapports.prerendre_figures = 'image', rendre, prerendre
+    try:
+        yield
+    finally:
+        rapports.MODE_GRAPHIQUES_PDF, rapports.rendre_figure, rapports.prerendre_figures = precedent
+
+
+def chronometrer(construire, arguments, rendu, nb_rapports):
+    """Durée moyenne (s) de construction d'un rapport et son contenu ; `rendu()` fournit le rendu de chaque rapport"""
+    debut = time.perf_counter()
+    for _ in range(nb_rapports):
+        with graphiques_en_images(*rendu()):
+            pdf = construire(*arguments).getvalue()
+    return (time.perf_counter() - debut) / nb_rapports, pdf
+
+
+def main(nb_rapports=3):
+    df = decompacter_montants(charger_journal(io.BytesIO(generer_csv(200_000))))
+    dashboard, comparaison = arguments_rapports(df)
+
+    debut = time.perf_counter()
+    pool = PoolRendu()
+    if not pool.disponible():
+        print(f"Rendu indisponible (Kaleido / Chrome) : {pool.erreur!r}")
+        return False
+    print(f"Démarrage du pool ({pool.nb_moteurs} moteurs), hors du chemin des requêtes : "
+          f"{time.perf_counter() - debut:.2f} s")
+
+    def avec_pool(cache):
+        return partial(rendre_figure, cache=cache, pool=pool), partial(prerendre_figures, cache=cache, pool=pool)
+
+    cache_partage = CacheImages()
+    rendus = {
+        'Historique (pio.to_image)': lambda: (rendu_historique, lambda figures: None),
+        'Pool chaud, cache froid': lambda: avec_pool(CacheImages()),
+        "Pool chaud, cache d'images": lambda: avec_pool(cache_partage),
+    }
+    try:
+        # Le cache partagé reçoit les graphiques d'une première génération, non mesurée
+        for construire, arguments in ((create_pdf_with_charts, dashboard), (create_comparison_pdf, comparaison)):
+            with graphiques_en_images(*avec_pool(cache_partage)):
+                construire(*arguments)
+
+        resultats = {}
+        for nom, rendu in rendus.items():
+            resultats[nom] = [chronometrer(construire, arguments, rendu, nb_rapports)
+                              for construire, arguments in ((create_pdf_with_charts, dashboard),
+                                                            (create_comparison_pdf, comparaison))]
+    finally:
+        pool.arreter()
+
+    duree_historique = sum(duree for duree, _ in resultats['Historique (pio.to_image)'])
+    print(f"{'Rendu':28} | Dashboard | Comparaison | Accélération")
+    for nom, ((duree_dashboard, _), (duree_comparaison, _)) in resultats.items():
+        print(f"{nom:28} | {duree_dashboard:7.2f} s | {duree_comparaison:9.2f} s "
+              f"| x{duree_historique / (duree_dashboard + duree_comparaison):.1f}")
+    return all(pdf.startswith(b'%PDF') for mesures in resultats.values() for _, pdf in mesures)
+
+
+if __name__ == '__main__':
+    arguments = [int(valeur) for valeur in sys.argv[1:2]]
+    sys.exit(0 if main(*arguments) else 1)
@@ -0,0 +1,62 @@
+"""
+Génération d'un journal des ventes synthétique au format de la caisse (CSV ';' latin1).
+"""
+import numpy as np
+import pandas as pd
+
+ARTICLES_BASE = [
+    'Café espresso', 'Cafe Latte', 'Hot chocolat', 'Tisane verveine', 'Earl Grey tea', 'Green Tea',
+    'Coke', 'Sprite', 'Ice Tea', 'Ginger beer', 'Jus orange', 'Apple juice', 'Perrier', 'Evian 50cl',
+    'Whisky', 'Gin tonic', 'Pinot noir verre', 'Rosé bouteille', 'Sancerre', 'Pint Guinness', 'Pint choose',
+    'Bière 1664', 'Champagne coupe', 'Cocktail du jour', 'Cookie chocolat', 'Muffin myrtille', 'Brownie',
+    'Croissant', 'Mars', 'Kit Kat', 'Magnum', 'Quiche lorraine', 'Lasagna', 'Hot dog', 'Plat à 11',
+    'Terrine maison', 'Entree tennis', 'Squash 1h', 'Member fee', 'Balls', 'Not used', 'Sandwich club',
+]
+
+
+def generer_libelles(nb_libelles, rng):
+    """Génère des libellés distincts dérivés des articles de base (dates, préfixes (a):)."""
+    libelles = []
+    for i in range(nb_libelles):
+        base = ARTICLES_BASE[i % len(ARTICLES_BASE)]
+        variante = i // len(ARTICLES_BASE)
+        if variante % 3 == 1:
+            base = f"(a): {base} {rng.integers(1, 29)}/{rng.integers(1, 13)}/2024"
+        elif variante % 3 == 2:
+            base = f"{base}  taille {variante}"
+        elif variante:
+            base = f"{base} {variante}"
+        libelles.append(base)
+    return libelles
+
+
+def generer_journal(nb_lignes=1_000_000, nb_libelles=400, nb_etablissements=3, graine=0):
+    """Retourne un DataFrame brut (colonnes texte comme à la lecture du CSV)."""
+    rng = np.random.default_rng(graine)
+    libelles = np.array(generer_libelles(nb_libelles, rng), dtype=object)
+    dates = pd.date_range('2022-01-01', '2024-12-31', freq='D').strftime('%d/%m/%Y').to_numpy()
+
+    quantites = rng.integers(1, 5, nb_lignes)
+    prix_ht = rng.integers(100, 2000, nb_lignes) / 100
+    total_ht = quantites * prix_ht
+    tva = np.round(total_ht * 0.2, 2)
+
+    def en_francais(valeurs):
+        return pd.Series(valeurs).map('{:.2f}'.format).str.replace('.', ',', regex=False)
+
+    return pd.DataFrame({
+        'Date': dates[rng.integers(0, len(dates), nb_lignes)],
+        'Libellé': libelles[rng.integers(0, nb_libelles, nb_lignes)],
+        'Quantité': quantites,
+        'Total HT': en_francais(total_ht),
+        'TVA': en_francais(tva),
+        'Total TTC': en_francais(total_ht + tva),
+        'Code établissement': np.array([f'BAR{i:02d}' for i in range(1, nb_etablissements + 1)])[
+            rng.integers(0, nb_etablissements, nb_lignes)],
+    })
+
+
+def generer_csv(nb_lignes=1_000_000, nb_libelles=400, nb_etablissements=3, graine=0):
+    """Retourne le contenu d'un journal synthétique en octets (séparateur ';', encodage latin1)."""
+    journal = generer_journal(nb_lignes, nb_libelles, nb_etablissements, graine)
+    return journal.to_csv(sep=';', index=False).encode('latin1')
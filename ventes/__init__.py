@@ -0,0 +1,6 @@
+"""
+Moteur de traitement des journaux de ventes (nettoyage, catégorisation, agrégation).
+
+Ce paquet ne dépend pas de Streamlit : il est utilisé par app.py et peut être
+importé depuis des scripts (benchmarks, traitements en lot).
+"""
@@ -0,0 +1,118 @@
+"""
+Catégorisation des articles à partir de mots-clés dans leur libellé.
+
+Les règles sont décrites dans `regles_categories.json`, lu et compilé une seule fois à
+l'import. Leur version (empreinte des catégories, des mots-clés et de leur ordre) identifie
+les journaux du cache disque catégorisés avec ces règles.
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# --- Règles de catégorisation ---
+# Fichier déclaratif des règles, modifiable par variable d'environnement. L'ordre des règles
+# définit la priorité : la première catégorie dont un mot-clé apparaît dans le libellé (en
+# minuscules) l'emporte. Les sections et groupes ne servent qu'à la page Documentation.
+FICHIER_REGLES = Path(os.environ.get('VENTES_REGLES_CATEGORIES', Path(__file__).with_name('regles_categories.json')))
+
+
+def charger_regles(chemin=FICHIER_REGLES):
+    """Lit le fichier des règles : (règles dans l'ordre de priorité, catégorie par défaut, description complète)"""
+    with open(chemin, encoding='utf-8') as fichier:
+        description = json.load(fichier)
+    regles = [(regle['categorie'], regle['mots_cles'])
+              for section in description['sections']
+              for groupe in section['groupes']
+              for regle in groupe['regles']]
+    return regles, description['categorie_par_defaut']['categorie'], description
+
+
+REGLES_CATEGORIES, CATEGORIE_PAR_DEFAUT, DESCRIPTION_REGLES = charger_regles()
+
+
+# --- Compilation des règles ---
+def calculer_version_regles(regles, categorie_par_defaut=CATEGORIE_PAR_DEFAUT):
+    """Empreinte courte des règles : change dès qu'un mot-clé, une catégorie ou l'ordre change"""
+    contenu = json.dumps([regles, categorie_par_defaut], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:12]
+
+
+class MoteurCategorisation:
+    """
+    Catégoriseur compilé : une seule expression régulière regroupe tous les mots-clés.
+
+    Les alternatives sont triées par priorité de catégorie et encapsulées dans un
+    lookahead, de sorte que chaque position du libellé renvoie le mot-clé le plus
+    prioritaire qui y commence. La catégorie retenue est la plus prioritaire parmi
+    toutes les positions, ce qui reproduit exactement la logique « premier `any()`
+    qui correspond » des règles.
+    """
+
+    def __init__(self, regles, categorie_par_defaut=CATEGORIE_PAR_DEFAUT):
+        self.categories = [categorie for categorie, _ in regles]
+        self.categorie_par_defaut = categorie_par_defaut
+        self.version = calculer_version_regles(regles, categorie_par_defaut)
+
+        # Un mot-clé présent dans plusieurs règles garde la priorité la plus forte
+        self._priorite_mot_cle = {}
+        for priorite, (_, mots_cles) in enumerate(regles):
+            for mot_cle in mots_cles:
+                self._priorite_mot_cle.setdefault(mot_cle, priorite)
+
+        mots_tries = sorted(self._priorite_mot_cle, key=self._priorite_mot_cle.get)
+        alternatives = '|'.join(re.escape(mot_cle) for mot_cle in mots_tries)
+        self._motif = re.compile(f'(?=({alternatives}))')
+
+    def categoriser(self, libelle):
+        """Retourne la catégorie d'un libellé (équivalent de l'ancien `categoriser_article`)."""
+        libelle = str(libelle).lower()
+
+        meilleure_priorite = None
+        for correspondance in self._motif.finditer(libelle):
+            priorite = self._priorite_mot_cle[correspondance.group(1)]
+            if meilleure_priorite is None or priorite < meilleure_priorite:
+                meilleure_priorite = priorite
+                if priorite == 0:
+                    break
+
+        if meilleure_priorite is None:
+            return self.categorie_par_defaut
+        return self.categories[meilleure_priorite]
+
+    def categoriser_serie(self, libelles):
+        """
+        Catégorise une série de libellés en ne traitant qu'une fois chaque libellé distinct.
+
+        Les libellés sont factorisés en codes entiers ; la catégorie de chaque valeur
+        unique est ensuite diffusée sur toutes les lignes par indexation des codes.
+        """
+        codes, uniques = pd.factorize(libelles, use_na_sentinel=False)
+        categories_uniques = np.array([self.categoriser(libelle) for libelle in uniques], dtype=object)
+        return pd.Series(categories_uniques[codes], index=libelles.index, name='Catégorie')
+
+
+MOTEUR_CATEGORISATION = MoteurCategorisation(REGLES_CATEGORIES)
+VERSION_REGLES = MOTEUR_CATEGORISATION.version
+
+
+def categoriser_article(libelle):
+    """Retourne la catégorie d'un article à partir de son libellé"""
+    return MOTEUR_CATEGORISATION.categoriser(libelle)
+
+
+def categoriser_libelles(libelles):
+    """Catégorise une série de libellés (une évaluation par libellé distinct)"""
+    return MOTEUR_CATEGORISATION.categoriser_serie(libelles)
+
+
+def recategoriser(df_aggregated):
+    """
+    Recatégorise un journal agrégé selon les règles courantes, sans le relire : la catégorie
+    ne dépend que du libellé nettoyé, chaque libellé distinct est évalué une seule fois.
+    """
+    return df_aggregated.assign(Catégorie=categoriser_libelles(df_aggregated['Libellé']).astype('category'))
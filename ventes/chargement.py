@@ -0,0 +1,508 @@
+"""
+Lecture, nettoyage, catégorisation et agrégation des journaux de ventes.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from ventes.categories import categoriser_libelles
+from ventes.nettoyage import nettoyer_libelles
+
+# Colonnes exportées par la caisse mais inutilisées par le dashboard
+COLONNES_INUTILES = ['AQTE1', 'ATTC1', 'AHT1', 'AQTE2', 'ATTC2', 'AHT2']
+
+# Nombre de lignes du CSV traitées à la fois : borne la mémoire pendant le chargement
+TAILLE_BLOC = 200_000
+
+# Nombre de processus utilisés pour le chargement (1 = chargement séquentiel)
+NB_PROCESSUS = int(os.environ.get('VENTES_NB_PROCESSUS', '1'))
+
+# Démarrage des processus de chargement. Le serveur Streamlit est multi-thread : un fork y
+# recopierait des verrous tenus par d'autres threads (journaux, moteurs de rendu) et pourrait
+# bloquer le processus fils. forkserver démarre les processus depuis un serveur mono-thread ;
+# seul un appelant mono-thread (le traitement en lot) demande 'fork'.
+METHODE_DEMARRAGE = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Types imposés à la lecture : les textes restent du texte quel que soit leur contenu, et
+# la date est lue en catégorie pour n'analyser qu'une fois chaque jour distinct.
+# Les montants et la quantité sont convertis par le lecteur CSV (virgule décimale).
+TYPES_LECTURE = {'Libellé': str, 'Code établissement': str, 'Date': 'category'}
+FORMAT_DATE = '%d/%m/%Y'
+
+# Colonnes numériques du fichier brut
+COLONNES_MONTANTS_BRUTES = ['Total HT', 'TVA', 'Total TTC']
+
+# Nombre maximal de cellules invalides détaillées dans le rapport d'anomalies
+MAX_ANOMALIES = 100
+
+# Clés de regroupement des articles identiques après nettoyage
+CLES_AGREGATION = ['Libellé_Nettoyé', 'Catégorie', 'Date', 'Code_établissement']
+
+# Clés du DataFrame agrégé (le libellé nettoyé y est renommé en Libellé)
+CLES_JOURNAL = ['Libellé', 'Catégorie', 'Date', 'Code_établissement']
+
+# Agrégations appliquées aux lignes d'un même regroupement
+AGREGATIONS = {
+    'Quantité': 'sum',
+    'Total_HT': 'sum',
+    'TVA': 'sum',
+    'Total_TTC': 'sum',
+    'Libellé_Original': 'first'  # Garder le premier libellé original pour référence
+}
+
+# Représentation compacte du DataFrame agrégé : textes en catégories, montants en centimes entiers
+COLONNES_CATEGORIELLES = ['Libellé', 'Catégorie', 'Code_établissement', 'Libellé_Original']
+COLONNES_MONTANTS = ['Total_HT', 'TVA', 'Total_TTC']
+
+
+class ErreurChargement(Exception):
+    """Erreur de lecture ou de nettoyage d'un journal, avec un message destiné à l'utilisateur"""
+
+    def __init__(self, message, conseil=None):
+        super().__init__(message)
+        self.conseil = conseil
+
+    def __reduce__(self):
+        # Conserver le conseil quand l'erreur remonte d'un processus de chargement
+        return (ErreurChargement, (str(self), self.conseil))
+
+
+def lire_journal_par_blocs(source, taille_bloc=TAILLE_BLOC):
+    """Lit un journal des ventes brut (CSV séparé par ';' et encodé en latin1) par blocs de lignes"""
+    try:
+        with pd.read_csv(source, sep=";", encoding='latin1', decimal=',', dtype=TYPES_LECTURE,
+                         chunksize=taille_bloc) as lecteur:
+            yield from lecteur
+    except Exception as e:
+        raise ErreurChargement(
+            f"Erreur lors de la lecture du fichier CSV : {e}",
+            "Veuillez vérifier que le fichier est un CSV valide, avec le séparateur ';' et l'encodage 'latin1'."
+        ) from e
+
+
+# --- Anomalies de lecture ---
+def nouveau_rapport_anomalies():
+    """Rapport vide : nombre total de cellules invalides et détail des premières"""
+    return {'nombre': 0, 'exemples': []}
+
+
+def signaler_anomalies(rapport, masque, lignes, colonne, valeurs):
+    """Ajoute au rapport les cellules invalides d'une colonne, avec leur numéro de ligne dans le fichier"""
+    nombre = int(masque.sum())
+    if nombre == 0:
+        return
+    rapport['nombre'] += nombre
+    place = MAX_ANOMALIES - len(rapport['exemples'])
+    if place > 0:
+        for ligne, valeur in zip(lignes[masque][:place], valeurs[masque][:place]):
+            rapport['exemples'].append({
+                'ligne': int(ligne),
+                'colonne': colonne,
+                'valeur': '' if pd.isna(valeur) else str(valeur)
+            })
+
+
+def fusionner_rapports(rapports):
+    """Regroupe les rapports d'anomalies de plusieurs portions d'un fichier (dans l'ordre du fichier)"""
+    exemples = sorted((exemple for rapport in rapports for exemple in rapport['exemples']),
+                      key=lambda exemple: exemple['ligne'])
+    return {'nombre': sum(rapport['nombre'] for rapport in rapports), 'exemples': exemples[:MAX_ANOMALIES]}
+
+
+# --- Conversion des colonnes ---
+def convertir_dates(dates):
+    """Convertit la colonne Date (lue en catégorie) en n'analysant que les jours distincts"""
+    if not isinstance(dates.dtype, pd.CategoricalDtype):
+        return pd.to_datetime(dates, format=FORMAT_DATE, errors='coerce').to_numpy()
+    jours = pd.to_datetime(dates.cat.categories, format=FORMAT_DATE, errors='coerce').to_numpy()
+    # Le code -1 des cellules vides pointe sur le NaT ajouté en fin de table
+    return np.append(jours, np.datetime64('NaT', 'ns'))[dates.cat.codes.to_numpy()]
+
+
+def convertir_nombres(valeurs):
+    """
+    Retourne la colonne en float64. Une colonne déjà convertie par le lecteur CSV est
+    reprise telle quelle ; sinon (cellule invalide dans le bloc) les virgules décimales
+    sont remplacées et les valeurs non numériques deviennent NaN.
+    """
+    if valeurs.dtype.kind in 'biuf':
+        return valeurs.astype('float64')
+    return pd.to_numeric(valeurs.astype(str).str.replace(',', '.', regex=False).where(valeurs.notna()),
+                         errors='coerce').astype('float64')
+
+
+def preparer_journal(df, rapport=None, decalage_lignes=0):
+    """
+    Convertit les montants, la date et la quantité, puis renomme les colonnes.
+
+    Les cellules invalides sont consignées dans `rapport` avec leur numéro de ligne dans
+    le fichier (`decalage_lignes` = lignes de données qui précèdent la source) : les
+    lignes sans date ou montant valide sont écartées, les quantités invalides valent 0.
+    """
+    if rapport is None:
+        rapport = nouveau_rapport_anomalies()
+
+    # Supprimer les colonnes inutiles
+    df.drop(columns=COLONNES_INUTILES, inplace=True, errors='ignore')
+
+    try:
+        # Numéro de ligne dans le fichier : l'index des blocs se poursuit d'un bloc à l'autre, +1 pour l'en-tête
+        lignes = df.index.to_numpy() + decalage_lignes + 2
+        lignes_invalides = np.zeros(len(df), dtype=bool)
+
+        dates = convertir_dates(df['Date'])
+        invalides = np.isnat(dates)
+        signaler_anomalies(rapport, invalides, lignes, 'Date', df['Date'].to_numpy())
+        lignes_invalides |= invalides
+        df['Date'] = dates
+
+        for colonne in COLONNES_MONTANTS_BRUTES:
+            montants = convertir_nombres(df[colonne])
+            invalides = (montants.isna() & df[colonne].notna()).to_numpy()
+            signaler_anomalies(rapport, invalides, lignes, colonne, df[colonne].to_numpy())
+            lignes_invalides |= invalides
+            df[colonne] = montants
+
+        quantites = convertir_nombres(df['Quantité'])
+        invalides = (quantites.isna() & df['Quantité'].notna()).to_numpy()
+        signaler_anomalies(rapport, invalides, lignes, 'Quantité', df['Quantité'].to_numpy())
+        df['Quantité'] = quantites.fillna(0)
+
+        df = df.rename(columns={
+            'Total HT': 'Total_HT',
+            'Total TTC': 'Total_TTC',
+            'Code établissement': 'Code_établissement'
+        })
+
+    except KeyError as e:
+        raise ErreurChargement(f"Erreur : Colonne manquante dans le fichier chargé : {e}.") from e
+    except Exception as e:
+        raise ErreurChargement(f"Erreur lors du nettoyage des données : {e}") from e
+
+    if lignes_invalides.any():
+        df = df[~lignes_invalides]
+    return df
+
+
+def agreger_journal(df):
+    """Nettoie et catégorise les libellés, puis regroupe les articles identiques par jour et établissement"""
+    try:
+        df['Libellé_Original'] = df['Libellé']  # Garder le libellé original
+        df['Libellé_Nettoyé'] = nettoyer_libelles(df['Libellé'])
+    except KeyError as e:
+        raise ErreurChargement("Erreur : La colonne 'Libellé' est manquante dans le fichier chargé.") from e
+
+    # Appliquer la catégorisation sur les libellés nettoyés
+    df['Catégorie'] = categoriser_libelles(df['Libellé_Nettoyé'])
+
+    # Agrégation des données par libellé nettoyé et catégorie
+    df_aggregated = df.groupby(CLES_AGREGATION).agg(AGREGATIONS).reset_index()
+
+    # Renommer la colonne Libellé_Nettoyé en Libellé pour l'utilisation dans le dashboard
+    return df_aggregated.rename(columns={'Libellé_Nettoyé': 'Libellé'})
+
+
+def fusionner_agregats(partiels):
+    """
+    Fusionne les agrégats partiels des blocs successifs d'un même journal.
+
+    Les sommes s'additionnent et, les blocs étant fusionnés dans l'ordre du fichier,
+    `first` conserve le premier libellé original rencontré, comme sur le fichier entier.
+    """
+    if len(partiels) == 1:
+        return partiels[0]
+    return pd.concat(partiels, ignore_index=True).groupby(CLES_JOURNAL).agg(AGREGATIONS).reset_index()
+
+
+def agreger_source(source, taille_bloc=TAILLE_BLOC, decalage_lignes=0):
+    """
+    Lit, nettoie, catégorise et agrège un journal (ou une portion de journal) bloc par bloc.
+
+    Les agrégats partiels sont regroupés au fil de la lecture, si bien que la mémoire
+    reste bornée par la taille des blocs et du résultat, et non par celle du fichier.
+    Le rapport des cellules invalides est placé dans `df.attrs['anomalies']`.
+    """
+    rapport = nouveau_rapport_anomalies()
+    partiels = []
+    for bloc in lire_journal_par_blocs(source, taille_bloc):
+        partiels.append(agreger_journal(preparer_journal(bloc, rapport, decalage_lignes)))
+        # Regroupement géométrique : chaque ligne n'est refusionnée qu'un nombre borné de fois
+        if sum(len(partiel) for partiel in partiels[1:]) > max(taille_bloc, len(partiels[0])):
+            partiels = [fusionner_agregats(partiels)]
+
+    df_aggregated = fusionner_agregats(partiels)
+    df_aggregated.attrs['anomalies'] = rapport
+    return df_aggregated
+
+
+def charger_journal(source, taille_bloc=TAILLE_BLOC, nb_processus=NB_PROCESSUS, methode_demarrage=METHODE_DEMARRAGE):
+    """
+    Charge un journal complet et retourne le DataFrame agrégé (compact, trié par établissement
+    puis par date) utilisé par le dashboard.
+
+    Avec `nb_processus` > 1, le fichier est découpé en plages traitées en parallèle ;
+    le résultat est identique au chargement séquentiel (`methode_demarrage` : méthode de
+    démarrage des processus de multiprocessing). Un chemin est lu par blocs ;
+    toute autre source est relue depuis le début de son contenu, même déjà lue.
+    """
+    if nb_processus > 1:
+        df_aggregated = agreger_en_parallele(lire_contenu(source), nb_processus, taille_bloc, methode_demarrage)
+    elif isinstance(source, (str, os.PathLike)):
+        df_aggregated = agreger_source(source, taille_bloc)
+    else:
+        df_aggregated = agreger_source(BytesIO(lire_contenu(source)), taille_bloc)
+
+    rapport = df_aggregated.attrs['anomalies']
+    if df_aggregated.empty and rapport['nombre']:
+        premiere = rapport['exemples'][0]
+        raise ErreurChargement(
+            f"Erreur : aucune ligne valide dans le fichier chargé ({rapport['nombre']} cellule(s) invalide(s)).",
+            f"Première anomalie : ligne {premiere['ligne']}, colonne '{premiere['colonne']}', "
+            f"valeur « {premiere['valeur']} » (dates attendues au format JJ/MM/AAAA, montants avec une virgule décimale)."
+        )
+
+    df = trier_par_etablissement(compacter_types(df_aggregated))
+    df.attrs['anomalies'] = rapport
+    return df
+
+
+# --- Chargement parallèle ---
+def lire_contenu(source):
+    """Retourne le contenu brut complet d'une source (octets, fichier chargé, objet fichier ou chemin)"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        if source.seekable():
+            source.seek(0)
+        return source.read()
+    with open(source, 'rb') as fichier:
+        return fichier.read()
+
+
+def decouper_en_plages(contenu, nb_plages):
+    """
+    Sépare l'en-tête du CSV et découpe les données en `nb_plages` plages d'octets
+    contiguës, chacune se terminant sur une fin de ligne.
+    """
+    fin_entete = contenu.find(b'\n') + 1
+    if fin_entete == 0:
+        return contenu, []
+
+    bornes = [fin_entete]
+    for i in range(1, nb_plages):
+        position = fin_entete + (len(contenu) - fin_entete) * i // nb_plages
+        fin_ligne = contenu.find(b'\n', max(position - 1, bornes[-1]))
+        if fin_ligne == -1:
+            break
+        if fin_ligne + 1 > bornes[-1]:
+            bornes.append(fin_ligne + 1)
+    if len(contenu) > bornes[-1]:
+        bornes.append(len(contenu))
+
+    return contenu[:fin_entete], list(zip(bornes[:-1], bornes[1:]))
+
+
+def _agreger_plage(entete, donnees, taille_bloc, decalage_lignes):
+    """Traitement d'une plage dans un processus de chargement"""
+    return agreger_source(BytesIO(entete + donnees), taille_bloc, decalage_lignes)
+
+
+def agreger_en_parallele(contenu, nb_processus, taille_bloc=TAILLE_BLOC, methode_demarrage=METHODE_DEMARRAGE):
+    """
+    Agrège un journal en répartissant ses plages d'octets sur un pool de processus.
+
+    Les agrégats partiels sont fusionnés dans l'ordre du fichier, ce qui conserve le
+    même premier libellé original que le chargement séquentiel.
+    """
+    entete, plages = decouper_en_plages(contenu, nb_processus)
+    if len(plages) <= 1:
+        return agreger_source(BytesIO(contenu), taille_bloc)
+
+    contexte = multiprocessing.get_context(methode_demarrage)
+    with ProcessPoolExecutor(max_workers=nb_processus, mp_context=contexte) as executeur:
+        partiels = list(executeur.map(
+            _agreger_plage,
+            repeat(entete),
+            (contenu[debut:fin] for debut, fin in plages),
+            repeat(taille_bloc),
+            # Lignes de données qui précèdent chaque plage, pour numéroter les anomalies
+            (contenu.count(b'\n', len(entete), debut) for debut, _ in plages)
+        ))
+
+    rapport = fusionner_rapports([partiel.attrs['anomalies'] for partiel in partiels])
+    df_aggregated = fusionner_agregats(partiels)
+    df_aggregated.attrs['anomalies'] = rapport
+    return df_aggregated
+
+
+def trier_par_etablissement(df):
+    """
+    Trie par établissement puis par date (tri stable) : chaque établissement forme une
+    partition contiguë, dans laquelle le filtrage indexé recherche les périodes par dichotomie.
+    """
+    return df.sort_values(['Code_établissement', 'Date'], kind='stable', ignore_index=True)
+
+
+def index_partitions(df):
+    """Positions [début, fin) de chaque établissement dans un DataFrame trié par établissement"""
+    codes = df['Code_établissement']
+    valeurs = codes.cat.codes.to_numpy() if isinstance(codes.dtype, pd.CategoricalDtype) else pd.factorize(codes)[0]
+    if not len(valeurs):
+        return {}
+    debuts = np.flatnonzero(np.r_[True, valeurs[1:] != valeurs[:-1]])
+    fins = np.r_[debuts[1:], len(valeurs)]
+    return {str(codes.iat[debut]): (int(debut), int(fin)) for debut, fin in zip(debuts, fins)}
+
+
+# --- Représentation compacte ---
+def memoire_frame(df):
+    """Mémoire occupée par un DataFrame, chaînes de caractères comprises (en octets)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compacter_types(df_aggregated):
+    """
+    Convertit le DataFrame agrégé dans des types compacts : catégories pour les libellés,
+    catégories et établissements, centimes entiers (int32, int64 si nécessaire) pour les
+    montants, plus petit entier possible pour la quantité. La mémoire avant/après est
+    conservée dans `df.attrs['memoire']`.
+
+    Les montants en centimes sont exacts (un float32 ne l'est plus au-delà de 100 000 €) :
+    ils sont repassés en euros float64 (`decompacter_montants`) avant tout calcul.
+    """
+    memoire_avant = memoire_frame(df_aggregated)
+
+    df = df_aggregated.astype({colonne: 'category' for colonne in COLONNES_CATEGORIELLES})
+    for colonne in COLONNES_MONTANTS:
+        centimes = np.rint(df[colonne].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        limite = np.iinfo(np.int32).max
+        df[colonne] = centimes.astype(np.int32) if np.abs(centimes).max(initial=0) <= limite else centimes
+    quantite = pd.to_numeric(df['Quantité'], downcast='integer')
+    df['Quantité'] = quantite.astype('float32') if quantite.dtype.kind == 'f' else quantite
+
+    df.attrs['memoire'] = {'avant': memoire_avant, 'apres': memoire_frame(df)}
+    return df
+
+
+def decompacter_montants(df):
+    """Retourne une copie avec les montants en euros float64 (depuis les centimes), pour des totaux exacts"""
+    montants = {colonne: df[colonne].to_numpy(dtype=np.float64) / 100 for colonne in COLONNES_MONTANTS}
+    return df.assign(**montants)
+
+
+def categories_etendues(df_existant, df_ajout):
+    """
+    Types catégoriels communs à deux DataFrames : catégories du jeu existant, complétées à
+    la fin par les nouvelles valeurs de l'ajout. Les codes du jeu existant restent valables
+    tels quels ; seules les lignes de l'ajout sont recodées.
+    """
+    types = {}
+    for colonne, type_existant in df_existant.dtypes.items():
+        if isinstance(type_existant, pd.CategoricalDtype):
+            categories = type_existant.categories
+            nouvelles = df_ajout[colonne].astype('category').cat.categories.difference(categories)
+            types[colonne] = pd.CategoricalDtype(categories.append(nouvelles)) if len(nouvelles) else type_existant
+    return types
+
+
+def recoder_categories(df, types):
+    """
+    Copie de `df` dont les colonnes catégorielles prennent les types `types`. Les codes sont
+    recalculés explicitement : pandas tient pour identiques deux types aux mêmes catégories
+    dans un ordre différent, et `astype` laisserait alors les codes inchangés.
+    """
+    colonnes = {}
+    for colonne, type_commun in types.items():
+        serie = df[colonne].astype('category')
+        correspondance = np.append(type_commun.categories.get_indexer(serie.cat.categories), -1)
+        colonnes[colonne] = pd.Categorical.from_codes(correspondance[serie.cat.codes.to_numpy()], dtype=type_commun)
+    return df.assign(**colonnes)
+
+
+# --- Ajout incrémental ---
+def fusionner_partitions(df_existant, partitions, df_ajout):
+    """
+    Ajoute un journal agrégé (typiquement l'export d'une journée) à un jeu existant trié
+    par établissement, dont `partitions` sont les partitions. Retourne le jeu fusionné et
+    ses partitions.
+
+    Les couples (Date, Code_établissement) présents dans l'ajout remplacent ceux du jeu
+    existant : ajouter deux fois le même export, ou un export qui recouvre des jours
+    déjà chargés, ne compte jamais les ventes en double.
+
+    Le travail est proportionnel à l'ajout : dans chaque partition d'un établissement de
+    l'ajout, seules les lignes comprises entre son premier et son dernier jour sont
+    fusionnées et triées. Les autres plages sont recopiées telles quelles, sans tri ni
+    changement de type ; un nouvel établissement forme une partition ajoutée à la fin.
+    """
+    if df_ajout.empty:
+        return df_existant, partitions
+    if df_existant is None or df_existant.empty:
+        return df_ajout, index_partitions(df_ajout)
+
+    memoire_avant = df_existant.attrs.get('memoire', {}).get('avant', 0) + df_ajout.attrs.get('memoire', {}).get('avant', 0)
+    types = categories_etendues(df_existant, df_ajout)
+    df_ajout = recoder_categories(df_ajout, types)
+    partitions_ajout = index_partitions(df_ajout)
+    dates = df_existant['Date'].to_numpy()
+
+    # Morceaux du résultat dans l'ordre : plages (début, fin) du jeu existant, ou jours
+    # fusionnés d'une partition (DataFrames déjà dans les types communs)
+    morceaux = []
+    partitions_fusion = {}
+    taille = 0
+    codes = [*partitions, *sorted(code for code in partitions_ajout if code not in partitions)]
+    for code in codes:
+        debut, fin = partitions.get(code, (0, 0))
+        if code in partitions_ajout:
+            ajout = df_ajout.iloc[slice(*partitions_ajout[code])]
+            jours_ajout = ajout['Date'].to_numpy()
+            premier = debut + dates[debut:fin].searchsorted(jours_ajout[0], side='left')
+            dernier = debut + dates[debut:fin].searchsorted(jours_ajout[-1], side='right')
+            conserves = df_existant.iloc[premier:dernier]
+            conserves = conserves[~conserves['Date'].isin(ajout['Date'].unique())]
+            if len(conserves):
+                jours = pd.concat([recoder_categories(conserves, types), ajout]).sort_values('Date', kind='stable')
+            else:
+                jours = ajout
+            morceaux += [(debut, premier), jours, (dernier, fin)]
+            taille_partition = fin - debut - (dernier - premier) + len(jours)
+        else:
+            morceaux.append((debut, fin))
+            taille_partition = fin - debut
+        partitions_fusion[code] = (int(taille), int(taille + taille_partition))
+        taille += taille_partition
+
+    colonnes = {}
+    for colonne in df_existant.columns:
+        categorielle = colonne in types
+        existant = df_existant[colonne].cat.codes if categorielle else df_existant[colonne]
+        valeurs = existant.to_numpy()
+        valeurs = np.concatenate([
+            valeurs[morceau[0]:morceau[1]] if isinstance(morceau, tuple)
+            else (morceau[colonne].cat.codes if categorielle else morceau[colonne]).to_numpy()
+            for morceau in morceaux
+        ])
+        if categorielle:
+            valeurs = pd.Categorical.from_codes(valeurs, dtype=types[colonne], validate=False)
+        colonnes[colonne] = valeurs
+    df_fusion = pd.DataFrame(colonnes)
+
+    df_fusion.attrs['memoire'] = {'avant': memoire_avant, 'apres': memoire_frame(df_fusion)}
+    anomalies = df_existant.attrs.get('anomalies')
+    if anomalies:
+        df_fusion.attrs['anomalies'] = anomalies
+    return df_fusion, partitions_fusion
+
+
+def fusionner_journaux(df_existant, df_ajout):
+    """Ajoute un journal agrégé à un jeu existant (voir `fusionner_partitions`)"""
+    partitions = index_partitions(df_existant) if df_existant is not None else {}
+    return fusionner_partitions(df_existant, partitions, df_ajout)[0]
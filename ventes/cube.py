@@ -0,0 +1,110 @@
+"""
+Cube journalier des ventes pré-agrégé au chargement.
+
+Le cube est le niveau date × catégorie × établissement, trié par établissement puis par
+date et accompagné de l'index de ses partitions par établissement. Le niveau article
+n'y est pas repris : il aurait autant de lignes que le DataFrame agrégé, dont les vues par
+article sont tirées directement (`filter_data`). Après l'ajout d'un journal, le cube est
+complété à partir de celui du jeu précédent (`fusionner_cube`) plutôt que reconstruit.
+
+Tant que tous les articles des catégories sélectionnées sont retenus, les indicateurs,
+l'évolution et les graphiques par catégorie sont calculés sur le cube.
+Les regroupements hebdomadaires et mensuels, les moyennes glissantes, la comparaison à
+l'année précédente et les cumuls sont dérivés de la série journalière.
+"""
+import pandas as pd
+
+from ventes.chargement import decompacter_montants, fusionner_partitions
+from ventes.filtres import index_partitions, filtrer_partitions
+
+MESURES = ['Quantité', 'Total_HT', 'TVA', 'Total_TTC']
+
+# Fenêtres des moyennes glissantes (en jours)
+FENETRES_GLISSANTES = (7, 28)
+
+
+def construire_cube(df_complet):
+    """Construit le niveau catégories du cube et ses partitions à partir du DataFrame agrégé"""
+    categories = (
+        decompacter_montants(df_complet)
+        .groupby(['Code_établissement', 'Date', 'Catégorie'], sort=True, observed=True)[MESURES]
+        .sum()
+        .reset_index()
+    )[['Date', 'Catégorie', 'Code_établissement', *MESURES]]
+    return {'categories': categories, 'partitions': index_partitions(categories)}
+
+
+def fusionner_cube(cube, df_ajout):
+    """
+    Cube d'un jeu complété par un journal agrégé, déduit du cube du jeu : les jours de
+    l'ajout, agrégés seuls, remplacent ou complètent ceux des établissements concernés.
+    Un couple (jour, établissement) de l'ajout remplaçant toutes ses ventes, ses lignes
+    du cube ne dépendent que de l'ajout.
+    """
+    categories, partitions = fusionner_partitions(cube['categories'], cube['partitions'],
+                                                  construire_cube(df_ajout)['categories'])
+    return {'categories': categories, 'partitions': partitions}
+
+
+def vue_cube(cube, date_debut, date_fin, selected_categories, etablissements=None):
+    """
+    Retourne la portion du cube correspondant aux filtres (toutes les ventes des catégories
+    sélectionnées). Seules les partitions des établissements sélectionnés (tous si None) sont lues.
+    """
+    return filtrer_partitions(cube['categories'], cube['partitions'], date_debut, date_fin,
+                              selected_categories, None, etablissements)
+
+
+def evolution_cube(vue, freq_code, colonne='Total_TTC'):
+    """Série journalière de la vue, regroupée à la fréquence demandée ('D', 'W' ou 'ME')"""
+    serie_journaliere = vue.groupby('Date')[colonne].sum()
+    return serie_journaliere.resample(freq_code).sum()
+
+
+def classement_cube(vue, dimension, colonne, n=10):
+    """Top `n` des valeurs de `dimension` selon la somme de `colonne`"""
+    df_groupe = vue.groupby(dimension, observed=True)[colonne].sum().reset_index()
+    return df_groupe.sort_values(by=colonne, ascending=False).head(n)
+
+
+# --- Analyses de la série journalière ---
+def debut_analyses(date_debut):
+    """
+    Premier jour de la série journalière nécessaire aux analyses d'une période : la même
+    période un an plus tôt, précédée de la plus longue fenêtre glissante.
+    """
+    return pd.Timestamp(date_debut) - pd.DateOffset(years=1) - pd.Timedelta(days=max(FENETRES_GLISSANTES) - 1)
+
+
+def serie_journaliere(vue, date_debut, date_fin, colonne='Total_TTC'):
+    """Série journalière de la vue sur [date_debut, date_fin], les jours sans vente à 0"""
+    jours = pd.date_range(pd.Timestamp(date_debut), pd.Timestamp(date_fin), freq='D')
+    return vue.groupby('Date')[colonne].sum().reindex(jours, fill_value=0)
+
+
+def analyses_journalieres(serie, date_debut, date_fin):
+    """
+    Analyses jour par jour de la période [date_debut, date_fin] à partir d'une série
+    journalière qui la précède (voir `debut_analyses`) : total, moyennes glissantes, même
+    jour un an plus tôt ('N-1') et cumuls depuis le début de la période. Les valeurs qui
+    sortent de la série (historique insuffisant) sont manquantes.
+    """
+    jours = pd.date_range(pd.Timestamp(date_debut), pd.Timestamp(date_fin), freq='D')
+    analyses = pd.DataFrame({'Total': serie.reindex(jours)}, index=jours)
+    for fenetre in FENETRES_GLISSANTES:
+        analyses[f"Moyenne {fenetre} jours"] = serie.rolling(fenetre, min_periods=fenetre).mean().reindex(jours)
+    analyses['N-1'] = serie.reindex(jours - pd.DateOffset(years=1)).to_numpy()
+    analyses['Cumul'] = analyses['Total'].cumsum()
+    analyses['Cumul N-1'] = analyses['N-1'].cumsum()
+    return analyses
+
+
+def regrouper_analyses(analyses, freq_code):
+    """Regroupe les analyses journalières à la fréquence demandée : sommes des totaux, cumuls en fin de période"""
+    regroupement = analyses.resample(freq_code)
+    return pd.DataFrame({
+        'Total': regroupement['Total'].sum(min_count=1),
+        'N-1': regroupement['N-1'].sum(min_count=1),
+        'Cumul': regroupement['Cumul'].last(),
+        'Cumul N-1': regroupement['Cumul N-1'].last(),
+    })
@@ -0,0 +1,182 @@
+"""
+Filtrage indexé des ventes : établissements par partitions contiguës, plage de dates
+par recherche dichotomique, appartenance aux catégories et articles par table de bits
+sur les codes catégoriels.
+
+Le DataFrame agrégé et le cube journalier sont triés par établissement puis par date :
+chaque établissement occupe une plage de lignes contiguë (sa partition), triée par date.
+Filtrer un établissement ne lit que sa partition. Les options des filtres (catégories,
+articles de chaque catégorie) sont tirées d'un index construit une fois par jeu ; les
+sélections sont conservées sous forme de codes, positions dans les listes de l'index.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from ventes.chargement import decompacter_montants, index_partitions
+
+
+def bornes_dates(df, date_debut, date_fin):
+    """Positions [début, fin) des lignes comprises entre deux dates incluses (df trié par date)"""
+    dates = df['Date'].to_numpy()
+    debut = dates.searchsorted(pd.Timestamp(date_debut).to_datetime64(), side='left')
+    fin = dates.searchsorted(pd.Timestamp(date_fin).to_datetime64(), side='right')
+    return debut, fin
+
+
+def masque_membres(serie, valeurs):
+    """
+    Masque booléen équivalent à `serie.isin(valeurs)`.
+
+    Pour une série catégorielle, les valeurs sélectionnées sont converties une fois en
+    codes, marqués dans une table de bits indexée ensuite par les codes de chaque ligne
+    (la case supplémentaire en fin de table absorbe le code -1 des valeurs manquantes).
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.isin(valeurs).to_numpy()
+
+    categories = serie.cat.categories
+    codes_selection = categories.get_indexer(valeurs)
+    table_bits = np.zeros(len(categories) + 1, dtype=bool)
+    table_bits[codes_selection[codes_selection >= 0]] = True
+    return table_bits[serie.cat.codes.to_numpy()]
+
+
+def filtrer_ventes(df, date_debut, date_fin, selected_categories, selected_articles=None):
+    """Filtre un DataFrame trié par date (une partition) sur une période, des catégories et éventuellement des articles"""
+    debut, fin = bornes_dates(df, date_debut, date_fin)
+    tranche = df.iloc[debut:fin]
+
+    masque = masque_membres(tranche['Catégorie'], selected_categories)
+    if selected_articles is not None:
+        masque &= masque_membres(tranche['Libellé'], selected_articles)
+
+    if masque.all():
+        return tranche
+    return tranche[masque]
+
+
+# --- Index des articles par catégorie ---
+def index_articles(df):
+    """
+    Index des options des filtres, construit une fois par jeu de données : catégories triées,
+    articles triés de chaque catégorie et liste triée de tous les articles, avec les codes
+    (positions dans ces listes) de chaque valeur et le code de la catégorie de chaque article.
+    """
+    return index_paires(df.groupby(['Catégorie', 'Libellé'], observed=True).size().index)
+
+
+def index_paires(paires):
+    """Index des options des filtres (voir `index_articles`) à partir des couples (catégorie, article)"""
+    articles = {}
+    for categorie, libelle in paires:
+        articles.setdefault(str(categorie), []).append(str(libelle))
+    for libelles in articles.values():
+        libelles.sort()
+    categories = sorted(articles)
+    tous = sorted(libelle for libelles in articles.values() for libelle in libelles)
+
+    codes_categories = {categorie: code for code, categorie in enumerate(categories)}
+    codes_articles = {libelle: code for code, libelle in enumerate(tous)}
+    categorie_article = np.empty(len(tous), dtype=np.int32)
+    for categorie, libelles in articles.items():
+        categorie_article[[codes_articles[libelle] for libelle in libelles]] = codes_categories[categorie]
+    return {
+        'categories': categories,
+        'articles': articles,
+        'tous': tous,
+        'codes_categories': codes_categories,
+        'codes_articles': codes_articles,
+        'categorie_article': categorie_article,
+    }
+
+
+def fusionner_index_articles(index, df_ajout, df_fusion=None):
+    """
+    Index des articles d'un jeu complété par un journal, déduit de l'index du jeu : les
+    couples (catégorie, article) de l'ajout y sont ajoutés, sans relire l'historique.
+    Si l'ajout a remplacé des jours déjà chargés, `df_fusion` (le jeu complété) permet
+    de retirer les articles qui n'y ont plus aucune vente.
+    """
+    paires = {(categorie, libelle) for categorie, libelles in index['articles'].items() for libelle in libelles}
+    paires.update(df_ajout.groupby(['Catégorie', 'Libellé'], observed=True).size().index)
+    if df_fusion is not None:
+        libelles = df_fusion['Libellé']
+        presents = np.zeros(len(libelles.cat.categories) + 1, dtype=bool)
+        presents[libelles.cat.codes.to_numpy()] = True
+        vendus = set(libelles.cat.categories[presents[:-1]])
+        paires = {(categorie, libelle) for categorie, libelle in paires if libelle in vendus}
+    return index_paires(paires)
+
+
+def articles_des_categories(index, categories):
+    """
+    Articles triés des catégories sélectionnées (tous les articles si aucune ne l'est).
+    Un article n'appartient qu'à une catégorie : fusionner les listes triées suffit.
+    """
+    if not categories:
+        return index['tous']
+    return list(heapq.merge(*(index['articles'].get(categorie, []) for categorie in categories)))
+
+
+# --- Sélections sous forme de codes ---
+def coder_selection(valeurs, codes):
+    """Codes (int32) des valeurs sélectionnées d'après une table valeur -> code ; les valeurs inconnues sont ignorées"""
+    return np.fromiter((codes[valeur] for valeur in valeurs if valeur in codes), dtype=np.int32)
+
+
+def decoder_selection(codes, valeurs):
+    """Valeurs d'une sélection à partir de ses codes (positions dans la liste `valeurs`)"""
+    return [valeurs[code] for code in codes]
+
+
+def codes_articles_des_categories(index, codes_categories):
+    """Codes de tous les articles des catégories sélectionnées (tous les articles si aucune ne l'est)"""
+    if not len(codes_categories):
+        return np.arange(len(index['tous']), dtype=np.int32)
+    return np.flatnonzero(np.isin(index['categorie_article'], codes_categories)).astype(np.int32)
+
+
+def codes_articles_valides(index, codes_articles, codes_categories):
+    """Codes des articles sélectionnés qui appartiennent aux catégories sélectionnées, dans l'ordre de la sélection"""
+    codes_articles = np.asarray(codes_articles, dtype=np.int32)
+    if not len(codes_categories):
+        return codes_articles
+    return codes_articles[np.isin(index['categorie_article'][codes_articles], codes_categories)]
+
+
+def selection_valide(selection, disponibles):
+    """Éléments de `selection` présents parmi les valeurs `disponibles`, dans l'ordre de la sélection"""
+    disponibles = set(disponibles)
+    return [valeur for valeur in selection if valeur in disponibles]
+
+
+# --- Partitions par établissement ---
+def filtrer_partitions(df, partitions, date_debut, date_fin, selected_categories, selected_articles=None,
+                       etablissements=None):
+    """
+    Filtre les partitions des établissements sélectionnés (tous si None) et les met bout à
+    bout ; les autres partitions ne sont pas lues.
+    """
+    if etablissements is not None:
+        etablissements = set(etablissements)
+    vues = [
+        filtrer_ventes(df.iloc[debut:fin], date_debut, date_fin, selected_categories, selected_articles)
+        for code, (debut, fin) in partitions.items()
+        if etablissements is None or code in etablissements
+    ]
+    if not vues:
+        return df.iloc[0:0]
+    return vues[0] if len(vues) == 1 else pd.concat(vues)
+
+
+def filter_data(df_complet, date_debut, date_fin, selected_categories, selected_articles, etablissements=None,
+                partitions=None):
+    """Filtre les données selon les critères (montants repassés en float64 pour les calculs)"""
+    if partitions is None:
+        partitions = index_partitions(df_complet)
+    return decompacter_montants(
+        filtrer_partitions(df_complet, partitions, date_debut, date_fin, selected_categories, selected_articles,
+                           etablissements)
+    )
@@ -0,0 +1,238 @@
+"""
+Graphiques et indicateurs des rapports, communs au Dashboard, à la page Comparaison et
+à la génération des rapports en lot.
+
+Les fonctions prennent des vues déjà filtrées (cube journalier ou DataFrame agrégé, avec
+des montants en float64) et retournent des figures Plotly ou des tableaux prêts à afficher.
+"""
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from ventes.cube import evolution_cube, classement_cube, regrouper_analyses, FENETRES_GLISSANTES
+from ventes.indicateurs import calculer_indicateurs
+
+# Critères de classement et de répartition : colonne sommée et libellé de l'axe
+CRITERES = {
+    "Chiffre d'Affaires (TTC)": ('Total_TTC', "Chiffre d'Affaires Total (TTC)"),
+    "Volume des Ventes (Quantité)": ('Quantité', "Volume Total Vendu (Quantité)"),
+}
+
+# Fréquences d'agrégation de l'évolution
+FREQUENCES = {'Jour': 'D', 'Semaine': 'W', 'Mois': 'ME'}
+
+# Analyses proposées à côté de l'évolution : option -> colonne des analyses journalières
+MOYENNES_GLISSANTES = {f"Moyenne glissante {fenetre} jours": f"Moyenne {fenetre} jours"
+                       for fenetre in FENETRES_GLISSANTES}
+MEME_PERIODE_N_1 = "Même période N-1"
+CUMUL = "Cumul depuis le début"
+ANALYSES = [*MOYENNES_GLISSANTES, MEME_PERIODE_N_1, CUMUL]
+
+
+# --- Graphiques du Dashboard ---
+def figure_evolution(vue, frequence_choix, analyses=None, options=()):
+    """
+    Évolution du Total TTC, regroupée par jour, semaine ou mois ; avec les analyses
+    journalières de la période, la même période de l'année précédente peut y être superposée.
+    """
+    if analyses is None or MEME_PERIODE_N_1 not in options:
+        df_evolution = evolution_cube(vue, FREQUENCES[frequence_choix]).reset_index()
+        df_evolution.columns = [frequence_choix, 'Total TTC (€)']
+        return px.line(
+            df_evolution,
+            x=frequence_choix,
+            y='Total TTC (€)',
+            title=f"Évolution du Total TTC par {frequence_choix.lower()}"
+        )
+
+    regroupement = regrouper_analyses(analyses, FREQUENCES[frequence_choix])
+    df_evolution = regroupement[['Total', 'N-1']].rename(columns={'Total': 'Période', 'N-1': 'Année précédente'})
+    return _courbes(df_evolution, frequence_choix, 'Total TTC (€)',
+                    f"Évolution du Total TTC par {frequence_choix.lower()}, comparée à l'année précédente")
+
+
+def figure_moyennes_glissantes(analyses, options):
+    """Total TTC journalier et ses moyennes glissantes sélectionnées"""
+    colonnes = {'Total': 'Total du jour'} | {MOYENNES_GLISSANTES[option]: option.replace('Moyenne glissante', 'Moyenne')
+                                             for option in options if option in MOYENNES_GLISSANTES}
+    return _courbes(analyses[list(colonnes)].rename(columns=colonnes), 'Jour', 'Total TTC (€ par jour)',
+                    "Total TTC journalier et moyennes glissantes")
+
+
+def figure_cumul(analyses, options):
+    """Cumul du Total TTC depuis le début de la période (et de la même période N-1 si demandée)"""
+    colonnes = {'Cumul': 'Période'}
+    if MEME_PERIODE_N_1 in options:
+        colonnes['Cumul N-1'] = 'Année précédente'
+    return _courbes(analyses[list(colonnes)].rename(columns=colonnes), 'Jour', 'Cumul TTC (€)',
+                    "Cumul du Total TTC depuis le début de la période")
+
+
+def figures_analyses(analyses, options):
+    """Graphiques complémentaires des options sélectionnées : moyennes glissantes puis cumul"""
+    figures = []
+    if any(option in MOYENNES_GLISSANTES for option in options):
+        figures.append(figure_moyennes_glissantes(analyses, options))
+    if CUMUL in options:
+        figures.append(figure_cumul(analyses, options))
+    return figures
+
+
+def _courbes(df, nom_abscisse, nom_ordonnee, titre):
+    """Une courbe par colonne d'un DataFrame indexé par date"""
+    df_long = df.rename_axis(nom_abscisse).reset_index().melt(
+        id_vars=nom_abscisse, var_name='Série', value_name=nom_ordonnee)
+    return px.line(df_long, x=nom_abscisse, y=nom_ordonnee, color='Série', title=titre)
+
+
+def figure_top(vue, dimension, critere):
+    """Top 10 des articles ('Libellé') ou des catégories ('Catégorie') selon un critère"""
+    colonne, libelle_axe = CRITERES[critere]
+    df_top10 = classement_cube(vue, dimension, colonne)
+    nom = 'articles' if dimension == 'Libellé' else 'catégories'
+    fig = px.bar(
+        df_top10,
+        y=dimension,
+        x=colonne,
+        title=f"Top 10 des {nom} par {critere}",
+        labels={dimension: 'Article' if dimension == 'Libellé' else 'Catégorie', colonne: libelle_axe}
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def figure_repartition(vue, critere):
+    """Camembert de la répartition par catégorie selon un critère"""
+    colonne, _ = CRITERES[critere]
+    if colonne == 'Total_TTC':
+        titre = "Répartition du Chiffre d'Affaires (TTC) par Catégorie"
+    else:
+        titre = "Répartition du Volume des Ventes par Catégorie"
+
+    df_repartition = vue.groupby('Catégorie', observed=True)[colonne].sum().reset_index()
+    fig = px.pie(
+        df_repartition,
+        names='Catégorie',
+        values=colonne,
+        title=titre
+    )
+    fig.update_traces(textinfo='percent+label', textposition='inside')
+    return fig
+
+
+# --- Comparaison de deux périodes ---
+def create_comparison_kpis(df1, df2, nom_periode1, nom_periode2, kpis1=None, kpis2=None):
+    """
+    Crée un tableau comparatif des KPIs entre deux périodes ; les indicateurs déjà calculés
+    pour l'affichage des périodes peuvent être fournis pour ne pas relire les vues.
+    """
+    kpis1 = calculer_indicateurs(df1) if kpis1 is None else kpis1
+    kpis2 = calculer_indicateurs(df2) if kpis2 is None else kpis2
+
+    # Calcul des écarts
+    ecarts = {}
+    for key in kpis1.keys():
+        if kpis1[key] != 0:
+            ecart_pourcentage = ((kpis2[key] - kpis1[key]) / kpis1[key]) * 100
+        else:
+            ecart_pourcentage = 0
+        ecarts[key] = ecart_pourcentage
+
+    # Création du tableau comparatif
+    comparison_data = {
+        'Indicateur': [
+            "Chiffre d'Affaires TTC (€)",
+            "Chiffre d'Affaires HT (€)",
+            "Volume d'Articles Vendus",
+            "Prix Moyen par Article (€)",
+            "Nombre d'Articles Différents",
+            "Nombre de Catégories"
+        ],
+        nom_periode1: [
+            f"{kpis1['CA_TTC']:,.2f}",
+            f"{kpis1['CA_HT']:,.2f}",
+            f"{kpis1['Quantite']:,.0f}",
+            f"{kpis1['Prix_Moyen']:,.2f}",
+            f"{kpis1['Nb_Articles']:,.0f}",
+            f"{kpis1['Nb_Categories']:,.0f}"
+        ],
+        nom_periode2: [
+            f"{kpis2['CA_TTC']:,.2f}",
+            f"{kpis2['CA_HT']:,.2f}",
+            f"{kpis2['Quantite']:,.0f}",
+            f"{kpis2['Prix_Moyen']:,.2f}",
+            f"{kpis2['Nb_Articles']:,.0f}",
+            f"{kpis2['Nb_Categories']:,.0f}"
+        ],
+        'Évolution (%)': [
+            f"{ecarts['CA_TTC']:+.1f}%",
+            f"{ecarts['CA_HT']:+.1f}%",
+            f"{ecarts['Quantite']:+.1f}%",
+            f"{ecarts['Prix_Moyen']:+.1f}%",
+            f"{ecarts['Nb_Articles']:+.1f}%",
+            f"{ecarts['Nb_Categories']:+.1f}%"
+        ]
+    }
+
+    return pd.DataFrame(comparison_data)
+
+
+def create_comparison_chart(df1, df2, nom_periode1, nom_periode2, chart_type='top_categories'):
+    """Crée un graphique comparatif"""
+
+    if chart_type == 'top_categories':
+        # Top 10 catégories comparées
+        cat1 = df1.groupby('Catégorie', observed=True)['Total_TTC'].sum().nlargest(10)
+        cat2 = df2.groupby('Catégorie', observed=True)['Total_TTC'].sum().nlargest(10)
+
+        fig = go.Figure()
+
+        fig.add_trace(go.Bar(
+            name=nom_periode1,
+            x=cat1.values,
+            y=cat1.index,
+            orientation='h',
+            marker_color='blue'
+        ))
+
+        fig.add_trace(go.Bar(
+            name=nom_periode2,
+            x=cat2.values,
+            y=cat2.index,
+            orientation='h',
+            marker_color='red'
+        ))
+
+        fig.update_layout(
+            title="Top 10 Catégories - Comparaison",
+            barmode='group',
+            height=400
+        )
+
+    elif chart_type == 'repartition':
+        # Répartition par catégorie
+        repart1 = df1.groupby('Catégorie', observed=True)['Total_TTC'].sum()
+        repart2 = df2.groupby('Catégorie', observed=True)['Total_TTC'].sum()
+
+        fig = make_subplots(
+            rows=1, cols=2,
+            subplot_titles=[nom_periode1, nom_periode2],
+            specs=[[{'type':'pie'}, {'type':'pie'}]]
+        )
+
+        fig.add_trace(go.Pie(
+            labels=repart1.index,
+            values=repart1.values,
+            name=nom_periode1
+        ), 1, 1)
+
+        fig.add_trace(go.Pie(
+            labels=repart2.index,
+            values=repart2.values,
+            name=nom_periode2
+        ), 1, 2)
+
+        fig.update_layout(height=400)
+
+    return fig
@@ -0,0 +1,72 @@
+"""
+Indicateurs clés d'une vue filtrée (CA TTC et HT, quantité, prix moyen, nombres d'articles
+et de catégories), communs au Dashboard, à la page Comparaison et aux rapports PDF.
+
+Tous les indicateurs sont calculés ensemble, en un parcours de chaque colonne utile :
+les mesures sont sommées directement sur leurs tableaux NumPy (sans copie ni conversion),
+les articles et catégories distincts sont comptés sur les codes catégoriels plutôt que
+par `nunique()`. Les résultats sont mémorisés par état des filtres :
+l'appelant fournit une clé (jeu de données, dates, sélections) et les indicateurs déjà
+affichés sont repris tels quels par le tableau comparatif et les rapports.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Indicateur -> colonne sommée
+MESURES_SOMMEES = {'CA_TTC': 'Total_TTC', 'CA_HT': 'Total_HT', 'Quantite': 'Quantité'}
+
+# Indicateur -> colonne dont les valeurs distinctes sont comptées (None si la vue ne l'a pas)
+DIMENSIONS_COMPTEES = {'Nb_Articles': 'Libellé', 'Nb_Categories': 'Catégorie'}
+
+# Nombre d'états des filtres dont les indicateurs sont conservés
+MAX_INDICATEURS = 256
+
+_MEMOIRE = OrderedDict()   # clé de l'état des filtres -> indicateurs
+_VERROU = threading.Lock()
+
+
+def nb_distincts(serie):
+    """
+    Nombre de valeurs distinctes (hors valeurs manquantes) ; pour une série catégorielle,
+    les codes présents sont marqués dans une table de bits (code -1 dans la dernière case).
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return int(serie.nunique())
+    presents = np.zeros(len(serie.cat.categories) + 1, dtype=bool)
+    presents[serie.cat.codes.to_numpy()] = True
+    return int(np.count_nonzero(presents[:-1]))
+
+
+def calculer_indicateurs(vue):
+    """Indicateurs d'une vue (cube journalier ou DataFrame agrégé, montants en float64)"""
+    indicateurs = {nom: vue[colonne].to_numpy().sum().item() for nom, colonne in MESURES_SOMMEES.items()}
+    indicateurs['Prix_Moyen'] = (indicateurs['CA_TTC'] / indicateurs['Quantite']
+                                 if indicateurs['Quantite'] > 0 else 0)
+    for nom, colonne in DIMENSIONS_COMPTEES.items():
+        indicateurs[nom] = nb_distincts(vue[colonne]) if colonne in vue else None
+    return indicateurs
+
+
+def indicateurs(vue, cle=None):
+    """
+    Indicateurs d'une vue, mémorisés sous `cle` (état des filtres qui a produit la vue) ;
+    sans clé, ils sont simplement calculés. Des indicateurs mémorisés pour une vue sans
+    articles (le cube journalier) sont recalculés si cette vue-ci permet de les compter.
+    """
+    if cle is None:
+        return calculer_indicateurs(vue)
+    with _VERROU:
+        memorises = _MEMOIRE.get(cle)
+        if memorises is not None and all(memorises[nom] is not None or colonne not in vue
+                                         for nom, colonne in DIMENSIONS_COMPTEES.items()):
+            _MEMOIRE.move_to_end(cle)
+            return dict(memorises)
+    resultat = calculer_indicateurs(vue)
+    with _VERROU:
+        _MEMOIRE[cle] = resultat
+        while len(_MEMOIRE) > MAX_INDICATEURS:
+            _MEMOIRE.popitem(last=False)
+    return dict(resultat)
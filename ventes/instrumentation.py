@@ -0,0 +1,131 @@
+"""
+Mesures des étapes du traitement : durée, nombre de lignes et variation de la mémoire.
+
+Une exécution (une relance du script Streamlit, un rapport PDF, une tâche du traitement
+en lot) est suivie par un objet `Mesures`, déclaré comme exécution courante du thread :
+les fonctions du moteur y ajoutent leurs étapes par `mesurer(nom)` sans avoir à le
+recevoir en paramètre. Hors d'une exécution mesurée, `mesurer` n'ajoute qu'une lecture
+de variable de contexte.
+
+Chaque étape est aussi écrite en JSON (une ligne par événement) sur le logger
+`ventes.mesures`, et dans le fichier désigné par `VENTES_JOURNAL_MESURES` s'il est défini.
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+# Fichier des journaux de mesures au format JSON Lines (désactivé si la variable n'est pas définie)
+JOURNAL_MESURES = os.environ.get('VENTES_JOURNAL_MESURES')
+
+LOGGER = logging.getLogger('ventes.mesures')
+if JOURNAL_MESURES:
+    _gestionnaire = logging.FileHandler(JOURNAL_MESURES, encoding='utf-8')
+    _gestionnaire.setFormatter(logging.Formatter('%(message)s'))
+    LOGGER.addHandler(_gestionnaire)
+    LOGGER.setLevel(logging.INFO)
+
+# Exécution mesurée du thread (ou de la tâche asyncio) courant
+_MESURES_COURANTES = contextvars.ContextVar('mesures_courantes', default=None)
+
+_TAILLE_PAGE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def memoire_residente():
+    """Mémoire résidente du processus en octets (None si le système ne la fournit pas)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * _TAILLE_PAGE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # À défaut, le pic de mémoire résidente (en Ko sous Linux, en octets sous macOS)
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pic if os.uname().sysname == 'Darwin' else pic * 1024
+
+
+class Mesures:
+    """Étapes mesurées d'une exécution, décrite par son contexte (page, type de rapport, ...)"""
+
+    def __init__(self, **contexte):
+        self.identifiant = uuid.uuid4().hex[:12]
+        self.contexte = contexte
+        self.etapes = []
+        self._debut = time.perf_counter()
+        self._memoire_debut = memoire_residente()
+        self._jeton = None
+
+    def activer(self):
+        """Déclare cette exécution comme exécution courante du thread (jusqu'à la suivante)"""
+        _MESURES_COURANTES.set(self)
+        return self
+
+    def __enter__(self):
+        self._jeton = _MESURES_COURANTES.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _MESURES_COURANTES.reset(self._jeton)
+        self.terminer()
+        return False
+
+    @contextmanager
+    def etape(self, nom, **details):
+        """
+        Mesure le bloc `with` comme une étape ; le dictionnaire produit peut recevoir des
+        informations connues en fin d'étape, comme `etape['lignes'] = len(df)`.
+        """
+        etape = {'etape': nom, **details}
+        memoire_avant = memoire_residente()
+        debut = time.perf_counter()
+        try:
+            yield etape
+        finally:
+            etape['duree_ms'] = round((time.perf_counter() - debut) * 1000, 2)
+            memoire_apres = memoire_residente()
+            if memoire_avant is not None and memoire_apres is not None:
+                etape['memoire_mo'] = round((memoire_apres - memoire_avant) / 1024 ** 2, 2)
+            self.etapes.append(etape)
+            self._journaliser('etape', **etape)
+
+    def duree_totale(self):
+        """Durée écoulée depuis le début de l'exécution, en millisecondes"""
+        return round((time.perf_counter() - self._debut) * 1000, 2)
+
+    def terminer(self):
+        """Écrit le résumé de l'exécution dans les journaux"""
+        memoire = memoire_residente()
+        resume = {'duree_ms': self.duree_totale(), 'nb_etapes': len(self.etapes)}
+        if memoire is not None:
+            resume['memoire_residente_mo'] = round(memoire / 1024 ** 2, 1)
+            if self._memoire_debut is not None:
+                resume['memoire_mo'] = round((memoire - self._memoire_debut) / 1024 ** 2, 2)
+        self._journaliser('execution', **resume)
+        return resume
+
+    def _journaliser(self, evenement, **valeurs):
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info(json.dumps({'evenement': evenement, 'execution': self.identifiant, 'horodatage': time.time(),
+                                    **self.contexte, **valeurs}, ensure_ascii=False, default=str))
+
+
+def mesures_courantes():
+    """Exécution mesurée du thread courant (None hors d'une exécution mesurée)"""
+    return _MESURES_COURANTES.get()
+
+
+@contextmanager
+def mesurer(nom, **details):
+    """Mesure une étape de l'exécution courante ; sans exécution mesurée, le bloc s'exécute simplement"""
+    mesures = _MESURES_COURANTES.get()
+    if mesures is None:
+        yield dict(details)
+        return
+    with mesures.etape(nom, **details) as etape:
+        yield etape
@@ -0,0 +1,320 @@
+"""
+Génération des rapports PDF en lot, sans interface (tâches planifiées).
+
+Les journaux sont chargés une seule fois (depuis le cache disque, seules les partitions
+des établissements demandés sont lues) ; un rapport du Dashboard, et éventuellement un
+rapport comparatif, est produit pour chaque période et chaque établissement. Les rapports
+sont répartis sur un pool de processus qui héritent des données chargées sans les
+recopier (fork).
+
+Usage :
+    python -m ventes.lot journal.csv [ajout.csv ...] --mois 2025-01:2025-06 --comparaison annee
+    python -m ventes.lot journal.csv --periode 2025-01-01:2025-03-31 --etablissements BAR01 --ensemble
+
+Sans période, le rapport porte sur le mois précédent (exécution mensuelle de nuit).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+from ventes.chargement import charger_journal, fusionner_journaux, lire_contenu, ErreurChargement, METHODE_DEMARRAGE
+from ventes.cube import debut_analyses, serie_journaliere, analyses_journalieres
+from ventes.filtres import filter_data, index_partitions
+from ventes.graphiques import (CRITERES, FREQUENCES, ANALYSES, figure_evolution, figures_analyses, figure_top,
+                               figure_repartition, create_comparison_kpis, create_comparison_chart)
+from ventes.instrumentation import Mesures, mesurer
+from ventes.rapports import create_pdf_with_charts, create_comparison_pdf
+from ventes.stockage import empreinte_contenu, lire_cache, ecrire_cache
+
+# Nom du rapport portant sur tous les établissements réunis
+ENSEMBLE = 'Ensemble'
+
+# Démarrage des processus : fork là où il existe (sûr ici, le traitement en lot est mono-thread)
+METHODE_FORK = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else METHODE_DEMARRAGE
+
+# Données partagées par les processus du pool : jeu complet et positions de ses partitions
+_DONNEES = {}
+
+
+# --- Chargement ---
+def charger_journaux(chemins, etablissements=None):
+    """
+    Charge un journal principal et ses ajouts ; ceux déjà traités sont relus du cache disque,
+    limités aux partitions des établissements demandés (tous si None).
+    """
+    df_complet = None
+    for chemin in chemins:
+        contenu = lire_contenu(chemin)
+        empreinte = empreinte_contenu(contenu)
+        df = lire_cache(empreinte, etablissements=etablissements)
+        if df is None:
+            df = charger_journal(BytesIO(contenu), methode_demarrage=METHODE_FORK)
+            ecrire_cache(empreinte, df)
+        df_complet = df if df_complet is None else fusionner_journaux(df_complet, df)
+    return df_complet
+
+
+def groupes_etablissements(partitions, etablissements=None, ensemble=False):
+    """Rapports à produire par nom : un par établissement, plus l'ensemble si demandé (None : tous)"""
+    codes = [code for code in partitions if not etablissements or code in etablissements]
+    groupes = {code: [code] for code in codes}
+    if ensemble and codes:
+        groupes[ENSEMBLE] = codes if etablissements else None
+    return groupes
+
+
+# --- Périodes ---
+def periode_mois(mois):
+    """Période (nom, début, fin) d'un mois 'AAAA-MM'"""
+    periode = pd.Period(mois, freq='M')
+    return str(periode), periode.start_time.normalize(), periode.end_time.normalize()
+
+
+def lire_periodes(mois=(), periodes=()):
+    """
+    Périodes demandées : mois 'AAAA-MM' ou plages de mois 'AAAA-MM:AAAA-MM', et plages
+    de dates 'AAAA-MM-JJ:AAAA-MM-JJ'. Sans période, le mois précédent.
+    """
+    resultat = []
+    for valeur in mois:
+        premier, _, dernier = valeur.partition(':')
+        for periode in pd.period_range(premier, dernier or premier, freq='M'):
+            resultat.append(periode_mois(periode))
+    for valeur in periodes:
+        debut, _, fin = valeur.partition(':')
+        debut, fin = pd.Timestamp(debut), pd.Timestamp(fin or debut)
+        resultat.append(periode_libre(debut, fin))
+    if not resultat:
+        resultat.append(periode_mois(pd.Timestamp.today().to_period('M') - 1))
+    return resultat
+
+
+def est_mois(debut, fin):
+    """Indique si une période couvre exactement un mois civil"""
+    return debut.is_month_start and fin.is_month_end and debut.to_period('M') == fin.to_period('M')
+
+
+def periode_libre(debut, fin):
+    """Période (nom, début, fin) entre deux dates incluses, nommée comme un mois si elle en couvre un"""
+    if est_mois(debut, fin):
+        return periode_mois(debut.to_period('M'))
+    return f"{debut:%d/%m/%Y} - {fin:%d/%m/%Y}", debut, fin
+
+
+def periode_reference(periode, mode):
+    """
+    Période à laquelle comparer : la précédente de même durée (le mois précédent pour un
+    mois entier) ou la même période un an plus tôt ('annee').
+    """
+    _, debut, fin = periode
+    if mode == 'annee':
+        return periode_libre(debut - pd.DateOffset(years=1), fin - pd.DateOffset(years=1))
+    if est_mois(debut, fin):
+        return periode_mois(debut.to_period('M') - 1)
+    duree = fin - debut + pd.Timedelta(days=1)
+    return periode_libre(debut - duree, fin - duree)
+
+
+def etiquette_fichier(periode):
+    """Partie du nom de fichier propre à une période"""
+    _, debut, fin = periode
+    return f"{debut:%Y%m}" if est_mois(debut, fin) else f"{debut:%Y%m%d}-{fin:%Y%m%d}"
+
+
+# --- Génération d'un rapport ---
+def _initialiser(donnees):
+    """Initialisation d'un processus du pool : données héritées (fork) ou transmises"""
+    global _DONNEES
+    _DONNEES = donnees
+
+
+def vue_periode(etablissements, periode):
+    """Ventes des établissements (tous si None) sur une période, toutes catégories et tous articles"""
+    df = _DONNEES['df']
+    _, debut, fin = periode
+    with mesurer('Filtrage', debut=debut, fin=fin) as etape:
+        vue = filter_data(df, debut, fin, list(df['Catégorie'].unique()), None, etablissements,
+                          _DONNEES['partitions'])
+        etape['lignes'] = len(vue)
+    return vue
+
+
+def rapport_dashboard(etablissements, periode, options):
+    """Construit le rapport du Dashboard d'une période ; None s'il n'y a aucune vente"""
+    vue = vue_periode(etablissements, periode)
+    if vue.empty:
+        return None
+    _, debut, fin = periode
+    analyses = None
+    if options['analyses']:
+        # Série journalière étendue à l'historique nécessaire (année précédente, fenêtres glissantes)
+        debut_serie = max(debut_analyses(debut), _DONNEES['df']['Date'].min())
+        vue_historique = vue_periode(etablissements, (None, debut_serie, fin))
+        analyses = analyses_journalieres(serie_journaliere(vue_historique, debut_serie, fin), debut, fin)
+    return create_pdf_with_charts(
+        vue, debut, fin, options['frequence'],
+        options['critere_articles'], options['critere_categories'], options['critere_pie'],
+        figure_evolution(vue, options['frequence'], analyses, options['analyses']),
+        figure_top(vue, 'Libellé', options['critere_articles']),
+        figure_top(vue, 'Catégorie', options['critere_categories']),
+        figure_repartition(vue, options['critere_pie']),
+        etablissements,
+        options['analyses'],
+        figures_analyses(analyses, options['analyses']) if analyses is not None else []
+    )
+
+
+def rapport_comparatif(etablissements, periode, reference):
+    """Construit le rapport comparatif (référence puis période) ; None si l'une est vide"""
+    vue_reference = vue_periode(etablissements, reference)
+    vue = vue_periode(etablissements, periode)
+    if vue_reference.empty or vue.empty:
+        return None
+    (nom_reference, debut_reference, fin_reference), (nom, debut, fin) = reference, periode
+    return create_comparison_pdf(
+        vue_reference, vue, nom_reference, nom,
+        debut_reference, fin_reference, debut, fin,
+        vue_reference['Catégorie'].unique(), vue_reference['Libellé'].unique(),
+        vue['Catégorie'].unique(), vue['Libellé'].unique(),
+        create_comparison_kpis(vue_reference, vue, nom_reference, nom),
+        create_comparison_chart(vue_reference, vue, nom_reference, nom, 'top_categories'),
+        create_comparison_chart(vue_reference, vue, nom_reference, nom, 'repartition'),
+        etablissements, etablissements
+    )
+
+
+def generer_rapport(tache):
+    """Génère un rapport et l'écrit sur disque ; retourne (tâche, statut, durée)"""
+    debut = time.perf_counter()
+    try:
+        with Mesures(rapport=tache['type'], etablissement=tache['etablissement'], periode=tache['periode'][0]):
+            if tache['type'] == 'comparaison':
+                buffer = rapport_comparatif(tache['etablissements'], tache['periode'], tache['reference'])
+            else:
+                buffer = rapport_dashboard(tache['etablissements'], tache['periode'], tache['options'])
+        if buffer is None:
+            statut = 'aucune vente'
+        else:
+            chemin = Path(tache['chemin'])
+            chemin.parent.mkdir(parents=True, exist_ok=True)
+            chemin.write_bytes(buffer.getvalue())
+            statut = 'ok'
+    except Exception as e:
+        statut = f"erreur : {e}"
+    return tache, statut, time.perf_counter() - debut
+
+
+# --- Planification ---
+def planifier_rapports(groupes, periodes, sortie, options, comparaison=None):
+    """Liste des rapports à produire : chaque période pour chaque groupe d'établissements"""
+    taches = []
+    for nom, etablissements in groupes.items():
+        repertoire = Path(sortie) / nom
+        for periode in periodes:
+            etiquette = etiquette_fichier(periode)
+            taches.append({
+                'type': 'dashboard', 'etablissement': nom, 'etablissements': etablissements, 'periode': periode,
+                'options': options, 'chemin': str(repertoire / f"rapport_ventes_{etiquette}.pdf"),
+            })
+            if comparaison:
+                reference = periode_reference(periode, comparaison)
+                taches.append({
+                    'type': 'comparaison', 'etablissement': nom, 'etablissements': etablissements,
+                    'periode': periode, 'reference': reference,
+                    'chemin': str(repertoire / f"rapport_comparatif_{etiquette}_vs_{etiquette_fichier(reference)}.pdf"),
+                })
+    return taches
+
+
+def executer_taches(taches, donnees, nb_processus):
+    """Génère les rapports, en parallèle si plusieurs processus, et les retourne au fil de l'eau"""
+    if nb_processus <= 1 or len(taches) <= 1:
+        _initialiser(donnees)
+        yield from map(generer_rapport, taches)
+        return
+
+    # fork : les processus héritent des données au lieu de les recevoir sérialisées
+    contexte = multiprocessing.get_context(METHODE_FORK)
+    with ProcessPoolExecutor(max_workers=nb_processus, mp_context=contexte,
+                             initializer=_initialiser, initargs=(donnees,)) as executeur:
+        yield from executeur.map(generer_rapport, taches)
+
+
+# --- Ligne de commande ---
+def lire_arguments(arguments):
+    parser = argparse.ArgumentParser(
+        prog='python -m ventes.lot',
+        description="Génère les rapports PDF des ventes par période et par établissement."
+    )
+    parser.add_argument('journaux', nargs='+', help="Journal des ventes (CSV), suivi des journaux à y ajouter")
+    parser.add_argument('--mois', action='append', default=[], metavar='AAAA-MM[:AAAA-MM]',
+                        help="Mois, ou plage de mois, à traiter (option répétable)")
+    parser.add_argument('--periode', action='append', default=[], metavar='AAAA-MM-JJ:AAAA-MM-JJ',
+                        help="Période libre à traiter (option répétable)")
+    parser.add_argument('--etablissements', nargs='+', metavar='CODE',
+                        help="Codes établissement à traiter (par défaut : tous)")
+    parser.add_argument('--ensemble', action='store_true',
+                        help="Ajoute un rapport pour l'ensemble des établissements")
+    parser.add_argument('--comparaison', choices=['precedente', 'annee'],
+                        help="Ajoute un rapport comparatif avec la période précédente ou celle de l'année d'avant")
+    parser.add_argument('--frequence', choices=list(FREQUENCES), default='Mois',
+                        help="Agrégation du graphique d'évolution")
+    parser.add_argument('--analyses', nargs='+', choices=ANALYSES, default=[], metavar='ANALYSE',
+                        help=f"Analyses ajoutées à l'évolution, parmi : {', '.join(ANALYSES)}")
+    parser.add_argument('--critere', choices=list(CRITERES), default="Chiffre d'Affaires (TTC)",
+                        help="Critère des classements et de la répartition")
+    parser.add_argument('--sortie', default='rapports', help="Répertoire des rapports (un sous-répertoire par établissement)")
+    parser.add_argument('--processus', type=int, default=os.cpu_count() or 1,
+                        help="Nombre de rapports générés simultanément")
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    args = lire_arguments(arguments)
+
+    debut = time.perf_counter()
+    try:
+        df_complet = charger_journaux(args.journaux, args.etablissements)
+    except (ErreurChargement, OSError) as e:
+        print(f"Erreur de chargement : {e}", file=sys.stderr)
+        if getattr(e, 'conseil', None):
+            print(e.conseil, file=sys.stderr)
+        return False
+    nb_anomalies = df_complet.attrs.get('anomalies', {}).get('nombre', 0)
+    print(f"Données chargées en {time.perf_counter() - debut:.1f} s : {len(df_complet):,} lignes"
+          + (f", {nb_anomalies} cellule(s) invalide(s) ignorée(s)" if nb_anomalies else ""))
+
+    donnees = {'df': df_complet, 'partitions': index_partitions(df_complet)}
+    inconnus = [code for code in args.etablissements or () if code not in donnees['partitions']]
+    if inconnus:
+        print(f"Établissement(s) absent(s) des journaux : {', '.join(inconnus)}", file=sys.stderr)
+    groupes = groupes_etablissements(donnees['partitions'], args.etablissements, args.ensemble)
+    options = {'frequence': args.frequence, 'analyses': args.analyses, 'critere_articles': args.critere,
+               'critere_categories': args.critere, 'critere_pie': args.critere}
+    taches = planifier_rapports(groupes, lire_periodes(args.mois, args.periode), args.sortie,
+                                options, args.comparaison)
+    if not taches:
+        print("Aucun rapport à produire : aucun établissement demandé n'est présent dans les journaux",
+              file=sys.stderr)
+        return False
+
+    debut = time.perf_counter()
+    nb_erreurs = 0
+    for tache, statut, duree in executer_taches(taches, donnees, args.processus):
+        nb_erreurs += statut.startswith('erreur')
+        print(f"[{statut}] {tache['etablissement']} | {tache['periode'][0]} | {tache['type']} "
+              f"| {duree:.1f} s" + (f" | {tache['chemin']}" if statut == 'ok' else ""))
+    print(f"{len(taches)} rapport(s) traité(s) en {time.perf_counter() - debut:.1f} s "
+          f"({args.processus} processus), {nb_erreurs} erreur(s)")
+    return nb_erreurs == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,45 @@
+"""
+Nettoyage des libellés d'articles (dates, préfixes (a):, espaces).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Motifs précompilés ---
+MOTIF_DATES = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')  # JJ/MM/AAAA ou JJ-MM-AAAA
+MOTIF_PREFIXE_A = re.compile(r'\([aA]\):')  # (a): et (A):
+MOTIF_ESPACES = re.compile(r'\s+')
+
+
+def nettoyer_article(libelle):
+    """
+    Nettoie le libellé de l'article en enlevant les dates et les (a):/(A):
+    """
+    if pd.isna(libelle):
+        return libelle
+
+    libelle_str = str(libelle)
+
+    # Enlever les dates (format JJ/MM/AAAA ou JJ-MM-AAAA)
+    libelle_sans_dates = MOTIF_DATES.sub('', libelle_str)
+
+    # Enlever les (a): et (A):
+    libelle_sans_a = MOTIF_PREFIXE_A.sub('', libelle_sans_dates)
+
+    # Nettoyer les espaces multiples et les espaces en début/fin
+    libelle_propre = MOTIF_ESPACES.sub(' ', libelle_sans_a).strip()
+
+    return libelle_propre
+
+
+def nettoyer_libelles(libelles):
+    """
+    Nettoie une série de libellés en ne traitant qu'une fois chaque libellé distinct.
+
+    Les libellés sont factorisés en codes entiers, seules les valeurs uniques passent
+    par `nettoyer_article`, puis le résultat est diffusé sur toutes les lignes.
+    """
+    codes, uniques = pd.factorize(libelles, use_na_sentinel=False)
+    libelles_propres = np.array([nettoyer_article(libelle) for libelle in uniques], dtype=object)
+    return pd.Series(libelles_propres[codes], index=libelles.index, name='Libellé_Nettoyé')
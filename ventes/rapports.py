@@ -0,0 +1,445 @@
+"""
+Construction des rapports PDF (Dashboard et comparaison de deux périodes) avec ReportLab.
+
+Les graphiques sont insérés en dessin vectoriel, ou en image PNG (mode 'image' ou
+graphique non pris en charge par le rendu vectoriel). Ces fonctions ne dépendent pas
+de Streamlit : elles servent à la page de téléchargement comme aux rapports en lot.
+"""
+from datetime import datetime
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+from ventes.indicateurs import calculer_indicateurs
+from ventes.instrumentation import mesurer
+from ventes.rendu import rendre_figure, prerendre_figures
+from ventes.vectoriel import MODE_GRAPHIQUES_PDF, GraphiqueNonSupporte, figure_en_dessin
+
+
+# Nombre d'établissements au-delà duquel le rapport n'en donne que le nombre
+MAX_ETABLISSEMENTS_LISTES = 4
+
+
+def libelle_etablissements(etablissements):
+    """Établissements couverts par un rapport, pour les tableaux de paramètres (None : tous)"""
+    if etablissements is None:
+        return 'Tous'
+    if len(etablissements) > MAX_ETABLISSEMENTS_LISTES:
+        return f"{len(etablissements)} établissements"
+    return ', '.join(etablissements) or 'Aucun'
+
+
+# --- Insertion des graphiques ---
+def plotly_fig_to_image(fig, width=800, height=400):
+    """Convertit un graphique Plotly en image PNG (rendus identiques mis en cache)"""
+    img_bytes = rendre_figure(fig, width=width, height=height)
+    return BytesIO(img_bytes)
+
+
+def plotly_fig_to_flowable(fig, width, height, largeur_pdf, hauteur_pdf):
+    """Graphique d'un rapport PDF : dessin vectoriel, ou image PNG (mode 'image' ou graphique non pris en charge)"""
+    with mesurer('Graphique PDF', titre=fig.layout.title.text) as etape:
+        if MODE_GRAPHIQUES_PDF == 'vectoriel':
+            try:
+                etape['mode'] = 'vectoriel'
+                return figure_en_dessin(fig, largeur_pdf, hauteur_pdf)
+            except GraphiqueNonSupporte:
+                pass
+        etape['mode'] = 'image'
+        return Image(plotly_fig_to_image(fig, width=width, height=height), width=largeur_pdf, height=hauteur_pdf)
+
+
+# --- Rapport du Dashboard ---
+def create_pdf_with_charts(df, date_debut, date_fin, frequence_choix, critere_articles, critere_categories, critere_pie,
+                            fig_evol, fig_top_art, fig_top_cat, fig_pie, etablissements=None,
+                            analyses=(), figures_analyses=(), kpis=None):
+    """Crée un rapport PDF complet avec les graphiques (`kpis` : indicateurs déjà calculés pour `df`)"""
+
+    # En mode image, rastériser les quatre graphiques en parallèle ; ils sont repris du cache à leur insertion
+    if MODE_GRAPHIQUES_PDF == 'image':
+        with mesurer('Rastérisation des graphiques'):
+            prerendre_figures([(fig_evol, 700, 350), *((fig, 700, 350) for fig in figures_analyses),
+                               (fig_top_art, 600, 400), (fig_top_cat, 600, 400), (fig_pie, 500, 400)])
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
+                            topMargin=0.5*inch, bottomMargin=0.5*inch,
+                            leftMargin=0.5*inch, rightMargin=0.5*inch)
+    story = []
+    styles = getSampleStyleSheet()
+
+    # Style personnalisé pour le titre
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=20,
+        alignment=1  # Centré
+    )
+
+    # Style pour les sous-titres
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+
+    # Style pour le texte normal
+    normal_style = styles['Normal']
+
+    # En-tête du rapport
+    title = Paragraph("📊 RAPPORT D'ANALYSE DES VENTES", title_style)
+    story.append(title)
+
+    # Période d'analyse
+    period_text = f"Période analysée : {date_debut.strftime('%d/%m/%Y')} au {date_fin.strftime('%d/%m/%Y')}"
+    period = Paragraph(period_text, normal_style)
+    story.append(period)
+
+    date_generation = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
+    generation = Paragraph(date_generation, normal_style)
+    story.append(generation)
+
+    story.append(Spacer(1, 20))
+
+    # --- Section 1: Indicateurs Clés ---
+    story.append(Paragraph("📈 INDICATEURS CLÉS DE PERFORMANCE", subtitle_style))
+
+    # KPIs repris du Dashboard (calculés ici pour les rapports en lot)
+    if kpis is None or kpis['Nb_Articles'] is None or kpis['Nb_Categories'] is None:
+        kpis = calculer_indicateurs(df)
+
+    # Tableau des KPIs
+    kpi_data = [
+        ['Indicateur', 'Valeur'],
+        ["Chiffre d'Affaires TTC", f"{kpis['CA_TTC']:,.2f} €"],
+        ["Chiffre d'Affaires HT", f"{kpis['CA_HT']:,.2f} €"],
+        ["Volume d'Articles Vendus", f"{kpis['Quantite']:,.0f}"],
+        ["Prix Moyen par Article", f"{kpis['Prix_Moyen']:,.2f} €"]
+    ]
+
+    kpi_table = Table(kpi_data, colWidths=[200, 150])
+    kpi_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ]))
+    story.append(kpi_table)
+    story.append(Spacer(1, 20))
+
+    # --- Section 2: Évolution Temporelle ---
+    story.append(Paragraph("📈 ÉVOLUTION DU CHIFFRE D'AFFAIRES", subtitle_style))
+
+    # Ajouter le graphique d'évolution
+    if fig_evol:
+        try:
+            # Convertir le graphique Plotly pour le PDF (dessin vectoriel ou image)
+            img = plotly_fig_to_flowable(fig_evol, 700, 350, 6.5*inch, 3*inch)
+            story.append(img)
+            story.append(Spacer(1, 10))
+        except Exception as e:
+            error_msg = Paragraph(f"Erreur lors de la génération du graphique d'évolution: {e}", normal_style)
+            story.append(error_msg)
+
+    # Moyennes glissantes et cumul, s'ils ont été demandés
+    for fig_analyse in figures_analyses:
+        try:
+            story.append(plotly_fig_to_flowable(fig_analyse, 700, 350, 6.5*inch, 3*inch))
+            story.append(Spacer(1, 10))
+        except Exception as e:
+            story.append(Paragraph(f"Erreur lors de la génération du graphique d'analyse: {e}", normal_style))
+
+    story.append(Spacer(1, 15))
+
+    # --- Section 3: Top 10 ---
+    story.append(Paragraph("🏆 ANALYSE DES PERFORMERS", subtitle_style))
+
+    # Top 10 Articles
+    story.append(Paragraph(f"Top 10 Articles - {critere_articles}", subtitle_style))
+    if fig_top_art:
+        try:
+            img = plotly_fig_to_flowable(fig_top_art, 600, 400, 6*inch, 3.5*inch)
+            story.append(img)
+            story.append(Spacer(1, 10))
+        except Exception as e:
+            error_msg = Paragraph(f"Erreur lors de la génération du graphique Top Articles: {e}", normal_style)
+            story.append(error_msg)
+
+    story.append(Spacer(1, 10))
+
+    # Top 10 Catégories
+    story.append(Paragraph(f"Top 10 Catégories - {critere_categories}", subtitle_style))
+    if fig_top_cat:
+        try:
+            img = plotly_fig_to_flowable(fig_top_cat, 600, 400, 6*inch, 3.5*inch)
+            story.append(img)
+            story.append(Spacer(1, 10))
+        except Exception as e:
+            error_msg = Paragraph(f"Erreur lors de la génération du graphique Top Catégories: {e}", normal_style)
+            story.append(error_msg)
+
+    story.append(Spacer(1, 15))
+
+    # --- Section 4: Répartition par Catégorie ---
+    story.append(Paragraph("💰 RÉPARTITION PAR CATÉGORIE", subtitle_style))
+    story.append(Paragraph(f"Répartition par {critere_pie}", subtitle_style))
+
+    if fig_pie:
+        try:
+            img = plotly_fig_to_flowable(fig_pie, 500, 400, 5*inch, 3.5*inch)
+            story.append(img)
+        except Exception as e:
+            error_msg = Paragraph(f"Erreur lors de la génération du graphique de répartition: {e}", normal_style)
+            story.append(error_msg)
+
+    # --- Section 5: Paramètres utilisés ---
+    story.append(Spacer(1, 20))
+    story.append(Paragraph("⚙️ PARAMÈTRES DE L'ANALYSE", subtitle_style))
+
+    param_data = [
+        ['Paramètre', 'Valeur'],
+        ['Période', f"{date_debut.strftime('%d/%m/%Y')} au {date_fin.strftime('%d/%m/%Y')}"],
+        ['Fréquence d\'agrégation', frequence_choix],
+        ['Analyses', ', '.join(analyses) or 'Aucune'],
+        ['Critère Top Articles', critere_articles],
+        ['Critère Top Catégories', critere_categories],
+        ['Critère Répartition', critere_pie],
+        ['Établissements', libelle_etablissements(etablissements)],
+        ['Nombre de catégories sélectionnées', str(kpis['Nb_Categories'])],
+        ['Nombre d\'articles sélectionnés', str(kpis['Nb_Articles'])]
+    ]
+
+    param_table = Table(param_data, colWidths=[200, 200])
+    param_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ]))
+    story.append(param_table)
+
+    # Pied de page
+    story.append(Spacer(1, 20))
+    footer = Paragraph("Rapport généré automatiquement par le Dashboard d'Analyse des Ventes - Téo Desquatrevaux © 2025", normal_style)
+    story.append(footer)
+
+    # Génération du PDF
+    with mesurer('Mise en page PDF'):
+        doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+# --- Rapport de comparaison ---
+def create_comparison_pdf(df_periode1, df_periode2, nom_periode1, nom_periode2,
+                            date_debut1, date_fin1, date_debut2, date_fin2,
+                            selected_categories1, selected_articles1,
+                            selected_categories2, selected_articles2,
+                            comparison_df, fig_comp_cat, fig_comp_rep,
+                            etablissements1=None, etablissements2=None):
+    """Crée un rapport PDF complet pour l'analyse comparative"""
+
+    # En mode image, rastériser les deux graphiques en parallèle ; ils sont repris du cache à leur insertion
+    if MODE_GRAPHIQUES_PDF == 'image':
+        with mesurer('Rastérisation des graphiques'):
+            prerendre_figures([(fig_comp_cat, 700, 350), (fig_comp_rep, 700, 350)])
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
+                            topMargin=0.5*inch, bottomMargin=0.5*inch,
+                            leftMargin=0.5*inch, rightMargin=0.5*inch)
+    story = []
+    styles = getSampleStyleSheet()
+
+    # Style personnalisé pour le titre
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=20,
+        alignment=1  # Centré
+    )
+
+    # Style pour les sous-titres
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+
+    # Style pour le texte normal
+    normal_style = styles['Normal']
+
+    # En-tête du rapport
+    title = Paragraph("🆚 RAPPORT COMPARATIF DES VENTES", title_style)
+    story.append(title)
+
+    # Périodes comparées
+    period_text = f"Comparaison : {nom_periode1} vs {nom_periode2}"
+    period = Paragraph(period_text, normal_style)
+    story.append(period)
+
+    date_generation = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
+    generation = Paragraph(date_generation, normal_style)
+    story.append(generation)
+
+    story.append(Spacer(1, 20))
+
+    # --- Section 1: Périodes comparées ---
+    story.append(Paragraph("📅 PÉRIODES COMPARÉES", subtitle_style))
+
+    period_data = [
+        ['Paramètre', nom_periode1, nom_periode2],
+        ['Date de début', date_debut1.strftime('%d/%m/%Y'), date_debut2.strftime('%d/%m/%Y')],
+        ['Date de fin', date_fin1.strftime('%d/%m/%Y'), date_fin2.strftime('%d/%m/%Y')],
+        ['Établissements', libelle_etablissements(etablissements1), libelle_etablissements(etablissements2)],
+        ['Catégories sélectionnées', str(len(selected_categories1)), str(len(selected_categories2))],
+        ['Articles sélectionnés', str(len(selected_articles1)), str(len(selected_articles2))]
+    ]
+
+    period_table = Table(period_data, colWidths=[200, 150, 150])
+    period_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ]))
+    story.append(period_table)
+    story.append(Spacer(1, 20))
+
+    # --- Section 2: Comparaison des Indicateurs Clés ---
+    story.append(Paragraph("📈 COMPARAISON DES INDICATEURS CLÉS", subtitle_style))
+
+    # Convertir le DataFrame de comparaison en tableau PDF
+    if not comparison_df.empty:
+        kpi_data = [comparison_df.columns.tolist()] + comparison_df.values.tolist()
+        kpi_table = Table(kpi_data, colWidths=[200, 120, 120, 100])
+        kpi_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('TEXTCOLOR', (-1, 1), (-1, -1), colors.red)  # Couleur pour les évolutions
+        ]))
+        story.append(kpi_table)
+    story.append(Spacer(1, 20))
+
+    # --- Section 3: Graphiques comparatifs ---
+    story.append(Paragraph("🆚 GRAPHIQUES COMPARATIFS", subtitle_style))
+
+    # Graphique des top catégories
+    if fig_comp_cat:
+        try:
+            story.append(Paragraph("Top 10 Catégories Comparées", subtitle_style))
+            img = plotly_fig_to_flowable(fig_comp_cat, 700, 350, 6.5*inch, 3*inch)
+            story.append(img)
+            story.append(Spacer(1, 10))
+        except Exception as e:
+            error_msg = Paragraph(f"Erreur lors de la génération du graphique Top Catégories: {e}", normal_style)
+            story.append(error_msg)
+
+    story.append(Spacer(1, 15))
+
+    # Graphique de répartition
+    if fig_comp_rep:
+        try:
+            story.append(Paragraph("Répartition par Catégorie", subtitle_style))
+            img = plotly_fig_to_flowable(fig_comp_rep, 700, 350, 6.5*inch, 3*inch)
+            story.append(img)
+            story.append(Spacer(1, 10))
+        except Exception as e:
+            error_msg = Paragraph(f"Erreur lors de la génération du graphique de répartition: {e}", normal_style)
+            story.append(error_msg)
+
+    story.append(Spacer(1, 15))
+
+    # --- Section 4: Top Articles ---
+    story.append(Paragraph("🏆 TOP 10 ARTICLES PAR PÉRIODE", subtitle_style))
+
+    # Top articles période 1
+    top_art1 = df_periode1.groupby('Libellé', observed=True)['Total_TTC'].sum().nlargest(10)
+    top_art2 = df_periode2.groupby('Libellé', observed=True)['Total_TTC'].sum().nlargest(10)
+
+    # Préparer les données pour le tableau
+    max_rows = max(len(top_art1), len(top_art2))
+    articles_data = [['Classement', nom_periode1, 'CA (€)', nom_periode2, 'CA (€)']]
+
+    for i in range(max_rows):
+        row = [str(i+1)]
+
+        # Période 1
+        if i < len(top_art1):
+            article1 = list(top_art1.items())[i]
+            row.extend([article1[0], f"{article1[1]:,.2f}"])
+        else:
+            row.extend(['', ''])
+
+        # Période 2
+        if i < len(top_art2):
+            article2 = list(top_art2.items())[i]
+            row.extend([article2[0], f"{article2[1]:,.2f}"])
+        else:
+            row.extend(['', ''])
+
+        articles_data.append(row)
+
+    articles_table = Table(articles_data, colWidths=[60, 180, 80, 180, 80])
+    articles_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
+        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ]))
+    story.append(articles_table)
+
+    # Pied de page
+    story.append(Spacer(1, 20))
+    footer = Paragraph("Rapport comparatif généré automatiquement par le Dashboard d'Analyse des Ventes - Téo Desquatrevaux © 2025", normal_style)
+    story.append(footer)
+
+    # Génération du PDF
+    with mesurer('Mise en page PDF'):
+        doc.build(story)
+    buffer.seek(0)
+    return buffer
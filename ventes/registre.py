@@ -0,0 +1,160 @@
+"""
+Registre des jeux de données partagé entre les sessions du serveur.
+
+Chaque jeu est conservé en un seul exemplaire, identifié par une clé dérivée de
+l'empreinte du contenu des fichiers : plusieurs responsables qui ouvrent le même
+journal partagent le même DataFrame. Les sessions ne gardent que la clé.
+
+Les objets enregistrés sont partagés : ils ne doivent jamais être modifiés en place.
+Quand la mémoire occupée dépasse le budget, les jeux les moins récemment utilisés sont
+évincés, en commençant par ceux qu'aucune session ne référence ; un jeu évincé est
+reconstruit à la demande (relecture du cache disque). Les objets dérivés d'un jeu,
+enregistrés sous la clé `jeu#nom` (le cube par exemple), partagent ses références.
+
+Une session renouvelle sa référence à chaque exécution de la page. Streamlit ne signale
+pas la fin d'une session : une référence non renouvelée depuis `DUREE_REFERENCE` expire,
+si bien qu'un onglet fermé ou abandonné ne retient pas son jeu indéfiniment.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ventes.chargement import memoire_frame
+
+# Budget mémoire du registre, modifiable par variable d'environnement (en Mo)
+BUDGET_MEMOIRE = int(os.environ.get('VENTES_BUDGET_MEMOIRE_MO', '2048')) * 1024 ** 2
+
+# Durée sans activité après laquelle une session ne retient plus son jeu (en minutes)
+DUREE_REFERENCE = int(os.environ.get('VENTES_DUREE_REFERENCE_MIN', '30')) * 60
+
+
+def taille_objet(objet, vus=None):
+    """
+    Mémoire occupée par un objet enregistré, en octets : DataFrames (le jeu, le cube),
+    tableaux NumPy, dictionnaires, listes et chaînes (index des articles, partitions).
+    Un objet référencé plusieurs fois (libellé présent dans plusieurs tables) est compté une fois.
+    """
+    if vus is None:
+        vus = set()
+    if id(objet) in vus:
+        return 0
+    vus.add(id(objet))
+    if isinstance(objet, pd.DataFrame):
+        return memoire_frame(objet)
+    if isinstance(objet, np.ndarray):
+        return objet.nbytes
+    taille = sys.getsizeof(objet)
+    if isinstance(objet, dict):
+        taille += sum(taille_objet(cle, vus) + taille_objet(valeur, vus) for cle, valeur in objet.items())
+    elif isinstance(objet, (list, tuple)):
+        taille += sum(taille_objet(element, vus) for element in objet)
+    return taille
+
+
+class RegistreJeux:
+    """Cache LRU de jeux de données partagés, avec comptage des sessions qui les utilisent"""
+
+    def __init__(self, budget=BUDGET_MEMOIRE, duree_reference=DUREE_REFERENCE, horloge=time.monotonic):
+        self.budget = budget
+        self.duree_reference = duree_reference
+        self._horloge = horloge
+        self._verrou = threading.Lock()
+        self._entrees = OrderedDict()   # clé -> (objet, taille)
+        self._references = {}           # clé -> {identifiant de session: dernière activité}
+        self._chargements = {}          # clé -> verrou du chargement en cours
+
+    def obtenir(self, cle, charger=None):
+        """
+        Retourne l'objet enregistré sous `cle`. S'il est absent, il est construit par
+        `charger()` (une seule fois même si plusieurs sessions le demandent en même temps)
+        puis enregistré. Retourne None si l'objet est absent et ne peut être construit.
+        """
+        with self._verrou:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                return self._entrees[cle][0]
+            if charger is None:
+                return None
+            verrou_chargement = self._chargements.setdefault(cle, threading.Lock())
+
+        with verrou_chargement:
+            # Une autre session a pu terminer le chargement pendant l'attente
+            with self._verrou:
+                if cle in self._entrees:
+                    self._entrees.move_to_end(cle)
+                    return self._entrees[cle][0]
+            try:
+                objet = charger()
+                if objet is not None:
+                    self.enregistrer(cle, objet)
+            finally:
+                # Retiré seulement une fois l'objet enregistré : une session qui arrive entre
+                # les deux le trouve dans le registre au lieu de lancer un second chargement
+                with self._verrou:
+                    self._chargements.pop(cle, None)
+            return objet
+
+    def enregistrer(self, cle, objet):
+        """Enregistre (ou remplace) un objet, puis évince les plus anciens si le budget est dépassé"""
+        with self._verrou:
+            self._entrees[cle] = (objet, taille_objet(objet))
+            self._entrees.move_to_end(cle)
+            self._evincer(protege=cle)
+
+    def acquerir(self, cle, session):
+        """Marque le jeu `cle` comme utilisé par une session, ou renouvelle sa référence"""
+        if cle is None:
+            return
+        with self._verrou:
+            self._references.setdefault(cle, {})[session] = self._horloge()
+
+    def liberer(self, cle, session):
+        """Retire la référence d'une session ; le jeu devient évinçable en priorité"""
+        if cle is None:
+            return
+        with self._verrou:
+            sessions = self._references.get(cle)
+            if sessions is not None:
+                sessions.pop(session, None)
+                if not sessions:
+                    del self._references[cle]
+
+    def nb_references(self, cle):
+        """Nombre de sessions qui utilisent le jeu `cle` (références expirées exclues)"""
+        with self._verrou:
+            self._expirer_references()
+            return len(self._references.get(cle, ()))
+
+    def memoire(self):
+        """Mémoire occupée par les objets enregistrés, en octets"""
+        with self._verrou:
+            return sum(taille for _, taille in self._entrees.values())
+
+    def _expirer_references(self):
+        """Oublie les sessions sans activité depuis plus de `duree_reference`"""
+        limite = self._horloge() - self.duree_reference
+        for cle in list(self._references):
+            sessions = self._references[cle]
+            for session in [session for session, activite in sessions.items() if activite < limite]:
+                del sessions[session]
+            if not sessions:
+                del self._references[cle]
+
+    def _evincer(self, protege):
+        """Évince en ordre LRU : d'abord les jeux sans référence, puis les autres si nécessaire"""
+        self._expirer_references()
+        total = sum(taille for _, taille in self._entrees.values())
+        for sans_reference_seulement in (True, False):
+            for cle in list(self._entrees):
+                if total <= self.budget:
+                    return
+                if cle == protege:
+                    continue
+                if sans_reference_seulement and self._references.get(cle.partition('#')[0]):
+                    continue
+                total -= self._entrees.pop(cle)[1]
@@ -0,0 +1,228 @@
+"""
+Rendu des graphiques Plotly en images pour les rapports PDF, avec cache adressé par contenu.
+
+Une image est identifiée par l'empreinte du JSON de la figure, de ses dimensions et de
+la version de Plotly : un même graphique, dans plusieurs rapports ou pour plusieurs
+utilisateurs, n'est rastérisé qu'une fois. Le cache mémoire est borné en octets (éviction
+LRU) ; un répertoire peut être ajouté pour conserver les images entre deux redémarrages.
+
+Les rendus passent par un pool de moteurs Kaleido gardés chauds : le navigateur est
+lancé une fois, en arrière-plan, et plusieurs graphiques sont rastérisés en parallèle.
+"""
+import asyncio
+import atexit
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait
+from pathlib import Path
+
+import plotly
+import plotly.io as pio
+
+# Taille maximale du cache mémoire des images (en Mo)
+CAPACITE_CACHE_IMAGES = int(os.environ.get('VENTES_CACHE_IMAGES_MO', '64')) * 1024 ** 2
+
+# Répertoire du cache disque des images (désactivé si la variable n'est pas définie)
+REPERTOIRE_IMAGES = os.environ.get('VENTES_CACHE_IMAGES_DIR')
+
+# Nombre de graphiques rastérisés simultanément par le pool de rendu
+NB_MOTEURS_RENDU = int(os.environ.get('VENTES_NB_MOTEURS_RENDU', '4'))
+
+# Délai maximal d'un rendu (en secondes)
+DELAI_RENDU = 90
+
+
+def empreinte_figure(fig, width, height, format='png'):
+    """Empreinte SHA-256 d'un rendu : JSON de la figure, dimensions, format et version de Plotly"""
+    contenu = f"{plotly.__version__}|{format}|{width}x{height}|{fig.to_json()}"
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+class CacheImages:
+    """Cache LRU d'images borné en octets, éventuellement doublé d'un répertoire sur disque"""
+
+    def __init__(self, capacite=CAPACITE_CACHE_IMAGES, repertoire=None):
+        self.capacite = capacite
+        self.repertoire = Path(repertoire) if repertoire else None
+        self._verrou = threading.Lock()
+        self._images = OrderedDict()   # empreinte -> octets de l'image
+        self._taille = 0
+
+    def obtenir(self, empreinte):
+        """Retourne l'image en cache (mémoire puis disque), ou None"""
+        with self._verrou:
+            if empreinte in self._images:
+                self._images.move_to_end(empreinte)
+                return self._images[empreinte]
+
+        if self.repertoire is None:
+            return None
+        try:
+            image = (self.repertoire / f"{empreinte}.png").read_bytes()
+        except OSError:
+            return None
+        self._ajouter(empreinte, image)
+        return image
+
+    def enregistrer(self, empreinte, image):
+        """Ajoute une image au cache mémoire et, le cas échéant, au répertoire"""
+        self._ajouter(empreinte, image)
+        if self.repertoire is None:
+            return
+        chemin = self.repertoire / f"{empreinte}.png"
+        chemin_temporaire = chemin.with_suffix(f'.{threading.get_ident()}.tmp')
+        try:
+            self.repertoire.mkdir(parents=True, exist_ok=True)
+            chemin_temporaire.write_bytes(image)
+            os.replace(chemin_temporaire, chemin)
+        except OSError:
+            pass
+
+    def vider(self):
+        """Vide le cache mémoire (le répertoire est conservé)"""
+        with self._verrou:
+            self._images.clear()
+            self._taille = 0
+
+    def _ajouter(self, empreinte, image):
+        """Insère une image en mémoire et évince les moins récemment utilisées au-delà de la capacité"""
+        if len(image) > self.capacite:
+            return
+        with self._verrou:
+            if empreinte in self._images:
+                self._images.move_to_end(empreinte)
+                return
+            self._images[empreinte] = image
+            self._taille += len(image)
+            while self._taille > self.capacite:
+                _, ancienne = self._images.popitem(last=False)
+                self._taille -= len(ancienne)
+
+
+# --- Pool de moteurs de rendu ---
+class PoolRendu:
+    """
+    Navigateur Kaleido ouvert une fois avec `nb_moteurs` onglets de rendu, piloté depuis
+    un thread dédié (boucle asyncio) ; les rendus y sont soumis depuis n'importe quel thread.
+
+    Si Kaleido ou son navigateur ne sont pas disponibles, les rendus se replient sur
+    `pio.to_image`, qui remonte l'erreur habituelle.
+    """
+
+    def __init__(self, nb_moteurs=NB_MOTEURS_RENDU):
+        self.nb_moteurs = nb_moteurs
+        self._verrou = threading.Lock()
+        self._thread = None
+        self._pret = threading.Event()
+        self._boucle = None
+        self._kaleido = None
+        self._erreur = None
+
+    def demarrer(self):
+        """Lance le navigateur en arrière-plan (une seule fois) sans attendre qu'il soit prêt"""
+        with self._verrou:
+            if self._thread is not None:
+                return
+            self._pret.clear()
+            self._erreur = None
+            self._thread = threading.Thread(target=self._executer, name='pool-rendu', daemon=True)
+            self._thread.start()
+
+    def _executer(self):
+        """Corps du thread : ouvre Kaleido puis sert les rendus jusqu'à l'arrêt"""
+        self._boucle = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._boucle)
+        try:
+            import kaleido
+            self._kaleido = kaleido.Kaleido(n=self.nb_moteurs, timeout=DELAI_RENDU)
+            self._boucle.run_until_complete(self._kaleido.open())
+        except Exception as e:
+            self._erreur = e
+        finally:
+            self._pret.set()
+
+        if self._erreur is None:
+            self._boucle.run_forever()
+        self._boucle.close()
+
+    @property
+    def erreur(self):
+        """Erreur survenue au démarrage du navigateur (None si le pool fonctionne)"""
+        return self._erreur
+
+    def disponible(self):
+        """Attend le démarrage du pool et indique s'il peut rendre des graphiques"""
+        self.demarrer()
+        self._pret.wait()
+        return self._erreur is None
+
+    def soumettre(self, fig, width, height):
+        """Soumet un rendu PNG au pool et retourne un `concurrent.futures.Future` des octets de l'image"""
+        opts = {'format': 'png', 'width': width, 'height': height, 'scale': 1}
+        return asyncio.run_coroutine_threadsafe(self._kaleido.calc_fig(fig.to_dict(), opts=opts), self._boucle)
+
+    def rendre(self, fig, width, height):
+        """Rend une figure sur un moteur chaud (ou par `pio.to_image` si le pool est indisponible)"""
+        if not self.disponible():
+            return pio.to_image(fig, format='png', width=width, height=height)
+        from kaleido.errors import BrowserClosedError, BrowserFailedError
+        try:
+            return self.soumettre(fig, width, height).result(timeout=DELAI_RENDU)
+        except (TimeoutError, BrowserClosedError, BrowserFailedError):
+            # Navigateur fermé ou bloqué : il sera relancé au prochain rendu
+            self.arreter()
+            raise
+
+    def arreter(self):
+        """Ferme le navigateur et arrête le thread du pool"""
+        with self._verrou:
+            thread, boucle, moteur = self._thread, self._boucle, self._kaleido
+            self._thread = self._kaleido = None
+        if thread is None:
+            return
+        if self._pret.is_set() and self._erreur is None and boucle.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(moteur.close(), boucle).result(timeout=10)
+            except Exception:
+                pass
+            boucle.call_soon_threadsafe(boucle.stop)
+        thread.join(timeout=10)
+
+
+CACHE_IMAGES = CacheImages(repertoire=REPERTOIRE_IMAGES)
+POOL_RENDU = PoolRendu()
+atexit.register(POOL_RENDU.arreter)
+
+
+def rendre_figure(fig, width=800, height=400, cache=CACHE_IMAGES, pool=POOL_RENDU):
+    """Retourne le rendu PNG d'une figure Plotly, rastérisé seulement s'il n'est pas déjà en cache"""
+    empreinte = empreinte_figure(fig, width, height)
+    image = cache.obtenir(empreinte)
+    if image is None:
+        image = pool.rendre(fig, width, height)
+        cache.enregistrer(empreinte, image)
+    return image
+
+
+def prerendre_figures(figures, cache=CACHE_IMAGES, pool=POOL_RENDU):
+    """
+    Rend en parallèle les figures `(fig, width, height)` absentes du cache et les y place.
+    Les figures None sont ignorées ; un rendu en échec n'est pas mis en cache, si bien
+    que l'erreur est remontée par l'appel à `rendre_figure` qui suit.
+    """
+    a_rendre = {}
+    for fig, width, height in figures:
+        if fig is not None:
+            empreinte = empreinte_figure(fig, width, height)
+            if empreinte not in a_rendre and cache.obtenir(empreinte) is None:
+                a_rendre[empreinte] = (fig, width, height)
+    if not a_rendre or not pool.disponible():
+        return
+
+    rendus = {empreinte: pool.soumettre(*figure) for empreinte, figure in a_rendre.items()}
+    wait(rendus.values(), timeout=DELAI_RENDU)
+    for empreinte, rendu in rendus.items():
+        if rendu.done() and rendu.exception() is None:
+            cache.enregistrer(empreinte, rendu.result())
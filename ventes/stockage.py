@@ -0,0 +1,133 @@
+"""
+Cache disque des journaux agrégés au format colonne (Feather / Arrow IPC).
+
+Chaque fichier est identifié par l'empreinte SHA-256 du CSV d'origine et par la
+version des règles de catégorisation : recharger le même journal (ou redémarrer le
+serveur) relit directement le résultat agrégé par lecture mappée en mémoire. Après un
+changement des règles, un journal en cache est recatégorisé (libellés distincts
+seulement) et réécrit sous la nouvelle version, sans relire le CSV.
+
+Le fichier est partitionné par établissement : chaque établissement est écrit dans ses
+propres lots Arrow, dont les positions sont conservées dans les métadonnées. Relire un
+établissement ne touche que les pages de sa partition.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from ventes.categories import VERSION_REGLES, recategoriser
+from ventes.filtres import index_partitions
+
+# Répertoire du cache, modifiable par variable d'environnement
+REPERTOIRE_CACHE = Path(os.environ.get('VENTES_CACHE_DIR', '.cache/ventes'))
+
+# À incrémenter dès que le format du DataFrame agrégé change
+VERSION_STOCKAGE = 7
+
+# Clé des métadonnées Arrow où sont conservés les `attrs` du DataFrame
+CLE_ATTRS = b'ventes_attrs'
+
+# Clé des métadonnées Arrow où sont conservées les positions des partitions par établissement
+CLE_PARTITIONS = b'ventes_partitions'
+
+
+def empreinte_contenu(contenu):
+    """Retourne l'empreinte SHA-256 (hexadécimale) du contenu brut d'un fichier"""
+    return hashlib.sha256(contenu).hexdigest()
+
+
+def chemin_cache(empreinte, version_regles=VERSION_REGLES):
+    """Chemin du fichier de cache pour un journal et une version des règles"""
+    return REPERTOIRE_CACHE / f"{empreinte}_{version_regles}_v{VERSION_STOCKAGE}.feather"
+
+
+def lire_cache(empreinte, version_regles=VERSION_REGLES, etablissements=None):
+    """
+    Relit un journal agrégé depuis le cache, ou retourne None s'il est absent ou illisible.
+    Avec une liste d'établissements, seules leurs partitions sont lues.
+    """
+    chemin = chemin_cache(empreinte, version_regles)
+    if not chemin.exists():
+        df = recategoriser_cache(empreinte) if version_regles == VERSION_REGLES else None
+        if df is not None and etablissements is not None:
+            df = df[df['Code_établissement'].isin(etablissements)].reset_index(drop=True)
+        return df
+    try:
+        table = feather.read_table(chemin, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    metadata = table.schema.metadata or {}
+    if etablissements is not None:
+        partitions = json.loads(metadata.get(CLE_PARTITIONS, b'{}'))
+        morceaux = [table.slice(debut, fin - debut) for code, (debut, fin) in partitions.items()
+                    if code in etablissements]
+        table = pa.concat_tables(morceaux) if morceaux else table.slice(0, 0)
+
+    df = table.to_pandas()
+    attrs = metadata.get(CLE_ATTRS)
+    if attrs:
+        df.attrs.update(json.loads(attrs))
+    return df
+
+
+def ecrire_cache(empreinte, df_aggregated, version_regles=VERSION_REGLES):
+    """
+    Écrit un journal agrégé (trié par établissement) dans le cache, une partition par
+    établissement (écriture atomique, sans compression pour permettre la lecture mappée),
+    et supprime les versions obsolètes du même journal.
+    Retourne False si le cache n'est pas accessible en écriture.
+    """
+    chemin = chemin_cache(empreinte, version_regles)
+    chemin_temporaire = None
+    try:
+        REPERTOIRE_CACHE.mkdir(parents=True, exist_ok=True)
+        # Fichier temporaire propre à cet écrivain : deux sessions qui écrivent le même journal
+        # en même temps ne s'écrasent pas, la dernière à remplacer le fichier l'emporte
+        with tempfile.NamedTemporaryFile(dir=REPERTOIRE_CACHE, prefix=f"{chemin.stem}.", suffix='.tmp',
+                                         delete=False) as temporaire:
+            chemin_temporaire = Path(temporaire.name)
+        partitions = index_partitions(df_aggregated)
+        table = pa.Table.from_pandas(df_aggregated, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[CLE_ATTRS] = json.dumps(df_aggregated.attrs).encode('utf-8')
+        metadata[CLE_PARTITIONS] = json.dumps(partitions).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+        # Fichier Arrow IPC non compressé (format Feather V2), un ou plusieurs lots par partition
+        with pa.ipc.new_file(chemin_temporaire, table.schema) as fichier:
+            for debut, fin in partitions.values():
+                fichier.write_table(table.slice(debut, fin - debut))
+        os.replace(chemin_temporaire, chemin)
+        chemin_temporaire = None
+
+        for ancien in REPERTOIRE_CACHE.glob(f"{empreinte}_*.feather"):
+            if ancien != chemin:
+                ancien.unlink(missing_ok=True)
+    except OSError:
+        return False
+    finally:
+        if chemin_temporaire is not None:
+            chemin_temporaire.unlink(missing_ok=True)
+    return True
+
+
+def recategoriser_cache(empreinte):
+    """
+    Reprend un journal mis en cache avec d'autres règles de catégorisation : ses libellés
+    distincts sont recatégorisés et le résultat est réécrit sous la version courante des
+    règles. Retourne None si aucun cache du journal n'existe dans le format courant.
+    """
+    suffixe = f"_v{VERSION_STOCKAGE}.feather"
+    for ancien in REPERTOIRE_CACHE.glob(f"{empreinte}_*{suffixe}"):
+        version_regles = ancien.name[len(empreinte) + 1:-len(suffixe)]
+        df = lire_cache(empreinte, version_regles)
+        if df is not None:
+            df = recategoriser(df)
+            ecrire_cache(empreinte, df)
+            return df
+    return None
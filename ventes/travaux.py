@@ -0,0 +1,114 @@
+"""
+File de génération des rapports en arrière-plan.
+
+Les rapports sont construits dans un pool de threads, hors du thread du script
+Streamlit : la page reste utilisable pendant la génération et une relance du script
+ne perd pas le travail. Chaque travail est identifié par l'empreinte de ses paramètres,
+si bien que deux demandes identiques (même jeu de données, mêmes filtres) partagent
+une seule génération. Les travaux terminés sont conservés, dans la limite de
+`MAX_TRAVAUX`, pour être téléchargés plus tard.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre de rapports générés simultanément
+NB_TRAVAILLEURS_RAPPORTS = int(os.environ.get('VENTES_NB_TRAVAILLEURS_RAPPORTS', '2'))
+
+# Nombre de travaux conservés (les plus anciens travaux terminés sont oubliés au-delà)
+MAX_TRAVAUX = 64
+
+# Statuts d'un travail
+INCONNU = 'inconnu'
+EN_ATTENTE = 'en_attente'
+EN_COURS = 'en_cours'
+TERMINE = 'termine'
+ERREUR = 'erreur'
+
+
+def identifiant_travail(*parametres):
+    """Identifiant d'un travail : empreinte des paramètres qui déterminent son résultat"""
+    return hashlib.sha256(repr(parametres).encode('utf-8')).hexdigest()[:16]
+
+
+class FileRapports:
+    """File de travaux dédupliqués par identifiant, exécutés dans un pool de threads"""
+
+    def __init__(self, nb_travailleurs=NB_TRAVAILLEURS_RAPPORTS, max_travaux=MAX_TRAVAUX):
+        self.max_travaux = max_travaux
+        self._executeur = ThreadPoolExecutor(max_workers=nb_travailleurs, thread_name_prefix='rapport')
+        self._verrou = threading.Lock()
+        self._travaux = OrderedDict()   # identifiant -> {'futur', 'soumis', 'debut', 'fin'}
+
+    def soumettre(self, id_travail, fonction, *args, **kwargs):
+        """
+        Lance `fonction(*args, **kwargs)` en arrière-plan sous l'identifiant donné, sauf si
+        un travail de même identifiant est déjà en attente, en cours ou terminé avec succès.
+        """
+        with self._verrou:
+            travail = self._travaux.get(id_travail)
+            if travail is not None and self._statut(travail) != ERREUR:
+                self._travaux.move_to_end(id_travail)
+                return id_travail
+
+            travail = {'futur': None, 'soumis': time.time(), 'debut': None, 'fin': None}
+
+            def executer():
+                travail['debut'] = time.time()
+                try:
+                    return fonction(*args, **kwargs)
+                finally:
+                    travail['fin'] = time.time()
+
+            travail['futur'] = self._executeur.submit(executer)
+            self._travaux[id_travail] = travail
+            self._oublier_anciens()
+        return id_travail
+
+    def statut(self, id_travail):
+        """Statut d'un travail : inconnu, en_attente, en_cours, termine ou erreur"""
+        with self._verrou:
+            travail = self._travaux.get(id_travail)
+            return INCONNU if travail is None else self._statut(travail)
+
+    def resultat(self, id_travail):
+        """Résultat d'un travail terminé (None s'il n'est pas terminé avec succès)"""
+        with self._verrou:
+            travail = self._travaux.get(id_travail)
+        if travail is None or self._statut(travail) != TERMINE:
+            return None
+        return travail['futur'].result()
+
+    def erreur(self, id_travail):
+        """Exception levée par un travail en échec (None sinon)"""
+        with self._verrou:
+            travail = self._travaux.get(id_travail)
+        if travail is None or self._statut(travail) != ERREUR:
+            return None
+        return travail['futur'].exception()
+
+    def duree(self, id_travail):
+        """Durée écoulée depuis le début d'un travail, ou sa durée totale s'il est fini (en secondes)"""
+        with self._verrou:
+            travail = self._travaux.get(id_travail)
+        if travail is None or travail['debut'] is None:
+            return 0.0
+        return (travail['fin'] or time.time()) - travail['debut']
+
+    @staticmethod
+    def _statut(travail):
+        futur = travail['futur']
+        if not futur.done():
+            return EN_COURS if futur.running() else EN_ATTENTE
+        return ERREUR if futur.exception() is not None else TERMINE
+
+    def _oublier_anciens(self):
+        """Oublie les plus anciens travaux terminés au-delà de `max_travaux`"""
+        for id_travail in list(self._travaux):
+            if len(self._travaux) <= self.max_travaux:
+                return
+            if self._travaux[id_travail]['futur'].done():
+                del self._travaux[id_travail]
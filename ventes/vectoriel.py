@@ -0,0 +1,248 @@
+"""
+Dessin vectoriel des graphiques Plotly dans les rapports PDF (ReportLab graphics).
+
+Les traces des figures (courbes, barres horizontales éventuellement groupées, camemberts,
+y compris en sous-graphiques) sont reprises telles quelles et tracées nativement dans le
+PDF : aucune rastérisation ni encodage PNG, un fichier plus léger et un rendu net à
+toutes les échelles. Les figures comportant d'autres types de traces lèvent
+`GraphiqueNonSupporte`, pour que l'appelant se replie sur l'image PNG.
+"""
+import os
+
+import pandas as pd
+from reportlab.graphics.charts.barcharts import HorizontalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, Group, String
+from reportlab.lib import colors
+
+# Mode d'insertion des graphiques dans les PDF : 'vectoriel' (dessin natif) ou 'image' (PNG)
+MODE_GRAPHIQUES_PDF = os.environ.get('VENTES_GRAPHIQUES_PDF', 'vectoriel')
+
+# Palette par défaut de Plotly, utilisée quand la figure n'en précise pas
+PALETTE_PLOTLY = ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A',
+                  '#19d3f3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
+
+HAUTEUR_TITRE = 22
+NB_ETIQUETTES_DATES = 8
+POLICE = 'Helvetica'
+
+
+class GraphiqueNonSupporte(ValueError):
+    """La figure contient des traces que le rendu vectoriel ne sait pas dessiner"""
+
+
+def figure_en_dessin(fig, largeur, hauteur):
+    """Convertit une figure Plotly en `Drawing` ReportLab de `largeur` x `hauteur` points"""
+    types = {trace.type for trace in fig.data}
+    if not fig.data or len(types) > 1:
+        raise GraphiqueNonSupporte(f"Types de traces non pris en charge : {sorted(types)}")
+
+    dessin = Drawing(largeur, hauteur)
+    titre = fig.layout.title.text
+    if titre:
+        dessin.add(String(largeur / 2, hauteur - 14, titre, fontName=f'{POLICE}-Bold', fontSize=11,
+                          textAnchor='middle'))
+    hauteur_graphique = hauteur - (HAUTEUR_TITRE if titre else 4)
+
+    type_trace = types.pop()
+    if type_trace == 'bar' and all(trace.orientation == 'h' for trace in fig.data):
+        _dessiner_barres(dessin, fig, largeur, hauteur_graphique)
+    elif type_trace == 'scatter':
+        _dessiner_courbes(dessin, fig, largeur, hauteur_graphique)
+    elif type_trace == 'pie':
+        _dessiner_camemberts(dessin, fig, largeur, hauteur_graphique)
+    else:
+        raise GraphiqueNonSupporte(f"Type de trace non pris en charge : {type_trace}")
+    return dessin
+
+
+# --- Utilitaires ---
+def _palette(fig):
+    colorway = fig.layout.colorway or fig.layout.template.layout.colorway
+    return list(colorway) if colorway else PALETTE_PLOTLY
+
+
+def _couleur(valeur, defaut):
+    """Couleur ReportLab d'une couleur Plotly (nom CSS ou hexadécimal)"""
+    if isinstance(valeur, str):
+        try:
+            return colors.toColor(valeur)
+        except ValueError:
+            pass
+    return colors.toColor(defaut)
+
+
+def _format_nombre(valeur):
+    return f"{valeur:,.0f}"
+
+
+def _titre_axe(axe):
+    return axe.title.text if axe and axe.title and axe.title.text else None
+
+
+def _valeur(valeur):
+    """Valeur numérique d'un point, None pour un point manquant (interruption de la courbe)"""
+    return None if valeur is None or pd.isna(valeur) else float(valeur)
+
+
+def _legende(dessin, paires, x, y):
+    """Légende en une colonne (plusieurs si elle dépasse la hauteur disponible) depuis le coin (x, y)"""
+    legende = Legend()
+    legende.x, legende.y = x, y
+    legende.fontName = POLICE
+    legende.fontSize = 7
+    legende.alignment = 'right'
+    legende.boxAnchor = 'nw'
+    legende.dx = legende.dy = 7
+    legende.deltay = 10
+    legende.columnMaximum = max(1, int(y // legende.deltay))
+    legende.colorNamePairs = paires
+    dessin.add(legende)
+
+
+# --- Barres horizontales ---
+def _dessiner_barres(dessin, fig, largeur, hauteur):
+    # Ordre des catégories de bas en haut, comme Plotly : ordre d'apparition, ou total croissant
+    categories = list(dict.fromkeys(str(y) for trace in fig.data for y in trace.y))
+    series = []
+    for trace in fig.data:
+        valeurs = dict(zip((str(y) for y in trace.y), (float(x) for x in trace.x)))
+        series.append(valeurs)
+    if fig.layout.yaxis.categoryorder == 'total ascending':
+        categories.sort(key=lambda categorie: sum(serie.get(categorie, 0) for serie in series))
+
+    palette = _palette(fig)
+    marge_gauche = min(largeur * 0.4, 8 + 4.2 * max((len(categorie) for categorie in categories), default=0))
+    avec_legende = len(fig.data) > 1
+    marge_droite = 90 if avec_legende else 15
+
+    graphique = HorizontalBarChart()
+    graphique.x, graphique.y = marge_gauche, 28
+    graphique.width = largeur - marge_gauche - marge_droite
+    graphique.height = hauteur - 36
+    graphique.data = [[serie.get(categorie) for categorie in categories] for serie in series]
+    graphique.categoryAxis.categoryNames = categories
+    graphique.categoryAxis.labels.fontName = POLICE
+    graphique.categoryAxis.labels.fontSize = 7
+    graphique.categoryAxis.labels.dx = -3
+    graphique.valueAxis.valueMin = 0
+    graphique.valueAxis.labels.fontName = POLICE
+    graphique.valueAxis.labels.fontSize = 7
+    graphique.valueAxis.labelTextFormat = _format_nombre
+    graphique.valueAxis.visibleGrid = True
+    graphique.valueAxis.gridStrokeColor = colors.HexColor('#e5ecf6')
+    graphique.barSpacing = 1
+    for i, trace in enumerate(fig.data):
+        graphique.bars[i].fillColor = _couleur(trace.marker.color, palette[i % len(palette)])
+        graphique.bars[i].strokeColor = None
+    dessin.add(graphique)
+
+    titre_x = _titre_axe(fig.layout.xaxis)
+    if titre_x:
+        dessin.add(String(graphique.x + graphique.width / 2, 4, titre_x, fontName=POLICE, fontSize=8,
+                          textAnchor='middle'))
+    if avec_legende:
+        paires = [(graphique.bars[i].fillColor, trace.name or f"Série {i + 1}") for i, trace in enumerate(fig.data)]
+        _legende(dessin, paires, largeur - marge_droite + 8, graphique.y + graphique.height)
+
+
+# --- Courbes ---
+def _etiquettes_abscisses(valeurs):
+    """Libellés de l'axe des abscisses (dates au format JJ/MM/AAAA), un sur n pour rester lisibles"""
+    valeurs = list(valeurs)
+    try:
+        libelles = list(pd.to_datetime(valeurs).strftime('%d/%m/%Y'))
+    except (ValueError, TypeError):
+        libelles = [str(valeur) for valeur in valeurs]
+    pas = max(1, -(-len(libelles) // NB_ETIQUETTES_DATES))
+    return [libelle if i % pas == 0 else '' for i, libelle in enumerate(libelles)]
+
+
+def _dessiner_courbes(dessin, fig, largeur, hauteur):
+    abscisses = list(fig.data[0].x)
+    if any(list(trace.x) != abscisses for trace in fig.data[1:]):
+        raise GraphiqueNonSupporte("Courbes sur des abscisses différentes")
+
+    palette = _palette(fig)
+    avec_legende = len(fig.data) > 1
+    graphique = HorizontalLineChart()
+    graphique.x, graphique.y = 55, 40
+    graphique.width = largeur - 70 - (100 if avec_legende else 0)
+    graphique.height = hauteur - 48
+    graphique.data = [[_valeur(y) for y in trace.y] for trace in fig.data]
+    graphique.joinedLines = 1
+    graphique.categoryAxis.categoryNames = _etiquettes_abscisses(abscisses)
+    graphique.categoryAxis.labels.fontName = POLICE
+    graphique.categoryAxis.labels.fontSize = 7
+    graphique.categoryAxis.labels.angle = 30
+    graphique.categoryAxis.labels.boxAnchor = 'ne'
+    graphique.categoryAxis.tickDown = 0
+    graphique.valueAxis.labels.fontName = POLICE
+    graphique.valueAxis.labels.fontSize = 7
+    graphique.valueAxis.labelTextFormat = _format_nombre
+    graphique.valueAxis.visibleGrid = True
+    graphique.valueAxis.gridStrokeColor = colors.HexColor('#e5ecf6')
+    for i, trace in enumerate(fig.data):
+        graphique.lines[i].strokeColor = _couleur(trace.line.color, palette[i % len(palette)])
+        graphique.lines[i].strokeWidth = 1.5
+    dessin.add(graphique)
+
+    titre_y = _titre_axe(fig.layout.yaxis)
+    if titre_y:
+        titre = Group(String(0, 0, titre_y, fontName=POLICE, fontSize=8, textAnchor='middle'))
+        titre.transform = (0, 1, -1, 0, 10, graphique.y + graphique.height / 2)   # rotation de 90°
+        dessin.add(titre)
+    if avec_legende:
+        paires = [(graphique.lines[i].strokeColor, trace.name or f"Série {i + 1}") for i, trace in enumerate(fig.data)]
+        _legende(dessin, paires, graphique.x + graphique.width + 12, graphique.y + graphique.height)
+
+
+# --- Camemberts ---
+def _dessiner_camemberts(dessin, fig, largeur, hauteur):
+    # Une même étiquette garde la même couleur d'un camembert à l'autre, comme dans Plotly
+    palette = _palette(fig)
+    couleurs = {}
+    for trace in fig.data:
+        for libelle in trace.labels:
+            couleurs.setdefault(str(libelle), colors.toColor(palette[len(couleurs) % len(palette)]))
+
+    largeur_legende = 150
+    largeur_utile = largeur - largeur_legende
+    titres = [annotation.text for annotation in fig.layout.annotations] if len(fig.data) > 1 else []
+    hauteur_titres = 14 if titres else 0
+
+    for i, trace in enumerate(fig.data):
+        domaine = trace.domain.x or (i / len(fig.data), (i + 1) / len(fig.data))
+        x0, x1 = domaine[0] * largeur_utile, domaine[1] * largeur_utile
+        diametre = max(10, min(x1 - x0, hauteur - hauteur_titres) - 16)
+        valeurs = [float(valeur) for valeur in trace.values]
+        total = sum(valeurs) or 1
+
+        camembert = Pie()
+        camembert.x = (x0 + x1 - diametre) / 2
+        camembert.y = (hauteur - hauteur_titres - diametre) / 2
+        camembert.width = camembert.height = diametre
+        camembert.data = valeurs
+        camembert.labels = [f"{valeur / total:.0%}" if valeur / total >= 0.05 else '' for valeur in valeurs]
+        camembert.simpleLabels = 1
+        camembert.slices.fontName = POLICE
+        camembert.slices.fontSize = 7
+        camembert.slices.fontColor = colors.white
+        camembert.slices.labelRadius = 0.7
+        camembert.slices.strokeColor = colors.white
+        camembert.slices.strokeWidth = 0.5
+        camembert.sideLabels = 0
+        if trace.hole:
+            camembert.innerRadiusFraction = trace.hole
+        for j, libelle in enumerate(trace.labels):
+            camembert.slices[j].fillColor = couleurs[str(libelle)]
+        dessin.add(camembert)
+
+        if i < len(titres):
+            dessin.add(String((x0 + x1) / 2, hauteur - 10, titres[i], fontName=POLICE, fontSize=9,
+                              textAnchor='middle'))
+
+    _legende(dessin, list((couleur, libelle) for libelle, couleur in couleurs.items()),
+             largeur_utile + 10, hauteur - 4)